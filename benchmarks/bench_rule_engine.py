@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Rule Engine Benchmark - 索引查找与逐条匹配的单次查询延迟对比
+
+用法：
+  python benchmarks/bench_rule_engine.py --rules 20000 --queries 5000
+  python benchmarks/bench_rule_engine.py --config processed_configs/.../X.yaml
+"""
+import sys
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / 'src'))
+
+import yaml_io
+from rule_engine import RuleEngine, parse_query
+
+
+def synthetic_config(count: int, rng: random.Random) -> Dict:
+    """按常见比例生成规则：域名后缀为主，少量关键字/精确域名/CIDR"""
+    rules = []
+    for i in range(count):
+        kind = rng.random()
+        if kind < 0.6:
+            rules.append(f'DOMAIN-SUFFIX,site{i}.example{i % 97}.com,Proxy')
+        elif kind < 0.75:
+            rules.append(f'DOMAIN,host{i}.example{i % 97}.net,DIRECT')
+        elif kind < 0.8:
+            rules.append(f'DOMAIN-KEYWORD,kw{i}x,REJECT')
+        else:
+            rules.append(f'IP-CIDR,{10 + i % 200}.{(i >> 8) % 256}.{i % 256}.0/24,DIRECT,no-resolve')
+    rules.append('MATCH,Final')
+    return {'rules': rules}
+
+
+def make_queries(engine: RuleEngine, count: int, rng: random.Random) -> List[str]:
+    """一半命中某条规则，一半落到末尾（逐条匹配的最坏情况）"""
+    queries = []
+    for _ in range(count):
+        rule = rng.choice(engine.rules)
+        if rng.random() < 0.5 and rule.type in ('DOMAIN', 'DOMAIN-SUFFIX'):
+            queries.append(f'www.{rule.payload}:443' if rule.type == 'DOMAIN-SUFFIX'
+                           else f'{rule.payload}:443')
+        elif rng.random() < 0.5 and rule.type == 'IP-CIDR':
+            queries.append(rule.payload.split('/')[0][:-1] + '7:443')
+        else:
+            queries.append(f'unmatched{rng.randint(0, 10**6)}.org:443/udp')
+    return queries
+
+
+def time_per_query(func, queries) -> float:
+    start = time.perf_counter()
+    for query in queries:
+        func(query)
+    return (time.perf_counter() - start) / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark indexed vs linear rule matching')
+    parser.add_argument('--config', type=Path, help='Use a real processed config instead')
+    parser.add_argument('--rule-sets', type=Path, help='Local rule-set directory for --config')
+    parser.add_argument('--rules', type=int, default=20000, help='Synthetic rule count')
+    parser.add_argument('--queries', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', '-o', type=Path, help='Save results as JSON')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    if args.config:
+        with open(args.config, 'r', encoding='utf-8') as f:
+            config = yaml_io.safe_load(f) or {}
+    else:
+        config = synthetic_config(args.rules, rng)
+
+    start = time.perf_counter()
+    engine = RuleEngine(config, args.rule_sets)
+    build = time.perf_counter() - start
+
+    queries = [parse_query(q) for q in make_queries(engine, args.queries, rng)]
+    mismatches = sum(1 for q in queries if engine.match_index_of(q) != engine.match_linear(q))
+
+    indexed = time_per_query(engine.match_index_of, queries)
+    linear = time_per_query(engine.match_linear, queries)
+
+    result = {
+        'rules': len(engine.rules),
+        'compiled_conditions': len(engine.linear),
+        'queries': len(queries),
+        'build_seconds': round(build, 4),
+        'indexed_us_per_query': round(indexed * 1e6, 2),
+        'linear_us_per_query': round(linear * 1e6, 2),
+        'speedup': round(linear / indexed, 1),
+        'mismatches': mismatches,
+    }
+    print(json.dumps(result, indent=2))
+    if args.output:
+        args.output.write_text(json.dumps(result, indent=2) + '\n', encoding='utf-8')
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
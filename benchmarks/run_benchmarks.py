@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Benchmarks - 处理/生成流水线的性能基准
+每项基准在独立子进程中运行，记录耗时（多次取最小值）、吞吐量与峰值 RSS，
+结果保存为 JSON，可与之前的结果比较以发现性能回退。
+
+用法：
+  python benchmarks/run_benchmarks.py --output bench.json
+  python benchmarks/run_benchmarks.py --compare bench.json --threshold 10
+"""
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import subprocess
+import tempfile
+import itertools
+import multiprocessing
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / 'src'))
+
+import yaml_io
+from yaml_processor import YAMLProcessor
+from overwrite_generator import OverwriteGenerator
+
+CORPUS = ROOT / 'processed_configs'
+TEMPLATES = ROOT / 'templates'
+CONFIG_TYPES = ROOT / 'src' / 'config_types.json'
+REPO_URL = 'https://raw.githubusercontent.com/USER/REPO/main'
+SCALES = (10, 100)
+
+
+def count_rules(yaml_files: List[Path]) -> int:
+    total = 0
+    for path in yaml_files:
+        with open(path, 'r', encoding='utf-8') as f:
+            config = yaml_io.safe_load(f) or {}
+        total += len(config.get('rules') or [])
+    return total
+
+
+def make_synthetic(source: Path, target: Path, scale: int):
+    """以语料中规则最多的文件为基础，生成规则数扩大 scale 倍的配置"""
+    with open(source, 'r', encoding='utf-8') as f:
+        config = yaml_io.safe_load(f)
+    rules = config.get('rules') or []
+    # 末尾的 MATCH 保持在最后
+    tail = [r for r in rules if str(r).startswith('MATCH')]
+    body = [r for r in rules if not str(r).startswith('MATCH')]
+    policy = body[0].split(',')[2] if body and body[0].count(',') >= 2 else 'DIRECT'
+    extra = [f'DOMAIN-SUFFIX,bench-{i}.example.com,{policy}'
+             for i in range(len(body) * (scale - 1))]
+    config['rules'] = body + extra + tail
+    target.parent.mkdir(parents=True, exist_ok=True)
+    with open(target, 'w', encoding='utf-8') as f:
+        yaml_io.dump(config, f, default_flow_style=False, allow_unicode=True, sort_keys=False)
+
+
+class Workspace:
+    """基准所需的输入：真实语料、预处理结果、合成配置"""
+
+    def __init__(self, base: Path):
+        self.base = base
+        self.corpus = sorted(CORPUS.glob('**/*.yaml'))
+        self.processed = base / 'processed'
+        self.processed_files = sorted(self.processed.glob('**/*.yaml'))
+        self.synthetic = {scale: path for scale in SCALES
+                          for path in (base / 'synthetic' / f'x{scale}').glob('*.yaml')}
+
+    def prepare(self):
+        """生成预处理结果与合成配置（只在主进程执行一次）"""
+        YAMLProcessor().process_directory(CORPUS, self.processed, recursive=True)
+        largest = max(self.corpus, key=lambda p: count_rules([p]))
+        for scale in SCALES:
+            make_synthetic(largest, self.base / 'synthetic' / f'x{scale}' /
+                           f'{largest.stem}-x{scale}.yaml', scale)
+        self.__init__(self.base)
+
+
+def fresh_dirs(out: Path):
+    """每次计时使用新的输出目录，避免只测到"内容未变化"的跳过路径"""
+    return (out / f'run{i}' for i in itertools.count())
+
+
+def bench_process_file(files: List[Path]) -> Callable:
+    processor = YAMLProcessor()
+    return lambda: [processor.process_file(p) for p in files]
+
+
+def bench_process_directory(out: Path) -> Callable:
+    processor = YAMLProcessor()
+    dirs = fresh_dirs(out)
+    return lambda: processor.process_directory(CORPUS, next(dirs), recursive=True)
+
+
+def bench_analyze_yaml(files: List[Path]) -> Callable:
+    gen = OverwriteGenerator(TEMPLATES, CONFIG_TYPES)
+    return lambda: [gen.analyze_yaml(p) for p in files]
+
+
+def bench_generate_overwrite(files: List[Path], out: Path) -> Callable:
+    gen = OverwriteGenerator(TEMPLATES, CONFIG_TYPES)
+    analyses = [(p, gen.analyze_yaml(p)) for p in files]
+    dirs = fresh_dirs(out)
+
+    def run():
+        out = next(dirs)
+        for path, analysis in analyses:
+            for config_def in gen.config_types:
+                gen.generate_overwrite(
+                    path, out / gen.variant_filename(path.stem, config_def),
+                    config_def, REPO_URL, 'bench', 'external', analysis=analysis
+                )
+    return run
+
+
+def bench_end_to_end(out: Path) -> Callable:
+    dirs = fresh_dirs(out)
+
+    def run():
+        out = next(dirs)
+        YAMLProcessor().process_directory(CORPUS, out / 'processed', recursive=True)
+        OverwriteGenerator(TEMPLATES, CONFIG_TYPES).process_directory(
+            out / 'processed', out / 'overwrite', REPO_URL, 'external'
+        )
+    return run
+
+
+def benchmark_specs(ws: Workspace, out: Path) -> Dict[str, Dict]:
+    """名称 -> {setup, files, rules}；files/rules 用于计算吞吐量"""
+    corpus_rules = count_rules(ws.corpus)
+    processed_rules = count_rules(ws.processed_files)
+    specs = {
+        'process_file': {
+            'setup': lambda: bench_process_file(ws.corpus),
+            'files': len(ws.corpus), 'rules': corpus_rules},
+        'process_directory': {
+            'setup': lambda: bench_process_directory(out / 'process_directory'),
+            'files': len(ws.corpus), 'rules': corpus_rules},
+        'analyze_yaml': {
+            'setup': lambda: bench_analyze_yaml(ws.processed_files),
+            'files': len(ws.processed_files), 'rules': processed_rules},
+        'generate_overwrite': {
+            'setup': lambda: bench_generate_overwrite(ws.processed_files,
+                                                      out / 'generate_overwrite'),
+            'files': len(ws.processed_files), 'rules': processed_rules},
+        'end_to_end': {
+            'setup': lambda: bench_end_to_end(out / 'end_to_end'),
+            'files': len(ws.corpus), 'rules': corpus_rules},
+    }
+    for scale, path in ws.synthetic.items():
+        rules = count_rules([path])
+        specs[f'process_file_x{scale}'] = {
+            'setup': lambda p=path: bench_process_file([p]),
+            'files': 1, 'rules': rules}
+        specs[f'analyze_yaml_x{scale}'] = {
+            'setup': lambda p=path: bench_analyze_yaml([p]),
+            'files': 1, 'rules': rules}
+    return specs
+
+
+def _run_in_child(base: str, name: str, repeat: int, queue):
+    """子进程：准备输入、计时，并报告本进程的峰值 RSS"""
+    import logging
+    logging.disable(logging.CRITICAL)
+
+    ws = Workspace(Path(base))
+    spec = benchmark_specs(ws, Path(base) / 'out')[name]
+    func = spec['setup']()
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    # Linux 上 ru_maxrss 单位为 KB，macOS 为字节
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        peak //= 1024
+    queue.put({'timings': timings, 'peak_rss_kb': peak})
+
+
+def run_benchmark(base: Path, name: str, spec: Dict, repeat: int) -> Dict:
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_run_in_child, args=(str(base), name, repeat, queue))
+    proc.start()
+    proc.join()
+    if proc.exitcode != 0:
+        raise RuntimeError(f"benchmark {name} failed (exit code {proc.exitcode})")
+    measured = queue.get()
+
+    best = min(measured['timings'])
+    return {
+        'seconds': round(best, 6),
+        'mean_seconds': round(sum(measured['timings']) / len(measured['timings']), 6),
+        'files': spec['files'],
+        'rules': spec['rules'],
+        'files_per_s': round(spec['files'] / best, 2),
+        'rules_per_s': round(spec['rules'] / best, 2),
+        'peak_rss_kb': measured['peak_rss_kb'],
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(previous: Dict, current: Dict, threshold: float) -> List[str]:
+    """对比两次结果，返回超过阈值（百分比）的回退项"""
+    regressions = []
+    print(f"\n{'benchmark':<24}{'before':>12}{'after':>12}{'change':>10}")
+    for name, result in current['results'].items():
+        old = previous.get('results', {}).get(name)
+        if not old:
+            print(f"{name:<24}{'-':>12}{result['seconds']:>12.4f}{'new':>10}")
+            continue
+        change = (result['seconds'] - old['seconds']) / old['seconds'] * 100
+        print(f"{name:<24}{old['seconds']:>12.4f}{result['seconds']:>12.4f}{change:>+9.1f}%")
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the YAML/overwrite pipeline')
+    parser.add_argument('--output', '-o', type=Path,
+                       help='Save results as JSON')
+    parser.add_argument('--compare', type=Path,
+                       help='Previous results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                       help='Regression threshold in percent (default: 10)')
+    parser.add_argument('--repeat', type=int, default=3,
+                       help='Timed runs per benchmark; the fastest is reported')
+    parser.add_argument('--only', nargs='+', metavar='NAME',
+                       help='Run only these benchmarks')
+    parser.add_argument('--yaml-backend', choices=('auto',) + yaml_io.BACKENDS,
+                       default='auto')
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.CRITICAL)
+    yaml_io.set_backend(args.yaml_backend)
+
+    with tempfile.TemporaryDirectory(prefix='overwrite-bench-') as tmp:
+        base = Path(tmp)
+        ws = Workspace(base)
+        ws.prepare()
+        specs = benchmark_specs(ws, base / 'out')
+        names = args.only or list(specs)
+        unknown = [name for name in names if name not in specs]
+        if unknown:
+            parser.error(f"unknown benchmark: {', '.join(unknown)} (choose from {', '.join(specs)})")
+
+        results = {}
+        for name in names:
+            results[name] = run_benchmark(base, name, specs[name], args.repeat)
+            r = results[name]
+            print(f"{name:<24}{r['seconds']:>9.4f}s {r['files_per_s']:>10.1f} files/s "
+                  f"{r['rules_per_s']:>12.0f} rules/s {r['peak_rss_kb'] / 1024:>8.1f} MB")
+
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'yaml_backend': yaml_io.get_backend(),
+        'repeat': args.repeat,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'results': results,
+    }
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + '\n', encoding='utf-8')
+        print(f"\n📊 Results saved to {args.output}")
+
+    if args.compare:
+        previous = json.loads(args.compare.read_text(encoding='utf-8'))
+        regressions = compare(previous, report, args.threshold)
+        if regressions:
+            print(f"\n❌ Regressions over {args.threshold}%: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
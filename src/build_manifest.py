@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Build Manifest - 记录输入内容哈希，支持增量构建
+"""
+import os
+import json
+import hashlib
+import logging
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from output_writer import OutputWriter, atomic_write
+
+
+def file_hash(path: Path) -> str:
+    """计算文件内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def files_fingerprint(paths: Iterable[Path]) -> Dict[str, str]:
+    """计算一组文件的哈希（按文件名）"""
+    return {p.name: file_hash(p) for p in sorted(paths) if p.is_file()}
+
+
+class BuildManifest:
+    """
+    磁盘清单：
+      fingerprint - 影响全部输出的因素（模板、config_types、版本号等）
+      entries     - 每个输入文件的哈希及其生成的输出（相对 output_base）
+    """
+    FORMAT_VERSION = 1
+
+    def __init__(self, path: Path, output_base: Path, fingerprint: Dict):
+        self.path = path
+        self.output_base = output_base
+        self.fingerprint = fingerprint
+        self.logger = logging.getLogger(__name__)
+        self.previous: Dict[str, Dict] = {}
+        self.entries: Dict[str, Dict] = {}
+        self.fingerprint_changed = True
+        self.load()
+
+    def load(self):
+        """读取上一次构建的清单"""
+        if not self.path.is_file():
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Ignoring unreadable manifest {self.path}: {e}")
+            return
+
+        if data.get('format') != self.FORMAT_VERSION:
+            return
+        self.previous = data.get('entries', {})
+        self.fingerprint_changed = data.get('fingerprint') != self.fingerprint
+
+    def is_fresh(self, key: str, digest: str) -> bool:
+        """输入未变化且输出仍然存在"""
+        if self.fingerprint_changed:
+            return False
+        entry = self.previous.get(key)
+        if not entry or entry.get('hash') != digest:
+            return False
+        return all((self.output_base / out).exists() for out in entry.get('outputs', []))
+
+    def recorded_hash(self, key: str) -> Optional[str]:
+        """上一次构建记录的输入哈希"""
+        return self.previous.get(key, {}).get('hash')
+
+    def recorded(self, key: str, field: str) -> Optional[Any]:
+        """上一次构建记录的附加字段（模板等变化后不再可信）"""
+        if self.fingerprint_changed:
+            return None
+        return self.previous.get(key, {}).get(field)
+
+    def outputs(self, key: str) -> List[str]:
+        """上一次构建记录的输出"""
+        return list(self.previous.get(key, {}).get('outputs', []))
+
+    def record(self, key: str, digest: str, outputs: Iterable[Path],
+               extra: Optional[Dict[str, Any]] = None):
+        """记录本次构建的输入哈希及输出；extra 为附加字段（如各变体的输入哈希）"""
+        self.entries[key] = {
+            'hash': digest,
+            # 允许输出位于 output_base 之外（如与输出目录并列的分段存储）
+            'outputs': sorted(
+                Path(os.path.relpath(out, self.output_base)).as_posix()
+                for out in outputs
+            ),
+            **(extra or {})
+        }
+
+    def keep(self, key: str):
+        """沿用上一次的记录（输入未变化）"""
+        self.entries[key] = self.previous[key]
+
+    def stale_keys(self) -> List[str]:
+        """上一次存在、本次已消失的输入"""
+        return sorted(set(self.previous) - set(self.entries))
+
+    def remove_outputs(self, key: str, writer: OutputWriter) -> List[Path]:
+        """删除已消失输入对应的输出"""
+        removed = []
+        for out in self.outputs(key):
+            out_path = self.output_base / out
+            if writer.delete(out_path):
+                removed.append(out_path)
+        return removed
+
+    def save(self):
+        """写入清单"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            'format': self.FORMAT_VERSION,
+            'fingerprint': self.fingerprint,
+            'entries': {k: self.entries[k] for k in sorted(self.entries)}
+        }
+        data = (json.dumps(data, ensure_ascii=False, indent=2) + '\n').encode('utf-8')
+        try:
+            # 内容未变化时不改动文件（可复现构建的第二次运行不写入任何文件）
+            if self.path.read_bytes() == data:
+                return
+        except OSError:
+            pass
+        atomic_write(self.path, data)
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Cost Model - 估算每个配置/变体在路由器上产生的后台流量
+  测速：url-test/fallback/load-balance/smart 策略组 + proxy-providers health-check（次/小时）
+  下载：proxy-providers、rule-providers、覆写中的 GEO/LGBM 更新及配置下载（次/天）
+
+订阅节点数离线未知，按每个 proxy-provider 固定节点数估算；
+策略组测速间隔取覆写中的 URLTEST_INTERVAL_MOD（非 0 时覆盖 YAML 中的 interval）。
+
+规范化：给定每小时测速预算，求最小间隔下限 T，使所有低于 T 的间隔提升到 T 后满足预算
+（T 最大 1 小时）。处理阶段改写 YAML 中的 interval，生成阶段只能调整 URLTEST_INTERVAL_MOD。
+"""
+import re
+import json
+import argparse
+import logging
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import yaml_io
+from minify import is_minified
+from group_graph import BUILTIN_POLICIES, PROBING_TYPES
+
+# 估算/规范化逻辑变化时递增，使增量构建的旧结果失效
+COST_MODEL_VERSION = '2'
+
+DEFAULT_GROUP_INTERVAL = 300
+DEFAULT_HEALTH_CHECK_INTERVAL = 300
+# 与 OverwriteGenerator.analyze_config 一致
+DEFAULT_PROVIDER_INTERVAL = 86400
+DEFAULT_NODES_PER_PROVIDER = 30
+DEFAULT_LGBM_UPDATE_HOURS = 72
+MAX_PROBE_FLOOR = 3600
+PROBE_KINDS = ('group', 'health-check')
+
+GEO_DATABASES = ('GEO', 'GEOIP', 'GEOSITE', 'GEOASN')
+SETTING_LINE = re.compile(r'^\s*([A-Z][A-Z0-9_]*)\s*=\s*(.*?)\s*$')
+
+
+def _seconds(value, default: int) -> int:
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return default
+    return value if value > 0 else default
+
+
+def parse_settings(text: str) -> Dict[str, str]:
+    """覆写文件 [General] 段的 KEY = VALUE"""
+    settings = {}
+    for line in text.splitlines():
+        if line.strip().startswith('['):
+            if settings:
+                break
+            continue
+        match = SETTING_LINE.match(line)
+        if match:
+            settings[match.group(1)] = match.group(2)
+    return settings
+
+
+def _cron_field(field: str, low: int, high: int) -> int:
+    """cron 单个字段匹配的取值个数"""
+    values = set()
+    for part in field.split(','):
+        part, _, step = part.partition('/')
+        step = int(step) if step else 1
+        if part == '*':
+            start, end = low, high
+        elif '-' in part:
+            start, end = (int(x) for x in part.split('-', 1))
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        values.update(range(start, end + 1, step))
+    return len(values)
+
+
+def cron_runs_per_day(expr: str) -> float:
+    """cron 表达式平均每天的执行次数"""
+    fields = expr.split()
+    if len(fields) != 5:
+        return 0.0
+    minute, hour, day, _, weekday = fields
+    runs = _cron_field(minute, 0, 59) * _cron_field(hour, 0, 23)
+    if day != '*':
+        runs *= _cron_field(day, 1, 31) / 30
+    if weekday != '*':
+        runs *= _cron_field(weekday, 0, 6) / 7
+    return float(runs)
+
+
+def variant_fetches(settings: Dict[str, str]) -> Dict[str, float]:
+    """覆写设置带来的下载次数/天"""
+    fetches = {'config': 0.0, 'geo': 0.0, 'lgbm': 0.0}
+    cron = re.search(r'cron=([^,]+)', settings.get('DOWNLOAD_FILE', ''))
+    if cron:
+        fetches['config'] = cron_runs_per_day(cron.group(1).strip())
+    for db in GEO_DATABASES:
+        if settings.get(f'{db}_AUTO_UPDATE') == '1':
+            weekday = settings.get(f'{db}_UPDATE_WEEK_TIME', '0')
+            fetches['geo'] += 1.0 if weekday == '*' else 1 / 7
+    if settings.get('SMART_ENABLE_LGBM') == '1' and settings.get('LGBM_AUTO_UPDATE') == '1':
+        hours = _seconds(settings.get('LGBM_UPDATE_INTERVAL'), DEFAULT_LGBM_UPDATE_HOURS)
+        fetches['lgbm'] = 24 / hours
+    return fetches
+
+
+def provider_fetches(config: Dict) -> Dict[str, float]:
+    """YAML 中 http providers 的下载次数/天（rule-providers 的 interval 为 0 时只在启动时下载）"""
+    fetches = {'proxy_providers': 0.0, 'rule_providers': 0.0}
+    for provider in (config.get('proxy-providers') or {}).values():
+        if isinstance(provider, dict) and provider.get('type', 'http') == 'http':
+            interval = _seconds(provider.get('interval'), DEFAULT_PROVIDER_INTERVAL)
+            fetches['proxy_providers'] += 86400 / interval
+    for provider in (config.get('rule-providers') or {}).values():
+        if isinstance(provider, dict) and provider.get('type') == 'http':
+            interval = _seconds(provider.get('interval'), 0)
+            if interval:
+                fetches['rule_providers'] += 86400 / interval
+    return fetches
+
+
+def probe_sources(config: Dict,
+                  nodes_per_provider: int = DEFAULT_NODES_PER_PROVIDER) -> List[Dict]:
+    """
+    周期测速的来源：每项含成员数、间隔、是否 lazy 及可写回 interval 的原始字典
+    未设置 lazy 时按 mihomo 默认值 true
+    """
+    providers = {name: p for name, p in (config.get('proxy-providers') or {}).items()
+                 if isinstance(p, dict)}
+    sources = []
+    for name, provider in providers.items():
+        health = provider.get('health-check')
+        if isinstance(health, dict) and health.get('enable'):
+            sources.append({
+                'kind': 'health-check', 'name': name, 'target': health,
+                'members': nodes_per_provider,
+                'interval': _seconds(health.get('interval'), DEFAULT_HEALTH_CHECK_INTERVAL),
+                'lazy': health.get('lazy', True) is not False
+            })
+
+    for group in config.get('proxy-groups') or []:
+        if not isinstance(group, dict) or group.get('type') not in PROBING_TYPES:
+            continue
+        if group.get('include-all') or group.get('include-all-providers'):
+            used = len(providers)
+        else:
+            used = sum(1 for name in group.get('use') or [] if name in providers)
+        members = used * nodes_per_provider + sum(
+            1 for ref in group.get('proxies') or [] if ref not in BUILTIN_POLICIES
+        )
+        sources.append({
+            'kind': 'group', 'name': group.get('name'), 'target': group,
+            'members': members,
+            'interval': _seconds(group.get('interval'), DEFAULT_GROUP_INTERVAL),
+            'lazy': group.get('lazy', True) is not False
+        })
+    return sources
+
+
+def probes_per_hour(sources: List[Dict], urltest_interval: int = 0,
+                    floor: int = 0, idle: bool = False,
+                    kinds: Tuple[str, ...] = PROBE_KINDS) -> float:
+    """
+    每小时测速次数
+    floor: 间隔下限，只作用于 kinds 中的来源
+    idle: 只计非 lazy 的来源（无流量时）；默认按全部策略组都在使用估算
+    """
+    total = 0.0
+    for source in sources:
+        if idle and source['lazy']:
+            continue
+        interval = source['interval']
+        if source['kind'] == 'group' and urltest_interval:
+            interval = urltest_interval
+        if source['kind'] in kinds:
+            interval = max(interval, floor)
+        total += source['members'] * 3600 / max(interval, 1)
+    return total
+
+
+def probe_floor(sources: List[Dict], budget: float, urltest_interval: int = 0,
+                kinds: Tuple[str, ...] = PROBE_KINDS) -> int:
+    """
+    满足预算的最小间隔下限（整分钟，最大 MAX_PROBE_FLOOR）；
+    已满足、或只提升 kinds 中的来源无法满足（如测速主要来自 health-check）时返回 0
+    """
+    if budget <= 0:
+        raise ValueError(f"Probe budget must be positive: {budget}")
+    if probes_per_hour(sources, urltest_interval) <= budget:
+        return 0
+    if probes_per_hour(sources, urltest_interval, MAX_PROBE_FLOOR, kinds=kinds) > budget:
+        logging.getLogger(__name__).warning(
+            f"Probe budget {budget:g}/h cannot be met by raising {'/'.join(kinds)} intervals")
+        return 0
+    low, high = 1, MAX_PROBE_FLOOR
+    while low < high:
+        middle = (low + high) // 2
+        if probes_per_hour(sources, urltest_interval, middle, kinds=kinds) <= budget:
+            high = middle
+        else:
+            low = middle + 1
+    return -(-low // 60) * 60
+
+
+def normalize(config: Dict, budget: float, urltest_interval: int = 0,
+              nodes_per_provider: int = DEFAULT_NODES_PER_PROVIDER) -> Dict:
+    """原地把低于下限的 health-check/策略组 interval 提升到下限"""
+    sources = probe_sources(config, nodes_per_provider)
+    before = probes_per_hour(sources, urltest_interval)
+    floor = probe_floor(sources, budget, urltest_interval)
+    if floor:
+        for source in sources:
+            if source['interval'] < floor:
+                source['target']['interval'] = floor
+    return {
+        'floor': floor,
+        'before': round(before, 1),
+        'after': round(probes_per_hour(sources, urltest_interval, floor), 1)
+    }
+
+
+def estimate(config: Dict, settings: Dict[str, str],
+             nodes_per_provider: int = DEFAULT_NODES_PER_PROVIDER) -> Dict:
+    """单个配置在某个变体下的测速/下载估算"""
+    urltest = _seconds(settings.get('URLTEST_INTERVAL_MOD'), 0)
+    sources = probe_sources(config, nodes_per_provider)
+    fetches = {**provider_fetches(config), **variant_fetches(settings)}
+    return {
+        'probes_per_hour': round(probes_per_hour(sources, urltest), 1),
+        'probes_per_hour_idle': round(probes_per_hour(sources, urltest, idle=True), 1),
+        'fetches_per_day': {key: round(value, 2) for key, value in fetches.items()},
+        'fetches_per_day_total': round(sum(fetches.values()), 2)
+    }
+
+
+def main():
+    # 覆写设置来自实际渲染的模板；生成器导入本模块，这里延迟导入
+    from overwrite_generator import OverwriteGenerator
+
+    parser = argparse.ArgumentParser(description='Estimate probe and fetch load per config and variant')
+    parser.add_argument('--input', '-i', type=Path, required=True,
+                       help='Processed config file or directory')
+    parser.add_argument('--templates', '-t', type=Path, default=Path('templates'))
+    parser.add_argument('--config-types', '-c', type=Path,
+                       default=Path('src/config_types.json'))
+    parser.add_argument('--nodes-per-provider', type=int, default=DEFAULT_NODES_PER_PROVIDER,
+                       help='Assumed nodes per proxy provider')
+    parser.add_argument('--probe-budget', type=float,
+                       help='Estimate after normalizing to this many probes/hour per config')
+    parser.add_argument('--json', type=Path, help='Write the per-variant estimates as JSON')
+    parser.add_argument('--verbose', '-v', action='store_true')
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format='%(levelname)s: %(message)s'
+    )
+
+    generator = OverwriteGenerator(args.templates, args.config_types,
+                                   probe_budget=args.probe_budget)
+    settings = generator.variant_settings()
+    files = [args.input] if args.input.is_file() else sorted(
+        p for p in args.input.glob('**/*.yaml') if not is_minified(p)
+    )
+
+    report = {}
+    fleet = {'probes_per_hour': 0.0, 'fetches_per_day': 0.0}
+    for path in files:
+        with open(path, 'r', encoding='utf-8') as f:
+            config = yaml_io.safe_load(f) or {}
+        if args.probe_budget:
+            # 与流水线一致：先按处理阶段改写 YAML，再由生成阶段调整 URLTEST_INTERVAL_MOD
+            normalize(config, args.probe_budget, nodes_per_provider=args.nodes_per_provider)
+        variants = {}
+        for config_def in generator.config_types:
+            variant = dict(settings[config_def['name']])
+            urltest = generator.urltest_interval(config, config_def)
+            if urltest:
+                variant['URLTEST_INTERVAL_MOD'] = str(urltest)
+            variants[config_def['name']] = estimate(config, variant, args.nodes_per_provider)
+            if urltest:
+                variants[config_def['name']]['urltest_interval'] = urltest
+        report[str(path)] = variants
+
+        probes = [v['probes_per_hour'] for v in variants.values()]
+        fetches = [v['fetches_per_day_total'] for v in variants.values()]
+        fleet['probes_per_hour'] += max(probes)
+        fleet['fetches_per_day'] += max(fetches)
+        print(f"{path}: probes/h {min(probes):g}-{max(probes):g}, "
+              f"fetches/day {min(fetches):g}-{max(fetches):g}")
+
+    print(f"\nTotal (worst variant per config): {fleet['probes_per_hour']:.0f} probes/h, "
+          f"{fleet['fetches_per_day']:.1f} fetches/day")
+    if args.json:
+        args.json.write_text(json.dumps(report, ensure_ascii=False, indent=2) + '\n',
+                             encoding='utf-8')
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+File Watcher - 轮询监视目录/文件的变化（pipeline.py --watch 使用）
+按 mtime 与大小比较快照，不依赖 inotify，在容器、网络文件系统中同样可用；
+目录只扫描关心的后缀，几十个文件的一次轮询在毫秒以内。
+"""
+import os
+import time
+import logging
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Set, Tuple
+
+# 默认关心的后缀：YAML 配置、模板、变体定义
+WATCH_SUFFIXES = ('.yaml', '.yml', '.j2', '.json')
+DEFAULT_INTERVAL = 1.0
+# 检测到变化后再等待的时间（编辑器保存时可能分几次写入）
+DEFAULT_SETTLE = 0.2
+
+Snapshot = Dict[Path, Tuple[int, int]]
+
+
+class PollingWatcher:
+    def __init__(self, paths: Iterable[Path], suffixes: Tuple[str, ...] = WATCH_SUFFIXES):
+        self.paths = list(paths)
+        self.suffixes = suffixes
+        self.logger = logging.getLogger(__name__)
+        self.state: Snapshot = self.snapshot()
+
+    def _scan(self, directory: Path, result: Snapshot):
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            return
+        for entry in entries:
+            if entry.name.startswith('.'):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                self._scan(Path(entry.path), result)
+            elif entry.name.endswith(self.suffixes):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                result[Path(entry.path)] = (stat.st_mtime_ns, stat.st_size)
+
+    def snapshot(self) -> Snapshot:
+        """全部被监视文件的 (mtime, 大小)；不存在的路径忽略"""
+        result: Snapshot = {}
+        for path in self.paths:
+            if path.is_dir():
+                self._scan(path, result)
+            elif path.is_file():
+                stat = path.stat()
+                result[path] = (stat.st_mtime_ns, stat.st_size)
+        return result
+
+    def changes(self) -> Set[Path]:
+        """自上一次调用以来新增、修改或删除的文件"""
+        current = self.snapshot()
+        changed = {p for p in set(current) | set(self.state)
+                   if current.get(p) != self.state.get(p)}
+        self.state = current
+        return changed
+
+    def wait(self, interval: float = DEFAULT_INTERVAL, settle: float = DEFAULT_SETTLE,
+             timeout: Optional[float] = None,
+             sleep: Callable[[float], None] = time.sleep) -> Set[Path]:
+        """阻塞到有文件变化（并在 settle 内不再变化）为止；超时返回空集合"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        changed: Set[Path] = set()
+        while True:
+            found = self.changes()
+            if found:
+                changed |= found
+                sleep(settle)
+                continue
+            if changed:
+                return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return changed
+            sleep(interval)
@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""
+Filter Regex - proxy-providers / proxy-groups 的 filter、exclude-filter 分析
+  编译校验：mihomo（regexp2）允许在表达式中间写 (?i)，作用到所在分组结束，
+            这里先改写为 Python 的 (?i:...) 再编译
+  基准测试：在合成的节点名上逐个 search（与 mihomo 的 MatchString 一致）
+  超线性检测：嵌套量词 + 名称变长 4 倍时的耗时增长
+  等价改写：^(?!.*X).*$、^((?!X).)*$ -> exclude-filter: X
+            (?=.*X).*$                 -> filter: X
+            ^(?=.*X)(?!.*Y).*$         -> filter: X + exclude-filter: Y
+            ^(.*)、.*                  -> 删除 filter
+  改写前后在合成名称（含从表达式中提取的字面量）上的过滤结果必须完全一致。
+"""
+import re
+import math
+import json
+import time
+import random
+import argparse
+import logging
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import yaml_io
+from minify import is_minified
+
+# 分析/改写逻辑变化时递增，使增量构建的旧结果失效
+FILTER_REGEX_VERSION = '1'
+
+FILTER_KEYS = ('filter', 'exclude-filter')
+DEFAULT_NAME_COUNT = 10000
+# 名称长度增长 4 倍时耗时增长指数超过此值视为超线性
+SUPERLINEAR_EXPONENT = 1.5
+
+_INLINE_FLAGS = re.compile(r'\(\?([a-zA-Z]*(?:-[a-zA-Z]+)?)\)')
+_NESTED_QUANTIFIER = re.compile(r'\((?:[^()\\]|\\.)*[*+](?:[^()\\]|\\.)*\)[*+{]')
+_LITERAL_RUN = re.compile(r'[^\\()|.*+?^$\[\]{}]+')
+
+REGIONS = [
+    ('🇭🇰', '香港', 'HK', 'Hong Kong'), ('🇹🇼', '台湾', 'TW', 'Taiwan'),
+    ('🇯🇵', '日本', 'JP', 'Tokyo'), ('🇸🇬', '新加坡', 'SG', 'Singapore'),
+    ('🇺🇸', '美国', 'US', 'Los Angeles'), ('🇰🇷', '韩国', 'KR', 'Seoul'),
+    ('🇬🇧', '英国', 'UK', 'London'), ('🇩🇪', '德国', 'DE', 'Frankfurt'),
+    ('🇫🇷', '法国', 'FR', 'Paris'), ('🇳🇱', '荷兰', 'NL', 'Amsterdam'),
+]
+TAGS = ['', 'IPLC', 'IEPL', '专线', '家宽', 'BGP', 'Premium', '原生', 'x0.5', '5x', '2.0x']
+INFO_NAMES = [
+    '剩余流量：{n}.5 GB', '套餐到期：2026-0{d}-1{d}', '距离下次重置剩余：{d} 天',
+    '官网 https://example{n}.com', '最新网址：example{n}.net', '客服 QQ 群 {n}',
+    '订阅更新时间 {d}:00', 'Traffic: {n} GB', 'Expire: 2026-0{d}-01', '🟢 直连', 'DIRECT',
+]
+
+
+def translate(pattern: str) -> str:
+    """
+    mihomo 语法 -> Python：表达式中间的 (?flags) 只作用到所在分组结束，
+    改写为 (?flags:...) 包住该分组的剩余部分
+    """
+    out = []
+    pending = [0]          # 每层分组待补的 ')'
+    in_class = False
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == '\\':
+            out.append(pattern[i:i + 2])
+            i += 2
+            continue
+        if in_class:
+            in_class = ch != ']'
+        elif ch == '[':
+            in_class = True
+        elif ch == '(':
+            match = _INLINE_FLAGS.match(pattern, i)
+            if match and match.group(1):
+                if i == 0:
+                    out.append(match.group(0))
+                else:
+                    out.append(f'(?{match.group(1)}:')
+                    pending[-1] += 1
+                i = match.end()
+                continue
+            pending.append(0)
+        elif ch == ')' and len(pending) > 1:
+            out.append(')' * pending.pop())
+        out.append(ch)
+        i += 1
+    out.append(')' * pending[0])
+    return ''.join(out)
+
+
+def compile_filter(pattern: str) -> List[re.Pattern]:
+    """编译 filter；mihomo 允许用 ` 分隔多个表达式（任一匹配即可）"""
+    return [re.compile(translate(part)) for part in str(pattern).split('`')]
+
+
+@lru_cache(maxsize=None)
+def filter_error(pattern: str) -> Optional[str]:
+    """无法编译时返回错误信息"""
+    try:
+        compile_filter(pattern)
+    except re.error as e:
+        return str(e)
+    return None
+
+
+def invalid_filters(config: Dict) -> List[Tuple[str, str, str]]:
+    """(位置, 键, 错误)：无法编译的 filter / exclude-filter（mihomo 加载时会报错）"""
+    return [(location, key, error) for location, entry, key in collect_filters(config)
+            for error in [filter_error(str(entry[key]))] if error]
+
+
+def filter_matches(regexes: List[re.Pattern], name: str) -> bool:
+    return any(regex.search(name) for regex in regexes)
+
+
+def collect_filters(config: Dict) -> Iterable[Tuple[str, Dict, str]]:
+    """(位置, 所在字典, 键)：proxy-providers 与 proxy-groups 中的 filter / exclude-filter"""
+    for name, provider in (config.get('proxy-providers') or {}).items():
+        if isinstance(provider, dict):
+            for key in FILTER_KEYS:
+                if provider.get(key):
+                    yield f'proxy-providers/{name}', provider, key
+    for group in config.get('proxy-groups') or []:
+        if isinstance(group, dict):
+            for key in FILTER_KEYS:
+                if group.get(key):
+                    yield f"proxy-groups/{group.get('name')}", group, key
+
+
+def synthetic_names(count: int = DEFAULT_NAME_COUNT, seed: int = 1,
+                    extra: Iterable[str] = ()) -> List[str]:
+    """合成订阅节点名：地区/城市/编号/线路标签，另有约 5% 的流量/到期等信息节点"""
+    rng = random.Random(seed)
+    names = []
+    for i in range(count):
+        if rng.random() < 0.05:
+            names.append(rng.choice(INFO_NAMES).format(n=rng.randint(1, 999), d=rng.randint(1, 9)))
+            continue
+        flag, zh, code, city = rng.choice(REGIONS)
+        parts = [
+            rng.choice([flag + ' ', '']),
+            rng.choice([zh, code, city, f'{zh} {city}', f'{code}-{city}']),
+            rng.choice([f' {i % 100:02d}', f'-{i % 50}', f' {code}{i % 20}', '']),
+            rng.choice(['', ' ' + rng.choice(TAGS)]),
+        ]
+        names.append(''.join(parts).strip())
+    # 表达式中出现的字面量单独及嵌入普通名称中各出现一次，覆盖每个分支
+    for word in extra:
+        names.append(word)
+        names.append(f'{rng.choice(REGIONS)[0]} {word} {rng.randint(1, 99)}')
+    return names
+
+
+def literals(pattern: str) -> List[str]:
+    """表达式中的字面量片段（用于构造测试名称）"""
+    text = re.sub(r'\(\?[a-zA-Z:=!<-]*', '(', pattern)
+    return sorted({run.strip() for run in _LITERAL_RUN.findall(text) if run.strip()})
+
+
+def time_per_name(regexes: List[re.Pattern], names: List[str], repeat: int = 3) -> float:
+    """每个名称的平均 search 耗时（秒，取多次中最快的一次）"""
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for name in names:
+            filter_matches(regexes, name)
+        best = min(best, time.perf_counter() - start)
+    return best / max(len(names), 1)
+
+
+def growth_exponent(regexes: List[re.Pattern], length: int = 64) -> float:
+    """名称长度由 length 增至 4*length 时耗时的增长指数（1 ≈ 线性，2 ≈ 平方）"""
+    def timing(size):
+        name = 'q' * size
+        runs = max(3, 2000 // size)
+        return time_per_name(regexes, [name] * runs, repeat=3)
+
+    short, long = timing(length), timing(length * 4)
+    if short <= 0:
+        return 0.0
+    return math.log(max(long, 1e-12) / short, 4)
+
+
+def _group_end(pattern: str, start: int) -> int:
+    """pattern[start] 为 '('，返回匹配的 ')' 下标；不匹配时返回 -1"""
+    depth, in_class, i = 0, False, start
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == '\\':
+            i += 2
+            continue
+        if in_class:
+            in_class = ch != ']'
+        elif ch == '[':
+            in_class = True
+        elif ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+            if depth == 0:
+                return i
+        i += 1
+    return -1
+
+
+def _atoms(pattern: str) -> Optional[List[str]]:
+    """拆分顶层：^、$、.*、分组（含其后的量词）；其他写法返回 None"""
+    atoms, i = [], 0
+    while i < len(pattern):
+        if pattern[i] in '^$':
+            atoms.append(pattern[i])
+            i += 1
+        elif pattern.startswith('.*', i):
+            atoms.append('.*')
+            i += 2
+        elif pattern[i] == '(':
+            end = _group_end(pattern, i)
+            if end < 0:
+                return None
+            if end + 1 < len(pattern) and pattern[end + 1] in '*+?':
+                end += 1
+            atoms.append(pattern[i:end + 1])
+            i = end + 1
+        else:
+            return None
+    return atoms
+
+
+def suggest_rewrite(pattern: str) -> Optional[Dict[str, Optional[str]]]:
+    """
+    识别可改写的 filter 写法，返回 {'filter': X 或 None, 'exclude-filter': Y 或 None}
+    （两者皆为 None 表示匹配全部节点，可删除 filter）；无法识别时返回 None
+    """
+    if '`' in pattern:
+        return None
+    prefix = ''
+    match = _INLINE_FLAGS.match(pattern)
+    if match:
+        prefix, pattern = match.group(0), pattern[match.end():]
+    atoms = _atoms(pattern)
+    if atoms is None:
+        return None
+    anchored = atoms[:1] == ['^']
+    if anchored:
+        atoms = atoms[1:]
+    # 结尾的 .*、.*$、(.*)、(.*)$ 总能匹配
+    if atoms[-2:] in (['.*', '$'], ['(.*)', '$']):
+        atoms = atoms[:-2]
+    elif atoms[-1:] in (['.*'], ['(.*)']):
+        atoms = atoms[:-1]
+
+    include, exclude = [], []
+    # ^((?!X).)*$：每个位置都不能匹配 X，须首尾都锚定
+    tempered = re.fullmatch(r'\((?:\?:)?\(\?!(.+)\)\.\)\*', atoms[-2]) if len(atoms) > 1 else None
+    if tempered and anchored and atoms[-1] == '$':
+        exclude.append(tempered.group(1))
+        atoms = atoms[:-2]
+    for atom in atoms:
+        if atom.startswith('(?=.*') and atom.endswith(')'):
+            include.append(atom[5:-1])
+        elif atom.startswith('(?!.*') and atom.endswith(')') and anchored:
+            exclude.append(atom[5:-1])
+        else:
+            return None
+    if len(include) > 1 or len(exclude) > 1:
+        return None
+    return {
+        'filter': prefix + include[0] if include else None,
+        'exclude-filter': prefix + exclude[0] if exclude else None,
+    }
+
+
+def rewrite_keeps(rewrite: Dict[str, Optional[str]]):
+    """改写结果对应的判定函数：名称是否保留"""
+    include = compile_filter(rewrite['filter']) if rewrite['filter'] else None
+    exclude = compile_filter(rewrite['exclude-filter']) if rewrite['exclude-filter'] else None
+
+    def keep(name: str) -> bool:
+        if include is not None and not filter_matches(include, name):
+            return False
+        return exclude is None or not filter_matches(exclude, name)
+    return keep
+
+
+def analyze_filter(pattern: str, names: List[str]) -> Dict:
+    """编译、基准测试、超线性检测，并给出经等价验证的改写"""
+    result = {'pattern': pattern}
+    try:
+        regexes = compile_filter(pattern)
+    except re.error as e:
+        result['error'] = str(e)
+        return result
+
+    result['us_per_name'] = round(time_per_name(regexes, names) * 1e6, 3)
+    result['kept'] = sum(1 for name in names if filter_matches(regexes, name))
+    result['nested_quantifier'] = bool(_NESTED_QUANTIFIER.search(pattern))
+    result['growth'] = round(growth_exponent(regexes), 2)
+    result['superlinear'] = result['nested_quantifier'] or result['growth'] > SUPERLINEAR_EXPONENT
+
+    rewrite, mismatch = verified_rewrite(pattern, names)
+    if rewrite is None:
+        return result
+    result['rewrite'] = rewrite
+    result['equivalent'] = mismatch is None
+    if mismatch is not None:
+        result['mismatch_example'] = mismatch
+        return result
+    rewritten = [r for key in FILTER_KEYS if rewrite[key] for r in compile_filter(rewrite[key])]
+    rewrite_time = time_per_name(rewritten, names) if rewritten else 0.0
+    result['rewrite_us_per_name'] = round(rewrite_time * 1e6, 3)
+    return result
+
+
+def verified_rewrite(pattern: str, names: List[str]) -> Tuple[Optional[Dict], Optional[str]]:
+    """(改写, 第一个结果不一致的名称)；无法改写时返回 (None, None)"""
+    rewrite = suggest_rewrite(pattern)
+    if rewrite is None:
+        return None, None
+    try:
+        regexes = compile_filter(pattern)
+        keep = rewrite_keeps(rewrite)
+    except re.error:
+        return None, None
+    for name in names + synthetic_names(0, extra=literals(pattern)):
+        if keep(name) != filter_matches(regexes, name):
+            return rewrite, name
+    return rewrite, None
+
+
+def rewrite_filters(config: Dict, names: List[str],
+                    cache: Optional[Dict[str, Optional[Dict]]] = None) -> List[Dict]:
+    """
+    原地把 filter 改写为等价且更快的写法，返回改动记录。
+    是否改写只取决于写法（不看计时），保证同样的输入得到同样的输出：
+    同时含包含与排除条件的 ^(?=.*X)(?!.*Y).*$ 本身是线性的，拆成两个表达式并不更快，保留原样；
+    已有 exclude-filter 时不再生成新的 exclude-filter（两者无法安全合并）。
+    """
+    cache = {} if cache is None else cache
+    changes = []
+    for location, entry, key in list(collect_filters(config)):
+        # 锚点共用的字典可能已在前面改写过
+        if key != 'filter' or not entry.get('filter'):
+            continue
+        pattern = str(entry['filter'])
+        if pattern not in cache:
+            rewrite, mismatch = verified_rewrite(pattern, names)
+            cache[pattern] = rewrite if mismatch is None else None
+        rewrite = cache[pattern]
+        if rewrite is None or (rewrite['filter'] and rewrite['exclude-filter']):
+            continue
+        if rewrite['exclude-filter'] and entry.get('exclude-filter'):
+            continue
+        if rewrite['filter']:
+            entry['filter'] = rewrite['filter']
+        else:
+            del entry['filter']
+        if rewrite['exclude-filter']:
+            entry['exclude-filter'] = rewrite['exclude-filter']
+        changes.append({'location': location, 'from': pattern, 'to': rewrite})
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Validate and benchmark filter regexes')
+    parser.add_argument('--input', '-i', type=Path, required=True,
+                       help='Processed config file or directory')
+    parser.add_argument('--names', type=int, default=DEFAULT_NAME_COUNT,
+                       help='Synthetic node names to benchmark against')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', type=Path, help='Write per-pattern results as JSON')
+    parser.add_argument('--verbose', '-v', action='store_true')
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format='%(levelname)s: %(message)s'
+    )
+
+    files = [args.input] if args.input.is_file() else sorted(
+        p for p in args.input.glob('**/*.yaml') if not is_minified(p)
+    )
+    usage: Dict[str, List[str]] = {}
+    for path in files:
+        with open(path, 'r', encoding='utf-8') as f:
+            config = yaml_io.safe_load(f) or {}
+        for location, entry, key in collect_filters(config):
+            usage.setdefault(str(entry[key]), []).append(f'{path}:{location}:{key}')
+
+    names = synthetic_names(args.names, args.seed)
+    results = []
+    for pattern, places in usage.items():
+        result = analyze_filter(pattern, names)
+        result['used'] = len(places)
+        results.append(result)
+    # 按总耗时（单次耗时 × 使用次数）排序
+    results.sort(key=lambda r: -r.get('us_per_name', 0) * r['used'])
+
+    errors = [r for r in results if 'error' in r]
+    for r in results:
+        short = r['pattern'] if len(r['pattern']) <= 80 else r['pattern'][:77] + '...'
+        if 'error' in r:
+            print(f"❌ {short}\n   {r['error']}")
+            continue
+        line = f"{r['us_per_name']:8.2f} µs ×{r['used']:<3} growth {r['growth']:.2f}"
+        if r['superlinear']:
+            line += ' ⚠️ super-linear'
+        if r.get('equivalent'):
+            line += f" → {r['rewrite_us_per_name']:.2f} µs"
+        print(f"{line}  {short}")
+
+    rewritable = [r for r in results if r.get('equivalent')]
+    print(f"\n{len(results)} unique filters, {len(errors)} invalid, "
+          f"{sum(1 for r in results if r.get('superlinear'))} super-linear, "
+          f"{len(rewritable)} with an equivalent rewrite")
+    if args.json:
+        args.json.write_text(json.dumps(results, ensure_ascii=False, indent=2) + '\n',
+                             encoding='utf-8')
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    exit(main())
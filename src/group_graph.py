@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Group Graph - proxy-groups 依赖图分析
+  节点：策略组；边：proxies 中引用的策略组、dialer-proxy
+  根：规则及 sub-rules 中各子规则的目标、rule-providers/proxy-providers 中的 proxy / dialer-proxy
+检测循环引用与悬空引用，并可删除从根不可达的策略组
+（每个 url-test/fallback 组都会在路由器上定期测速）。
+"""
+import argparse
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, List, Set
+
+import yaml_io
+from minify import is_minified
+from rule_parser import parse_rule
+
+# 分析逻辑变化时递增，使增量构建的旧结果失效
+GRAPH_VERSION = '2'
+
+BUILTIN_POLICIES = {'DIRECT', 'REJECT', 'REJECT-DROP', 'PASS', 'COMPATIBLE'}
+# GLOBAL 只在全局模式下使用：保留，但不作为根（它通常包含全部策略组）
+GLOBAL_GROUP = 'GLOBAL'
+PROBING_TYPES = {'url-test', 'fallback', 'load-balance', 'smart'}
+# 目标为 sub-rules 中的子规则名，而不是策略组
+SUB_RULE_TYPE = 'SUB-RULE'
+
+
+def _provider_refs(providers: Dict) -> Iterable[str]:
+    """providers 中引用策略组的字段（proxy、override.dialer-proxy）"""
+    for provider in (providers or {}).values():
+        if not isinstance(provider, dict):
+            continue
+        if isinstance(provider.get('proxy'), str):
+            yield provider['proxy']
+        override = provider.get('override')
+        if isinstance(override, dict) and isinstance(override.get('dialer-proxy'), str):
+            yield override['dialer-proxy']
+
+
+class GroupGraph:
+    def __init__(self, config: Dict):
+        self.groups: List[Dict] = [g for g in config.get('proxy-groups') or []
+                                   if isinstance(g, dict) and 'name' in g]
+        self.names: Set[str] = {str(g['name']) for g in self.groups}
+        # 处理后的配置不含 proxies（节点来自订阅），此时无法判断节点名是否存在
+        self.has_proxies = 'proxies' in config
+        self.proxy_names: Set[str] = {str(p.get('name')) for p in config.get('proxies') or []
+                                      if isinstance(p, dict)}
+        self.proxy_providers = config.get('proxy-providers') or {}
+        self.edges: Dict[str, List[str]] = {}
+        # 悬空引用：(来源, 引用名, 类别)
+        self.dangling: List[tuple] = []
+        # 非策略组、非内置策略的引用（应为订阅中的节点）
+        self.external: Set[str] = set()
+        self.roots: List[str] = []
+
+        for group in self.groups:
+            name = str(group['name'])
+            refs = []
+            for ref in group.get('proxies') or []:
+                ref = str(ref)
+                if ref in self.names:
+                    refs.append(ref)
+                elif ref not in BUILTIN_POLICIES:
+                    self._external(name, ref, 'proxy')
+            dialer = group.get('dialer-proxy')
+            if isinstance(dialer, str):
+                if dialer in self.names:
+                    refs.append(dialer)
+                else:
+                    self._external(name, dialer, 'dialer-proxy')
+            for provider in group.get('use') or []:
+                if provider not in self.proxy_providers:
+                    self.dangling.append((name, str(provider), 'provider'))
+            self.edges[name] = refs
+
+        seen = set()
+        sub_rules = config.get('sub-rules')
+        rules = list(config.get('rules') or [])
+        if isinstance(sub_rules, dict):
+            for entries in sub_rules.values():
+                rules.extend(entries or [])
+        for raw in rules:
+            rule = parse_rule(raw)
+            if rule is None or not rule.target:
+                continue
+            if rule.type == SUB_RULE_TYPE:
+                if not isinstance(sub_rules, dict) or rule.target not in sub_rules:
+                    self.dangling.append(('rules', rule.target, 'sub-rule'))
+                continue
+            if rule.target in self.names:
+                if rule.target not in seen:
+                    seen.add(rule.target)
+                    self.roots.append(rule.target)
+            elif rule.target not in BUILTIN_POLICIES:
+                self._external('rules', rule.target, 'rule-target')
+
+        for ref in list(_provider_refs(config.get('rule-providers'))) + \
+                list(_provider_refs(self.proxy_providers)):
+            if ref in self.names and ref not in seen:
+                seen.add(ref)
+                self.roots.append(ref)
+
+    def _external(self, source: str, ref: str, kind: str):
+        if ref in self.proxy_names:
+            return
+        if self.has_proxies:
+            self.dangling.append((source, ref, kind))
+        else:
+            self.external.add(ref)
+
+    def reachable(self) -> Set[str]:
+        """从根可达的策略组"""
+        visited: Set[str] = set()
+        stack = list(self.roots)
+        while stack:
+            name = stack.pop()
+            if name in visited:
+                continue
+            visited.add(name)
+            stack.extend(self.edges.get(name, []))
+        return visited
+
+    def cycles(self) -> List[List[str]]:
+        """策略组之间的循环引用（mihomo 会拒绝加载）"""
+        WHITE, GREY, BLACK = 0, 1, 2
+        color = {name: WHITE for name in self.edges}
+        found = []
+        for start in self.edges:
+            if color[start] != WHITE:
+                continue
+            path = [start]
+            iters = [iter(self.edges[start])]
+            color[start] = GREY
+            while iters:
+                child = next(iters[-1], None)
+                if child is None:
+                    color[path.pop()] = BLACK
+                    iters.pop()
+                elif color.get(child) == GREY:
+                    found.append(path[path.index(child):] + [child])
+                elif color.get(child) == WHITE:
+                    color[child] = GREY
+                    path.append(child)
+                    iters.append(iter(self.edges[child]))
+        return found
+
+    def unreachable(self) -> List[str]:
+        """不可达的策略组（按声明顺序，GLOBAL 除外）"""
+        live = self.reachable()
+        return [str(g['name']) for g in self.groups
+                if str(g['name']) not in live and g['name'] != GLOBAL_GROUP]
+
+    def stats(self) -> Dict:
+        unreachable = set(self.unreachable())
+        probing = [g for g in self.groups if g.get('type') in PROBING_TYPES]
+        return {
+            'groups': len(self.groups),
+            'reachable': len(self.groups) - len(unreachable),
+            'probing': len(probing),
+            'probing_reachable': sum(1 for g in probing if g['name'] not in unreachable),
+            'unreachable': sorted(unreachable),
+            'external': sorted(self.external),
+            'cycles': self.cycles(),
+            'dangling': [{'from': src, 'ref': ref, 'kind': kind}
+                         for src, ref, kind in self.dangling]
+        }
+
+
+def prune_groups(config: Dict) -> List[str]:
+    """原地删除不可达的策略组，返回被删除的名称"""
+    graph = GroupGraph(config)
+    removed = graph.unreachable()
+    if removed:
+        dropped = set(removed)
+        config['proxy-groups'][:] = [
+            g for g in config['proxy-groups']
+            if not (isinstance(g, dict) and g.get('name') in dropped)
+        ]
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Analyze proxy-group references')
+    parser.add_argument('--input', '-i', type=Path, required=True,
+                       help='Processed config file or directory')
+    parser.add_argument('--verbose', '-v', action='store_true')
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format='%(levelname)s: %(message)s'
+    )
+
+    files = [args.input] if args.input.is_file() else sorted(
+        p for p in args.input.glob('**/*.yaml') if not is_minified(p)
+    )
+    totals = {'groups': 0, 'reachable': 0, 'probing': 0, 'probing_reachable': 0}
+    problems = 0
+    for path in files:
+        with open(path, 'r', encoding='utf-8') as f:
+            config = yaml_io.safe_load(f) or {}
+        stats = GroupGraph(config).stats()
+        for key in totals:
+            totals[key] += stats[key]
+        print(f"{path}: groups {stats['groups']} → {stats['reachable']}, "
+              f"probing {stats['probing']} → {stats['probing_reachable']}")
+        for name in stats['unreachable']:
+            print(f"  - unreachable: {name}")
+        for cycle in stats['cycles']:
+            problems += 1
+            print(f"  ❌ cycle: {' → '.join(cycle)}")
+        if stats['external']:
+            logging.debug(f"  external refs: {', '.join(stats['external'])}")
+        for item in stats['dangling']:
+            problems += 1
+            print(f"  ⚠️  dangling {item['kind']}: {item['from']} → {item['ref']}")
+
+    print(f"\nTotal: groups {totals['groups']} → {totals['reachable']}, "
+          f"probing {totals['probing']} → {totals['probing_reachable']}")
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    exit(main())
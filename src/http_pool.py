@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+HTTP Pool - asyncio 下的 HTTP/1.1 连接池（仅用标准库）
+  按 (协议, 主机, 端口) 复用 keep-alive 连接；http.client 是阻塞 API，请求在线程中执行，
+  并发数由信号量限制。支持 gzip、重定向，复用的连接被服务端关闭时自动重连一次。
+"""
+import gzip
+import ssl
+import time
+import asyncio
+import threading
+import http.client
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_TIMEOUT = 30
+MAX_REDIRECTS = 5
+USER_AGENT = 'openclash-overwrite-sync'
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+
+
+@dataclass
+class Response:
+    status: int
+    url: str
+    # 键为小写
+    headers: Dict[str, str] = field(default_factory=dict)
+    body: bytes = b''
+    # 从发出请求到读完响应的秒数（不含排队等待）
+    elapsed: float = 0.0
+
+
+class HTTPPool:
+    def __init__(self, concurrency: int = DEFAULT_CONCURRENCY, timeout: float = DEFAULT_TIMEOUT,
+                 headers: Optional[Dict[str, str]] = None):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.headers = {'User-Agent': USER_AGENT, 'Accept-Encoding': 'gzip', **(headers or {})}
+        self._idle: Dict[Tuple[str, str, int], List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._ssl = ssl.create_default_context()
+        self.stats = {'requests': 0, 'connections': 0, 'reused': 0}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+    def _connect(self, key: Tuple[str, str, int]) -> http.client.HTTPConnection:
+        scheme, host, port = key
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self.stats['reused'] += 1
+                return idle.pop()
+            self.stats['connections'] += 1
+        if scheme == 'https':
+            return http.client.HTTPSConnection(host, port, timeout=self.timeout, context=self._ssl)
+        return http.client.HTTPConnection(host, port, timeout=self.timeout)
+
+    def _release(self, key: Tuple[str, str, int], conn: http.client.HTTPConnection):
+        with self._lock:
+            self._idle.setdefault(key, []).append(conn)
+
+    def _request_once(self, method: str, url: str, headers: Dict[str, str]) -> Response:
+        parts = urlsplit(url)
+        scheme = parts.scheme or 'http'
+        port = parts.port or (443 if scheme == 'https' else 80)
+        key = (scheme, parts.hostname, port)
+        path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+
+        for attempt in range(2):
+            conn = self._connect(key)
+            reused = conn.sock is not None
+            try:
+                conn.request(method, path, headers=headers)
+                resp = conn.getresponse()
+                body = resp.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                # 空闲连接可能已被服务端关闭：重连一次
+                if reused and attempt == 0:
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                raise
+            if resp.will_close:
+                conn.close()
+            else:
+                self._release(key, conn)
+            if resp.getheader('Content-Encoding', '').lower() == 'gzip':
+                body = gzip.decompress(body)
+            return Response(resp.status, url,
+                            {k.lower(): v for k, v in resp.getheaders()}, body)
+        raise RuntimeError("unreachable")
+
+    def request_sync(self, method: str, url: str,
+                     headers: Optional[Dict[str, str]] = None) -> Response:
+        """阻塞请求（跟随重定向）"""
+        merged = {**self.headers, **(headers or {})}
+        start = time.perf_counter()
+        for _ in range(MAX_REDIRECTS + 1):
+            with self._lock:
+                self.stats['requests'] += 1
+            response = self._request_once(method, url, merged)
+            if response.status not in REDIRECT_STATUSES or 'location' not in response.headers:
+                response.elapsed = time.perf_counter() - start
+                return response
+            url = urljoin(url, response.headers['location'])
+        raise http.client.HTTPException(f"Too many redirects: {url}")
+
+    async def request(self, method: str, url: str,
+                      headers: Optional[Dict[str, str]] = None) -> Response:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            return await asyncio.to_thread(self.request_sync, method, url, headers)
+
+    async def get(self, url: str, headers: Optional[Dict[str, str]] = None) -> Response:
+        return await self.request('GET', url, headers)
+
+    def close(self):
+        with self._lock:
+            for conns in self._idle.values():
+                for conn in conns:
+                    conn.close()
+            self._idle.clear()
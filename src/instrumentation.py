@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Instrumentation - 构建过程的分阶段计时
+  span(阶段, 文件)：记录耗时、字节数、次数（按文件、按阶段汇总）
+  count(名称)：计数器
+  峰值内存：主进程与子进程（进程池）的最大 RSS
+未启用时 span/count 几乎没有开销。进程池中的记录随任务结果带回主进程合并（drain/merge）。
+"""
+import sys
+import json
+import time
+import cProfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# 报告格式变化时递增
+PROFILE_VERSION = '2'
+
+
+class Span:
+    """单次计时；调用方可在计时期间设置 bytes"""
+    __slots__ = ('bytes',)
+
+    def __init__(self):
+        self.bytes = 0
+
+
+def peak_rss_kb() -> Dict[str, int]:
+    """峰值常驻内存（KB）：本进程、已结束的子进程中最大者"""
+    if resource is None:
+        return {}
+    # macOS 的 ru_maxrss 单位为字节
+    scale = 1024 if sys.platform == 'darwin' else 1
+    return {
+        'self': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // scale,
+        'children': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss // scale,
+    }
+
+
+class Profiler:
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        # 文件 -> 阶段 -> [秒, 字节, 次数]；与具体文件无关的阶段记在 '' 下
+        self.files: Dict[str, Dict[str, list]] = {}
+        self.counters: Dict[str, int] = {}
+        # 进程池子进程上报的峰值内存
+        self.worker_peak_kb = 0
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def span(self, stage: str, file: Optional[object] = None) -> Iterator[Span]:
+        span = Span()
+        if not self.enabled:
+            yield span
+            return
+        start = time.perf_counter()
+        try:
+            yield span
+        finally:
+            entry = self.files.setdefault(str(file or ''), {}).setdefault(stage, [0.0, 0, 0])
+            entry[0] += time.perf_counter() - start
+            entry[1] += span.bytes
+            entry[2] += 1
+
+    def count(self, name: str, n: int = 1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def drain(self) -> Optional[Dict]:
+        """取出并清空已有记录（进程池子进程随任务结果返回）"""
+        if not self.enabled:
+            return None
+        data = {'files': self.files, 'counters': self.counters,
+                'peak_kb': peak_rss_kb().get('self', 0)}
+        self.files, self.counters = {}, {}
+        return data
+
+    def merge(self, data: Optional[Dict]):
+        """合并 drain() 的结果"""
+        if not data or not self.enabled:
+            return
+        for file, stages in data['files'].items():
+            target = self.files.setdefault(file, {})
+            for stage, (seconds, nbytes, calls) in stages.items():
+                entry = target.setdefault(stage, [0.0, 0, 0])
+                entry[0] += seconds
+                entry[1] += nbytes
+                entry[2] += calls
+        for name, n in data['counters'].items():
+            self.counters[name] = self.counters.get(name, 0) + n
+        self.worker_peak_kb = max(self.worker_peak_kb, data.get('peak_kb', 0))
+
+    def report(self, top: int = 20) -> Dict:
+        """汇总：各阶段总计、各文件明细（按耗时降序）、最慢的文件"""
+        stages: Dict[str, Dict] = {}
+        files = {}
+        for file, file_stages in self.files.items():
+            for stage, (seconds, nbytes, calls) in file_stages.items():
+                total = stages.setdefault(stage, {'seconds': 0.0, 'bytes': 0, 'calls': 0})
+                total['seconds'] += seconds
+                total['bytes'] += nbytes
+                total['calls'] += calls
+            if file:
+                files[file] = {
+                    'seconds': round(sum(s[0] for s in file_stages.values()), 6),
+                    'stages': {stage: {'seconds': round(seconds, 6), 'bytes': nbytes, 'calls': calls}
+                               for stage, (seconds, nbytes, calls) in file_stages.items()}
+                }
+        for total in stages.values():
+            total['seconds'] = round(total['seconds'], 6)
+
+        ordered = dict(sorted(files.items(), key=lambda item: -item[1]['seconds']))
+        memory = peak_rss_kb()
+        if self.worker_peak_kb:
+            memory['workers'] = self.worker_peak_kb
+        return {
+            'version': PROFILE_VERSION,
+            'argv': sys.argv[1:],
+            'wall_seconds': round(time.perf_counter() - self.started, 6),
+            'peak_rss_kb': memory,
+            'stages': dict(sorted(stages.items(), key=lambda item: -item[1]['seconds'])),
+            'counters': dict(sorted(self.counters.items())),
+            'slowest': [{'file': file, 'seconds': data['seconds']}
+                        for file, data in list(ordered.items())[:top]],
+            'files': ordered,
+        }
+
+    def write(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.report(), ensure_ascii=False, indent=2) + '\n',
+                        encoding='utf-8')
+
+    def summary(self) -> str:
+        """单行摘要：各阶段耗时"""
+        report = self.report(top=0)
+        parts = [f"{stage} {data['seconds']:.2f}s" for stage, data in report['stages'].items()]
+        return f"{report['wall_seconds']:.2f}s total; " + ', '.join(parts)
+
+
+@contextmanager
+def cprofile(path: Optional[Path]):
+    """path 非空时用 cProfile 记录主进程，结束后写出（可用 pstats / snakeviz 查看）"""
+    if path is None:
+        yield
+        return
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        profile.dump_stats(str(path))
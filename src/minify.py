@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Minify - 处理后配置的精简输出及预压缩文件
+  X.yaml -> X.min.yaml（重复的长字符串/子树改为锚点引用，简单列表用 flow 风格，不折行）
+         -> X.min.yaml.gz（mtime=0，可复现）/ X.min.yaml.br（需安装 brotli）
+压缩文件供支持 Content-Encoding 的镜像直接发送（如 nginx gzip_static）；
+路由器下载的仍是 .min.yaml。
+"""
+import gzip
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import yaml_io
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 精简输出格式变化时递增，使增量构建的旧结果失效
+MINIFY_VERSION = '1'
+
+MINIFIED_SUFFIX = '.min.yaml'
+COMPRESSIONS = ('gz', 'br')
+# 不折行：libyaml 与纯 Python emitter 都接受的较大宽度
+UNLIMITED_WIDTH = 1 << 20
+# 小于此长度（YAML 文本）的子树不值得改为锚点
+MIN_SHARED_SIZE = 48
+
+
+def is_minified(path: Path) -> bool:
+    return path.name.endswith(MINIFIED_SUFFIX)
+
+
+def minified_path(path: Path) -> Path:
+    return path.with_name(path.stem + MINIFIED_SUFFIX)
+
+
+def available_compressions() -> Tuple[str, ...]:
+    return COMPRESSIONS if brotli is not None else ('gz',)
+
+
+def _key(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, sort_keys=True, default=str)
+
+
+def hoist_shared(data: Any) -> Tuple[Any, Dict[str, Any]]:
+    """
+    复制数据树，相等且足够长的字符串/子树出现多次时共用同一对象，
+    返回 (新数据, 锚点名 -> 共用对象)，供 yaml_io.dump(compact=True) 输出别名。
+    映射的键保持原样。
+    """
+    counts: Dict[str, int] = {}
+
+    def count(value):
+        if isinstance(value, dict):
+            for item in value.values():
+                count(item)
+        elif isinstance(value, list):
+            for item in value:
+                count(item)
+        elif not (isinstance(value, str) and len(value) >= yaml_io.COMPACT_ALIAS_MIN_LENGTH):
+            return
+        key = _key(value)
+        if isinstance(value, str) or len(key) >= MIN_SHARED_SIZE:
+            counts[key] = counts.get(key, 0) + 1
+
+    count(data)
+    shared: Dict[str, Any] = {}
+    order: List[str] = []
+
+    def rebuild(value):
+        if isinstance(value, dict):
+            value = {k: rebuild(v) for k, v in value.items()}
+        elif isinstance(value, list):
+            value = [rebuild(item) for item in value]
+        elif not isinstance(value, str):
+            return value
+        key = _key(value)
+        if counts.get(key, 0) < 2:
+            return value
+        if key not in shared:
+            shared[key] = value
+            order.append(key)
+        return shared[key]
+
+    result = rebuild(data)
+    # 序列化时只为实际出现多次的节点输出锚点，其余名称不会用到
+    return result, {f'a{i}': shared[key] for i, key in enumerate(order)}
+
+
+def dump_minified(config: Dict) -> str:
+    data, anchors = hoist_shared(config)
+    return yaml_io.dump(
+        data,
+        anchors=anchors,
+        compact=True,
+        allow_unicode=True,
+        sort_keys=False,
+        width=UNLIMITED_WIDTH
+    )
+
+
+def compress(data: bytes, method: str) -> bytes:
+    """预压缩：gzip 固定 mtime=0，同样的输入得到同样的字节"""
+    if method == 'gz':
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    if method == 'br':
+        if brotli is None:
+            raise RuntimeError("brotli is not installed")
+        return brotli.compress(data, quality=11)
+    raise ValueError(f"Unknown compression: {method}")
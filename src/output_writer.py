@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Output Writer - 只在内容变化时写文件，并统计写入/未变化/删除数量
+写入经临时文件 + 原子重命名完成，下载方不会读到写了一半的文件
+"""
+import os
+import re
+import logging
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Pattern, Set, Tuple, Union
+
+from instrumentation import Profiler
+
+# 生成时间行：内容其余部分不变时沿用已有的时间戳
+TIMESTAMP_LINE = re.compile(r'生成时间: [^\n]*')
+
+
+def build_timestamp() -> str:
+    """构建时间：优先使用 SOURCE_DATE_EPOCH（可复现构建约定，通常为提交时间）"""
+    epoch = os.environ.get('SOURCE_DATE_EPOCH')
+    if epoch:
+        moment = datetime.fromtimestamp(int(epoch), tz=timezone.utc)
+        return moment.strftime('%Y-%m-%d %H:%M:%S UTC')
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _default_mode() -> int:
+    # mkstemp 创建的文件为 0600，改回普通文件的默认权限
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+FILE_MODE = _default_mode()
+
+
+def atomic_write(path: Path, data: bytes):
+    """写入同目录下的临时文件后 os.replace，目标文件要么是旧内容要么是新内容"""
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(tmp, FILE_MODE)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class OutputWriter:
+    def __init__(self, preserve: Optional[Pattern] = None,
+                 profiler: Optional[Profiler] = None):
+        """
+        preserve: 可选的易变内容（如生成时间）正则。
+        若文件除匹配部分外完全相同，则保留旧文件不写入。
+        profiler: 记录比较（compare）与实际落盘（write）的耗时；batch() 期间的写入在退出时计时
+        """
+        self.preserve = preserve
+        self.profiler = profiler or Profiler()
+        self.logger = logging.getLogger(__name__)
+        self.stats: Dict[str, int] = {'written': 0, 'unchanged': 0, 'deleted': 0}
+        self._dirs: Set[Path] = set()
+        # batch() 期间待写入的文件：目录 -> [(路径, 内容, 计时标签)]
+        self._pending: Optional[Dict[Path, List[Tuple[Path, bytes, object]]]] = None
+
+    def _unchanged(self, path: Path, data: bytes) -> bool:
+        try:
+            if path.stat().st_size == len(data) and path.read_bytes() == data:
+                return True
+            if self.preserve is None:
+                return False
+            old = path.read_text(encoding='utf-8')
+        except (OSError, UnicodeDecodeError):
+            return False
+        new = data.decode('utf-8')
+        return self.preserve.sub('', old) == self.preserve.sub('', new)
+
+    def ensure_dir(self, directory: Path):
+        """每个目录只创建一次"""
+        if directory not in self._dirs:
+            directory.mkdir(parents=True, exist_ok=True)
+            self._dirs.add(directory)
+
+    def write(self, path: Path, content: Union[str, bytes],
+              label: Optional[object] = None) -> bool:
+        """
+        写入文件（文本按 UTF-8 编码），内容未变化时跳过；返回是否（将）实际写入。
+        batch() 期间只记录待写入内容，退出时按目录统一写入。
+        label: 计时记在哪个文件下（如对应的源 YAML），默认为 path
+        """
+        data = content.encode('utf-8') if isinstance(content, str) else content
+        label = label or path
+        with self.profiler.span('compare', label):
+            unchanged = self._unchanged(path, data)
+        if unchanged:
+            self.stats['unchanged'] += 1
+            return False
+
+        if self._pending is not None:
+            self._pending.setdefault(path.parent, []).append((path, data, label))
+        else:
+            self.ensure_dir(path.parent)
+            self._flush(path, data, label)
+        self.stats['written'] += 1
+        return True
+
+    def _flush(self, path: Path, data: bytes, label: object):
+        with self.profiler.span('write', label) as span:
+            atomic_write(path, data)
+            span.bytes = len(data)
+
+    @contextmanager
+    def batch(self):
+        """批量写入：同一目录的文件集中写入，目录只创建一次"""
+        if self._pending is not None:
+            yield self
+            return
+        self._pending = {}
+        try:
+            yield self
+        finally:
+            pending, self._pending = self._pending, None
+            for directory, files in pending.items():
+                self.ensure_dir(directory)
+                for path, data, label in files:
+                    self._flush(path, data, label)
+
+    def delete(self, path: Path) -> bool:
+        """删除文件；返回是否实际删除"""
+        if not path.is_file():
+            return False
+        path.unlink()
+        self.stats['deleted'] += 1
+        self.logger.info(f"Removed stale output: {path}")
+        return True
+
+    def remove_dir(self, directory: Path):
+        """删除空目录"""
+        directory.rmdir()
+        self._dirs.discard(directory)
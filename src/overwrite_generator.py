@@ -3,62 +3,187 @@
 OpenClash Overwrite Generator - 支持多级目录结构
 保持完整的分类层级（如 General_Config/Author1/）
 """
-import yaml
+import os
 import json
 import argparse
 import logging
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from datetime import datetime
-from typing import Dict, List, Optional
-from jinja2 import Environment, FileSystemLoader
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, ModuleLoader
+
+import yaml_io
+from build_manifest import BuildManifest, file_hash, files_fingerprint
+from cost_model import COST_MODEL_VERSION, parse_settings, probe_floor, probe_sources
+from filter_regex import invalid_filters
+from instrumentation import Profiler, cprofile
+from section_diff import DIFF_VERSION, variant_digest, variant_sections
+from section_store import SectionStore
+from minify import is_minified, minified_path
+from output_writer import OutputWriter, TIMESTAMP_LINE, build_timestamp
+
+# 生成逻辑变化时递增，使增量构建的旧结果失效
+GENERATOR_VERSION = '2'
 
 
 class OverwriteGenerator:
-    def __init__(self, template_dir: Path, config_types_path: Path):
-        self.env = Environment(
-            loader=FileSystemLoader(template_dir),
-            trim_blocks=True,
-            lstrip_blocks=True
-        )
+    BASE_TEMPLATE = 'base.conf.j2'
+    ENV_OPTIONS = {'trim_blocks': True, 'lstrip_blocks': True}
+
+    def __init__(self, template_dir: Path, config_types_path: Path,
+                 reproducible: bool = False,
+                 bytecode_cache: Optional[Path] = None,
+                 precompiled: Optional[Path] = None,
+                 probe_budget: Optional[float] = None,
+                 prefer_minified: bool = False,
+                 profiler: Optional[Profiler] = None,
+                 store: Optional[Path] = None):
+        self.template_dir = template_dir
+        self.config_types_path = config_types_path
+        # 可复现模式：除生成时间外内容不变的文件保持原样
+        self.reproducible = reproducible
+        self.bytecode_cache = bytecode_cache
+        self.precompiled = precompiled
+        # 每个配置每小时测速次数上限：超出时提高 URLTEST_INTERVAL_MOD（见 cost_model.py）
+        self.probe_budget = probe_budget
+        # 存在 X.min.yaml 时让路由器下载精简版本
+        self.prefer_minified = prefer_minified
+        # 分阶段计时（--profile），未启用时不记录；落盘耗时由 writer 记录
+        self.profiler = profiler or Profiler()
+        self.writer = OutputWriter(TIMESTAMP_LINE if reproducible else None, self.profiler)
+        # 分段存储中有对应清单时从中读取配置，不再解析 YAML（见 section_store.py）
+        self.store = SectionStore(store, self.writer) if store else None
+        self.timestamp = build_timestamp()
         self.logger = logging.getLogger(__name__)
+        self.reload()
+
+    def reload(self):
+        """读取变体定义并解析模板（watch 模式下文件变化时重新调用）"""
+        self.env = self.build_environment()
         
-        with open(config_types_path, 'r') as f:
+        with open(self.config_types_path, 'r') as f:
             self.config_types = json.load(f)['config_types']
+        self._variant_settings: Optional[Dict[str, Dict]] = None
+        
+        # 模板在运行开始时解析一次，渲染时不再查找/检查更新
+        self.template = self.env.get_template(self.BASE_TEMPLATE)
+
+    def build_environment(self) -> Environment:
+        """构建 Jinja 环境：预编译模块 > 字节码缓存 > 直接解析"""
+        if self.precompiled:
+            self.ensure_precompiled(self.precompiled)
+            return Environment(loader=ModuleLoader(str(self.precompiled)),
+                               auto_reload=False, **self.ENV_OPTIONS)
+        
+        cache = None
+        if self.bytecode_cache:
+            # 缓存以模板名为键，并校验模板源码的哈希，模板修改后自动失效
+            self.bytecode_cache.mkdir(parents=True, exist_ok=True)
+            cache = FileSystemBytecodeCache(str(self.bytecode_cache))
+        return Environment(loader=FileSystemLoader(self.template_dir),
+                           bytecode_cache=cache, auto_reload=False,
+                           **self.ENV_OPTIONS)
+
+    def ensure_precompiled(self, target: Path):
+        """将模板编译为 Python 模块；模板哈希未变化时直接复用"""
+        stamp_path = target / 'templates.json'
+        fingerprint = files_fingerprint(self.template_dir.glob('*.j2'))
+        try:
+            if json.loads(stamp_path.read_text(encoding='utf-8')) == fingerprint:
+                return
+        except (OSError, ValueError):
+            pass
+        
+        self.logger.info(f"编译模板到: {target}")
+        target.mkdir(parents=True, exist_ok=True)
+        for old in target.glob('tmpl_*.py'):
+            old.unlink()
+        compiler = Environment(loader=FileSystemLoader(self.template_dir),
+                               **self.ENV_OPTIONS)
+        compiler.compile_templates(
+            str(target), zip=None, ignore_errors=False,
+            filter_func=lambda name: name.endswith('.j2')
+        )
+        stamp_path.write_text(json.dumps(fingerprint, indent=2), encoding='utf-8')
 
-    def analyze_yaml(self, yaml_path: Path) -> Optional[Dict]:
-        """分析 YAML 文件"""
+    @staticmethod
+    def analyze_config(config: Dict, name: str) -> Mapping:
+        """分析已解析的配置（只读结果，供所有变体共用）"""
+        proxy_providers = config.get('proxy-providers', {}) or {}
+        providers = []
+        
+        for provider_name, cfg in proxy_providers.items():
+            if isinstance(cfg, dict):
+                providers.append(MappingProxyType({
+                    'name': provider_name,
+                    'type': cfg.get('type', 'http'),
+                    'url': cfg.get('url', ''),
+                    'interval': cfg.get('interval', 86400)
+                }))
+        
+        return MappingProxyType({
+            'proxy_providers': tuple(providers),
+            'count': len(providers),
+            'name': name
+        })
+
+    def load_yaml(self, yaml_path: Path) -> Optional[Dict]:
+        """读取 YAML 文件（优先取自分段存储）；失败时返回 None"""
         try:
+            if self.store:
+                config = self.store.load_config(yaml_path, file_hash(yaml_path))
+                if config is not None:
+                    return config or None
             with open(yaml_path, 'r', encoding='utf-8') as f:
-                config = yaml.safe_load(f)
-            
-            if not config:
-                return None
-            
-            proxy_providers = config.get('proxy-providers', {}) or {}
-            providers = []
-            
-            for name, cfg in proxy_providers.items():
-                if isinstance(cfg, dict):
-                    providers.append({
-                        'name': name,
-                        'type': cfg.get('type', 'http'),
-                        'url': cfg.get('url', ''),
-                        'interval': cfg.get('interval', 86400)
-                    })
-            
-            return {
-                'proxy_providers': providers,
-                'count': len(providers),
-                'name': yaml_path.stem
-            }
+                return yaml_io.safe_load(f) or None
         
         except Exception as e:
             self.logger.error(f"Error analyzing {yaml_path}: {e}")
             return None
 
+    def analyze_yaml(self, yaml_path: Path) -> Optional[Mapping]:
+        """读取并分析 YAML 文件"""
+        config = self.load_yaml(yaml_path)
+        if not config:
+            return None
+        self.check_filters(config, yaml_path)
+        return self.analyze_config(config, yaml_path.stem)
+
+    def check_filters(self, config: Dict, yaml_path: Path):
+        """正则分析：无法编译的 filter 会导致 mihomo 加载失败（基准测试见 filter_regex.py）"""
+        for location, key, error in invalid_filters(config):
+            self.logger.warning(f"{yaml_path}: {location} {key} 无法编译: {error}")
+
+    def variant_settings(self) -> Dict[str, Dict]:
+        """各变体覆写 [General] 段的设置（与具体配置无关的部分）"""
+        if self._variant_settings is None:
+            placeholder = MappingProxyType({
+                'name': 'config', 'count': 1,
+                'proxy_providers': (MappingProxyType({'name': 'provider', 'type': 'http',
+                                                      'url': '', 'interval': 86400}),)
+            })
+            self._variant_settings = {
+                config_def['name']: parse_settings(self.render_overwrite(
+                    placeholder, config_def, '', '', ''
+                ))
+                for config_def in self.config_types
+            }
+        return self._variant_settings
+
+    def urltest_interval(self, config: Dict, config_def: Dict) -> Optional[int]:
+        """超出测速预算时该变体使用的 URLTEST_INTERVAL_MOD；无需调整时返回 None"""
+        if not self.probe_budget:
+            return None
+        setting = self.variant_settings()[config_def['name']].get('URLTEST_INTERVAL_MOD', '0')
+        base = int(setting) if setting.isdigit() else 0
+        # 覆写只能调整策略组的测速间隔，health-check 由处理阶段改写
+        floor = probe_floor(probe_sources(config), self.probe_budget, base, kinds=('group',))
+        return max(base, floor) if floor else None
+
     def generate_readme(self, category_dir: Path, relative_path: str, 
-                       source_type: str, files_generated: List[str]):
-        """为每个分类目录生成 README"""
+                       source_type: str, files_generated: List[str]) -> bool:
+        """为每个分类目录生成 README；返回是否实际写入"""
         
         # 解析相对路径，确定说明
         parts = relative_path.split('/')
@@ -122,7 +247,7 @@ EN_DNS=223.5.5.5,114.114.114.114
 ```
 
 ## 📝 生成信息
-- 生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+- 生成时间: {self.timestamp}
 - 配置文件数: {len(files_generated)}
 
 ---
@@ -130,136 +255,350 @@ EN_DNS=223.5.5.5,114.114.114.114
 """
         
         readme_path = category_dir / 'README.md'
-        with open(readme_path, 'w', encoding='utf-8') as f:
-            f.write(readme_content)
-        
-        self.logger.info(f"Generated README: {readme_path}")
+        written = self.writer.write(readme_path, readme_content)
+        if written:
+            self.logger.info(f"Generated README: {readme_path}")
+        return written
+
+    def render_overwrite(self, analysis: Mapping, config_def: Dict, yaml_url: str,
+                         relative_path: str, source_type: str,
+                         urltest_interval: Optional[int] = None) -> str:
+        """渲染单个变体的覆写内容"""
+        return self.template.render(
+            config_name=analysis['name'],
+            source_type=source_type,
+            category=relative_path,
+            provider_count=analysis['count'],
+            proxy_providers=analysis['proxy_providers'],
+            yaml_url=yaml_url,
+            timestamp=self.timestamp,
+            smart_mode=config_def['smart_mode'],
+            bypass_mode=config_def['bypass_mode'],
+            enable_ipv6=config_def['enable_ipv6'],
+            enable_lgbm=config_def['enable_lgbm'],
+            urltest_interval=urltest_interval
+        )
 
     def generate_overwrite(self, yaml_path: Path, output_path: Path, 
                           config_def: Dict, repo_url: str, 
-                          relative_path: str, source_type: str) -> bool:
+                          relative_path: str, source_type: str,
+                          analysis: Optional[Mapping] = None,
+                          urltest_interval: Optional[int] = None) -> bool:
         """生成单个覆写文件"""
         
-        analysis = self.analyze_yaml(yaml_path)
+        if analysis is None:
+            analysis = self.analyze_yaml(yaml_path)
         if not analysis or analysis['count'] == 0:
             self.logger.warning(f"No providers in {yaml_path}, skipping")
             return False
         
         # 构建下载URL（保持完整的相对路径）
-        yaml_url = f"{repo_url}/processed_configs/{source_type}/{relative_path}/{yaml_path.name}".replace('\\', '/')
+        yaml_name = self.download_name(yaml_path)
+        yaml_url = f"{repo_url}/processed_configs/{source_type}/{relative_path}/{yaml_name}".replace('\\', '/')
         
         try:
-            template = self.env.get_template('base.conf.j2')
-            content = template.render(
-                config_name=analysis['name'],
-                source_type=source_type,
-                category=relative_path,
-                provider_count=analysis['count'],
-                proxy_providers=analysis['proxy_providers'],
-                yaml_url=yaml_url,
-                timestamp=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                smart_mode=config_def['smart_mode'],
-                bypass_mode=config_def['bypass_mode'],
-                enable_ipv6=config_def['enable_ipv6'],
-                enable_lgbm=config_def['enable_lgbm']
-            )
-            
-            output_path.parent.mkdir(parents=True, exist_ok=True)
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(content)
+            with self.profiler.span('render', yaml_path) as span:
+                content = self.render_overwrite(analysis, config_def, yaml_url,
+                                               relative_path, source_type, urltest_interval)
+                span.bytes = len(content)
             
+            self.writer.write(output_path, content, label=yaml_path)
             return True
         
         except Exception as e:
             self.logger.error(f"Failed to generate {output_path}: {e}")
             return False
 
-    def process_directory_recursive(self, current_dir: Path, input_base: Path, 
-                                   output_base: Path, repo_url: str, 
-                                   source_type: str, stats: Dict):
-        """递归处理目录，保持完整的目录层级"""
+    def download_name(self, yaml_path: Path) -> str:
+        """DOWNLOAD_FILE 指向的文件名"""
+        if self.prefer_minified and minified_path(yaml_path).is_file():
+            return minified_path(yaml_path).name
+        return yaml_path.name
+
+    @staticmethod
+    def variant_filename(base_name: str, config_def: Dict) -> str:
+        """构建变体文件名"""
+        suffix = config_def['suffix']
+        if suffix:
+            return f"Overwrite{suffix}-{base_name}.conf"
+        return f"Overwrite-{base_name}.conf"
+
+    def generate_variants(self, yaml_path: Path, output_dir: Path,
+                          repo_url: str, relative_path: str,
+                          source_type: str,
+                          config: Optional[Dict] = None,
+                          previous: Optional[Dict[str, str]] = None) -> Dict:
+        """
+        解析一次 YAML，并生成全部变体。
+        config: 已在内存中的处理结果（流水线传入），省去重新读取和解析
+        previous: 上一次构建各变体的输入哈希；未变化且输出仍在的变体不再渲染
+        """
+        result = {'files': [], 'errors': 0, 'written': 0, 'reused': 0, 'variants': {}}
+        written_before = self.writer.stats['written']
         
-        yaml_files = list(current_dir.glob('*.yaml'))
-        has_yaml = len(yaml_files) > 0
+        if config is None:
+            with self.profiler.span('load', yaml_path) as span:
+                config = self.load_yaml(yaml_path)
+                span.bytes = yaml_path.stat().st_size
+        with self.profiler.span('analyze', yaml_path):
+            if config:
+                self.check_filters(config, yaml_path)
+            analysis = self.analyze_config(config, yaml_path.stem) if config else None
+        if not analysis or analysis['count'] == 0:
+            self.logger.warning(f"No providers in {yaml_path}, skipping")
+            result['errors'] = len(self.config_types)
+            return result
         
-        if has_yaml:
+        # YAML 有变化时，多数变体读取的段（订阅列表等）往往未变（见 section_diff.py）
+        previous = previous or {}
+        sections = variant_sections(self.probe_budget)
+        download_name = self.download_name(yaml_path)
+        
+        # 同一 YAML 的变体在同一目录，批量写入
+        with self.writer.batch():
+            for config_def in self.config_types:
+                try:
+                    filename = self.variant_filename(yaml_path.stem, config_def)
+                    output_path = output_dir / filename
+                    digest = variant_digest(config, sections, config_def, download_name)
+                    result['variants'][filename] = digest
+                    
+                    if previous.get(filename) == digest and output_path.exists():
+                        result['files'].append(filename)
+                        result['reused'] += 1
+                        self.profiler.count('generate.variants_reused')
+                        continue
+                    
+                    if self.generate_overwrite(
+                        yaml_path, output_path, config_def,
+                        repo_url, relative_path, source_type,
+                        analysis=analysis,
+                        urltest_interval=self.urltest_interval(config, config_def)
+                    ):
+                        result['files'].append(filename)
+                    else:
+                        result['errors'] += 1
+                
+                except Exception as e:
+                    self.logger.error(f"Error: {e}")
+                    result['errors'] += 1
+        
+        result['written'] = self.writer.stats['written'] - written_before
+        return result
+
+    def build_fingerprint(self, repo_url: str, source_type: str) -> Dict:
+        """影响全部输出的因素"""
+        fingerprint = {
+            'generator': GENERATOR_VERSION,
+            'section_diff': DIFF_VERSION,
+            'templates': files_fingerprint(self.template_dir.glob('*.j2')),
+            'config_types': file_hash(self.config_types_path),
+            'repo_url': repo_url,
+            'source_type': source_type
+        }
+        if self.probe_budget:
+            fingerprint['probe_budget'] = [COST_MODEL_VERSION, self.probe_budget]
+        if self.prefer_minified:
+            fingerprint['prefer_minified'] = True
+        return fingerprint
+
+    def process_directory_recursive(self, current_dir: Path, input_base: Path,
+                                   categories: List[tuple]):
+        """递归收集含 YAML 的目录，保持完整的目录层级"""
+        
+        yaml_files = sorted(p for p in current_dir.glob('*.yaml') if not is_minified(p))
+        if yaml_files:
+            categories.append((current_dir, yaml_files))
+        
+        # 递归处理子目录
+        for sub_dir in sorted(current_dir.iterdir()):
+            if sub_dir.is_dir():
+                self.process_directory_recursive(sub_dir, input_base, categories)
+
+    def run_tasks(self, tasks: List[tuple], jobs: int = 1) -> List[Dict]:
+        """执行 generate_variants 任务，结果顺序与任务顺序一致"""
+        if jobs <= 1 or len(tasks) <= 1:
+            return [self.generate_variants(*task) for task in tasks]
+        
+        with ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=_init_worker,
+            initargs=(self.template_dir, self.config_types_path,
+                      self.reproducible, self.bytecode_cache,
+                      self.precompiled, self.probe_budget, self.prefer_minified,
+                      self.timestamp, self.profiler.enabled,
+                      self.store.root if self.store else None)
+        ) as pool:
+            results = list(pool.map(_generate_variants_worker, tasks))
+        # 子进程的计时随结果带回
+        for result in results:
+            self.profiler.merge(result.pop('profile', None))
+        return results
+
+    def remove_stale_outputs(self, manifest: BuildManifest, stats: Dict):
+        """删除源 YAML 已消失的覆写文件"""
+        for key in manifest.stale_keys():
+            removed = manifest.remove_outputs(key, self.writer)
+            stats['deleted'] += len(removed)
+            
+            for category_dir in {path.parent for path in removed}:
+                if any(category_dir.glob('*.conf')):
+                    continue
+                if self.writer.delete(category_dir / 'README.md'):
+                    stats['deleted'] += 1
+                if not any(category_dir.iterdir()):
+                    self.writer.remove_dir(category_dir)
+
+    def process_directory(self, input_dir: Path, output_base: Path, 
+                         repo_url: str, source_type: str,
+                         incremental: bool = False,
+                         manifest_path: Optional[Path] = None,
+                         jobs: int = 1,
+                         configs: Optional[Dict[Path, Dict]] = None) -> Dict:
+        """
+        处理入口函数
+        configs: YAML 路径 -> 已处理的配置（流水线传入，命中时不再读取文件）
+        """
+        configs = configs or {}
+        stats = {'categories': {}, 'total': 0, 'errors': 0, 'skipped': 0, 'reused': 0,
+                 'written': 0, 'unchanged': 0, 'deleted': 0}
+        
+        self.logger.info(f"\n{'='*60}")
+        self.logger.info(f"开始处理: {input_dir}")
+        self.logger.info(f"输出基础: {output_base}")
+        self.logger.info(f"来源类型: {source_type}")
+        
+        manifest = BuildManifest(
+            manifest_path or output_base / f'.manifest-{source_type}.json',
+            output_base,
+            self.build_fingerprint(repo_url, source_type)
+        )
+        if incremental and manifest.fingerprint_changed:
+            self.logger.info("模板/配置类型/版本已变化，全部重新生成")
+        
+        # 从输入目录开始递归收集
+        categories = []
+        self.process_directory_recursive(input_dir, input_dir, categories)
+        
+        # 增量模式下跳过未变化的 YAML，其余文件统一分发
+        tasks = []
+        plans = []
+        for current_dir, yaml_files in categories:
             # 计算相对路径（相对于输入基础目录）
-            relative_path = str(current_dir.relative_to(input_base))
+            relative_path = str(current_dir.relative_to(input_dir))
             output_dir = output_base / relative_path
             
+            plan = {'relative_path': relative_path, 'output_dir': output_dir,
+                    'count': len(yaml_files), 'entries': []}
+            for yaml_file in yaml_files:
+                key = yaml_file.relative_to(input_dir).as_posix()
+                digest = file_hash(yaml_file)
+                if self.prefer_minified:
+                    # 精简文件出现/消失会改变下载地址
+                    digest += f':{self.download_name(yaml_file)}'
+                
+                if incremental and manifest.is_fresh(key, digest):
+                    self.logger.debug(f"未变化，跳过: {yaml_file}")
+                    plan['entries'].append((key, digest, None))
+                    continue
+                
+                plan['entries'].append((key, digest, len(tasks)))
+                tasks.append((yaml_file, output_dir, repo_url,
+                              relative_path, source_type,
+                              configs.get(yaml_file),
+                              manifest.recorded(key, 'variants') if incremental else None))
+            plans.append(plan)
+        
+        results = self.run_tasks(tasks, jobs)
+        
+        # 源 YAML 已消失的目录中其余文件未变化时，README 同样需要更新
+        stale_dirs = set()
+        if incremental:
+            current = {key for plan in plans for key, _, _ in plan['entries']}
+            stale_dirs = {(output_base / out).parent for key in manifest.previous
+                          if key not in current for out in manifest.outputs(key)}
+        
+        # 按目录合并结果
+        for plan in plans:
+            relative_path = plan['relative_path']
+            output_dir = plan['output_dir']
+            
             self.logger.info(f"\n{'='*60}")
             self.logger.info(f"处理分类: {relative_path}")
             self.logger.info(f"输出目录: {output_dir}")
-            self.logger.info(f"YAML 文件: {len(yaml_files)} 个")
+            self.logger.info(f"YAML 文件: {plan['count']} 个")
             
             files_generated = []
+            changed = output_dir in stale_dirs
             
-            # 处理当前目录的所有 YAML 文件
-            for yaml_file in yaml_files:
-                for config_def in self.config_types:
-                    try:
-                        # 构建文件名
-                        base_name = yaml_file.stem
-                        suffix = config_def['suffix']
-                        
-                        if suffix:
-                            filename = f"Overwrite{suffix}-{base_name}.conf"
-                        else:
-                            filename = f"Overwrite-{base_name}.conf"
-                        
-                        output_path = output_dir / filename
-                        
-                        result = self.generate_overwrite(
-                            yaml_file, output_path, config_def,
-                            repo_url, relative_path, source_type
-                        )
-                        
-                        if result:
-                            files_generated.append(filename)
-                            stats['total'] += 1
-                        else:
-                            stats['errors'] += 1
-                    
-                    except Exception as e:
-                        self.logger.error(f"Error: {e}")
-                        stats['errors'] += 1
+            for key, digest, index in plan['entries']:
+                if index is None:
+                    manifest.keep(key)
+                    outputs = manifest.outputs(key)
+                    files_generated.extend(Path(out).name for out in outputs)
+                    stats['skipped'] += 1
+                    self.profiler.count('generate.skipped')
+                    stats['unchanged'] += len(outputs)
+                    continue
+                
+                result = results[index]
+                changed = True
+                files_generated.extend(result['files'])
+                stats['total'] += len(result['files'])
+                stats['errors'] += result['errors']
+                stats['written'] += result['written']
+                stats['unchanged'] += len(result['files']) - result['written']
+                stats['reused'] += result['reused']
+                manifest.record(key, digest, [output_dir / name for name in result['files']],
+                                {'variants': result['variants']})
             
-            # 生成当前目录的 README
-            self.generate_readme(output_dir, relative_path, 
-                               source_type, files_generated)
+            # 生成当前目录的 README（增量模式下仅在有变化时）
+            if changed or not (output_dir / 'README.md').exists():
+                with self.profiler.span('readme', output_dir):
+                    readme_written = self.generate_readme(output_dir, relative_path,
+                                                          source_type, files_generated)
+                if readme_written:
+                    stats['written'] += 1
+                else:
+                    stats['unchanged'] += 1
             
             # 记录统计
             if relative_path not in stats['categories']:
                 stats['categories'][relative_path] = 0
             stats['categories'][relative_path] += len(files_generated)
         
-        # 递归处理子目录
-        for sub_dir in current_dir.iterdir():
-            if sub_dir.is_dir():
-                self.process_directory_recursive(
-                    sub_dir, input_base, output_base, 
-                    repo_url, source_type, stats
-                )
-
-    def process_directory(self, input_dir: Path, output_base: Path, 
-                         repo_url: str, source_type: str) -> Dict:
-        """处理入口函数"""
-        stats = {'categories': {}, 'total': 0, 'errors': 0}
-        
-        self.logger.info(f"\n{'='*60}")
-        self.logger.info(f"开始处理: {input_dir}")
-        self.logger.info(f"输出基础: {output_base}")
-        self.logger.info(f"来源类型: {source_type}")
-        
-        # 从输入目录开始递归处理
-        self.process_directory_recursive(
-            input_dir, input_dir, output_base, 
-            repo_url, source_type, stats
-        )
+        if incremental:
+            self.remove_stale_outputs(manifest, stats)
         
+        manifest.save()
         return stats
 
 
+_worker_generator: Optional[OverwriteGenerator] = None
+
+
+def _init_worker(template_dir: Path, config_types_path: Path,
+                 reproducible: bool, bytecode_cache: Optional[Path],
+                 precompiled: Optional[Path], probe_budget: Optional[float],
+                 prefer_minified: bool, timestamp: str, profile: bool = False,
+                 store: Optional[Path] = None):
+    """进程池初始化：每个进程一个生成器（与主进程共用同一构建时间）"""
+    global _worker_generator
+    _worker_generator = OverwriteGenerator(
+        template_dir, config_types_path, reproducible,
+        bytecode_cache=bytecode_cache, precompiled=precompiled,
+        probe_budget=probe_budget, prefer_minified=prefer_minified,
+        profiler=Profiler(profile), store=store
+    )
+    _worker_generator.timestamp = timestamp
+
+
+def _generate_variants_worker(task: tuple) -> Dict:
+    result = _worker_generator.generate_variants(*task)
+    result['profile'] = _worker_generator.profiler.drain()
+    return result
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='Generate OpenClash overwrite configs from YAML files (supports nested directories)'
@@ -280,6 +619,30 @@ def main():
     parser.add_argument('--verbose', '-v', action='store_true')
     parser.add_argument('--dry-run', action='store_true',
                        help='Show what would be generated without writing files')
+    parser.add_argument('--incremental', action='store_true',
+                       help='只重新生成内容哈希变化的 YAML')
+    parser.add_argument('--manifest', type=Path,
+                       help='清单路径（默认: <output>/.manifest-<source>.json）')
+    parser.add_argument('--yaml-backend', choices=('auto',) + yaml_io.BACKENDS,
+                       default='auto', help='YAML 后端（默认优先 libyaml）')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                       help='并行进程数（0 = 全部 CPU）')
+    parser.add_argument('--bytecode-cache', type=Path,
+                       help='Jinja 字节码缓存目录（按模板哈希自动失效）')
+    parser.add_argument('--precompiled', type=Path,
+                       help='预编译模板目录（模板变化时自动重新编译）')
+    parser.add_argument('--reproducible', action='store_true',
+                       help='可复现输出：除生成时间外未变化的文件保持原样（时间取自 SOURCE_DATE_EPOCH）')
+    parser.add_argument('--probe-budget', type=float,
+                       help='每个配置每小时测速次数上限（超出时提高 URLTEST_INTERVAL_MOD）')
+    parser.add_argument('--prefer-minified', action='store_true',
+                       help='存在 X.min.yaml 时下载地址指向精简版本')
+    parser.add_argument('--store', type=Path,
+                       help='分段存储目录：有对应清单时从中读取配置，不再解析 YAML')
+    parser.add_argument('--profile', type=Path,
+                       help='写出按文件、按阶段的耗时报告（JSON）')
+    parser.add_argument('--cprofile', type=Path,
+                       help='写出主进程的 cProfile 数据')
     
     args = parser.parse_args()
     
@@ -290,23 +653,40 @@ def main():
     )
     
     try:
-        gen = OverwriteGenerator(args.templates, args.config_types)
+        yaml_io.set_backend(args.yaml_backend)
+        gen = OverwriteGenerator(args.templates, args.config_types,
+                                 reproducible=args.reproducible,
+                                 bytecode_cache=args.bytecode_cache,
+                                 precompiled=args.precompiled,
+                                 probe_budget=args.probe_budget,
+                                 prefer_minified=args.prefer_minified,
+                                 profiler=Profiler(enabled=bool(args.profile)),
+                                 store=args.store)
         
         if args.dry_run:
             logging.info("DRY RUN MODE - No files will be written")
         
-        stats = gen.process_directory(
-            args.input, args.output, args.repo_url, args.source
-        )
+        with cprofile(args.cprofile):
+            stats = gen.process_directory(
+                args.input, args.output, args.repo_url, args.source,
+                incremental=args.incremental, manifest_path=args.manifest,
+                jobs=args.jobs or os.cpu_count() or 1
+            )
         
         print(f"\n{'='*60}")
         print(f"总计生成: {stats['total']} 个文件")
+        if args.incremental:
+            print(f"未变化跳过: {stats['skipped']} 个 YAML，未变化变体: {stats['reused']} 个")
+        print(f"写入: {stats['written']} / 未变化: {stats['unchanged']} / 删除: {stats['deleted']}")
         if stats['errors'] > 0:
             print(f"⚠️  错误数: {stats['errors']}")
         print(f"\n分类统计:")
         for cat, count in sorted(stats['categories'].items()):
             print(f"  - {cat}: {count} 个文件")
         
+        if args.profile:
+            gen.profiler.write(args.profile)
+            print(f"📈 耗时: {gen.profiler.summary()}")
         return 0
     
     except Exception as e:
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Pipeline - 单进程完成 精简 → 分析 → 渲染
+处理结果直接在内存中交给生成器，不再写出后重新读取解析；
+external/local 等多个来源在一次调用中完成。
+--watch 常驻运行：处理结果与已解析的模板保留在内存中，文件变化时只重做受影响的部分。
+"""
+import os
+import time
+import argparse
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import yaml_io
+from file_watcher import DEFAULT_INTERVAL, PollingWatcher
+from instrumentation import Profiler, cprofile
+from minify import COMPRESSIONS, available_compressions, is_minified
+from output_writer import build_timestamp
+from rule_bundler import RULE_SET_CACHE, RuleSetSource
+from yaml_processor import YAMLProcessor, read_file_list
+from overwrite_generator import OverwriteGenerator
+from provider_index import ProviderIndex
+
+
+class Pipeline:
+    def __init__(self, processor: YAMLProcessor, generator: OverwriteGenerator):
+        self.processor = processor
+        self.processor.keep_configs = True
+        self.generator = generator
+        # 设置后顺便建立 rule-providers 索引（复用内存中的处理结果）
+        self.index: Optional[ProviderIndex] = None
+        # watch 模式下每次重建后重新写出索引
+        self.index_path: Optional[Path] = None
+        # watch 模式：保留全部处理结果（精简后路径 -> 配置），模板变化时不再重新解析
+        self.warm = False
+        self.configs: Dict[Path, Dict] = {}
+        self.logger = logging.getLogger(__name__)
+
+    def run_source(self, source_type: str, input_dir: Path, processed_dir: Path,
+                   output_base: Path, repo_url: str, incremental: bool = False,
+                   jobs: int = 1, only: Optional[Set[str]] = None) -> Dict:
+        """处理单个来源：input_dir → processed_dir → output_base"""
+        results = self.processor.process_directory(
+            input_dir, processed_dir, recursive=True,
+            incremental=incremental, jobs=jobs, only=only
+        )
+
+        # 处理结果直接交给生成器；增量模式下跳过的文件由生成器自行判断
+        configs = {Path(r['output']): r.pop('config')
+                   for r in results if 'config' in r}
+        if self.warm:
+            self.configs.update(configs)
+            for r in results:
+                if r.get('deleted'):
+                    self.configs.pop(Path(r['output']), None)
+            configs = self.configs
+
+        stats = self.generator.process_directory(
+            processed_dir, output_base, repo_url, source_type,
+            incremental=incremental, jobs=jobs, configs=configs
+        )
+        if self.index is not None:
+            with self.processor.profiler.span('index'):
+                self.index.add_directory(processed_dir, configs, prefix=f'{source_type}/')
+        stats['processed'] = [r for r in results
+                              if not r.get('skipped') and not r.get('deleted')]
+        stats['processed_skipped'] = sum(1 for r in results if r.get('skipped'))
+        return stats
+
+    def run(self, sources: List[Tuple[str, Path]], processed_base: Path,
+            output_base: Path, repo_url: str, incremental: bool = False,
+            jobs: int = 1, changed: Optional[Dict[str, Set[str]]] = None) -> Dict[str, Dict]:
+        """
+        依次处理全部来源；输入目录不存在的来源跳过。
+        changed：来源 → 已知变化的文件（见 upstream_sync.py），未列出的来源照常计算哈希
+        """
+        all_stats = {}
+        for source_type, input_dir in sources:
+            if not input_dir.is_dir():
+                self.logger.warning(f"Input directory not found, skipping {source_type}: {input_dir}")
+                continue
+            all_stats[source_type] = self.run_source(
+                source_type, input_dir, processed_base / source_type,
+                output_base, repo_url, incremental=incremental, jobs=jobs,
+                only=(changed or {}).get(source_type)
+            )
+        return all_stats
+
+    def load_missing(self, processed_dir: Path):
+        """读入尚不在内存中的处理结果（增量启动时跳过的文件），之后的重新渲染不再解析"""
+        for yaml_file in sorted(processed_dir.glob('**/*.yaml')):
+            if yaml_file not in self.configs and not is_minified(yaml_file):
+                config = self.generator.load_yaml(yaml_file)
+                if config:
+                    self.configs[yaml_file] = config
+
+    def rebuild(self, changed: Iterable[Path], sources: List[Tuple[str, Path]],
+                processed_base: Path, output_base: Path, repo_url: str) -> Dict[str, Dict]:
+        """
+        按变化的文件重做：来源中的 YAML 只重新精简该文件并渲染其变体；
+        模板或变体定义变化时重新解析模板，全部文件用内存中的配置重新渲染
+        """
+        changed = {Path(p).resolve() for p in changed}
+        templates = self.generator.template_dir.resolve()
+        generator_changed = (self.generator.config_types_path.resolve() in changed
+                             or any(templates in p.parents for p in changed))
+        if generator_changed:
+            self.generator.reload()
+        # 非可复现模式下生成时间取本次重建的时间
+        self.generator.timestamp = build_timestamp()
+        # add_directory 只追加引用：每次重建都重新建立索引，未重建的来源同样加入
+        if self.index is not None:
+            self.index = ProviderIndex()
+
+        all_stats = {}
+        for source_type, input_dir in sources:
+            root = input_dir.resolve()
+            only = {p.relative_to(root).as_posix() for p in changed
+                    if root in p.parents and p.suffix == '.yaml'}
+            processed_dir = processed_base / source_type
+            if not only and not generator_changed:
+                if self.index is not None and processed_dir.is_dir():
+                    self.index.add_directory(processed_dir, self.configs, prefix=f'{source_type}/')
+                continue
+            if generator_changed:
+                self.load_missing(processed_dir)
+            # 单个文件的改动在主进程中完成，比启动进程池快
+            all_stats[source_type] = self.run_source(
+                source_type, input_dir, processed_dir, output_base, repo_url,
+                incremental=True, jobs=1, only=only
+            )
+        return all_stats
+
+    def watch(self, sources: List[Tuple[str, Path]], processed_base: Path,
+              output_base: Path, repo_url: str, interval: float = DEFAULT_INTERVAL,
+              rounds: Optional[int] = None):
+        """监视来源目录、模板与变体定义，变化时调用 rebuild；rounds 为重建次数上限（测试用）"""
+        self.warm = True
+        watcher = PollingWatcher([input_dir for _, input_dir in sources]
+                                 + [self.generator.template_dir, self.generator.config_types_path])
+        self.logger.info(f"监视中（每 {interval:g} 秒检查一次，Ctrl+C 退出）")
+        done = 0
+        while rounds is None or done < rounds:
+            changed = watcher.wait(interval)
+            started = time.perf_counter()
+            try:
+                all_stats = self.rebuild(changed, sources, processed_base, output_base, repo_url)
+                if all_stats and self.index is not None and self.index_path:
+                    self.index.save(self.index_path, self.generator.writer)
+            except Exception as e:
+                # 编辑中的模板/YAML 可能暂时无效，保持监视
+                self.logger.error(f"重建失败: {e}")
+                all_stats = {}
+            elapsed = (time.perf_counter() - started) * 1000
+            for source_type, stats in all_stats.items():
+                print(f"🔁 [{source_type}] {len(changed)} 个文件变化 → 精简 {len(stats['processed'])}，"
+                      f"生成 {stats['total'] - stats['reused']}，写入 {stats['written']}，"
+                      f"删除 {stats['deleted']}（{elapsed:.0f} ms）")
+            done += 1
+
+
+def parse_source(value: str) -> Tuple[str, Path]:
+    """NAME=DIR，例如 external=raw_configs/external"""
+    name, sep, path = value.partition('=')
+    if not sep or not name or not path:
+        raise argparse.ArgumentTypeError(f"expected NAME=DIR, got {value!r}")
+    return name, Path(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Process YAML configs and generate overwrites in one pass'
+    )
+    parser.add_argument('--source', '-s', type=parse_source, action='append',
+                       required=True, metavar='NAME=DIR',
+                       help='来源类型及输入目录，可重复（如 external=raw_configs/external）')
+    parser.add_argument('--processed', '-p', type=Path, default=Path('processed_configs'),
+                       help='精简 YAML 输出目录（按来源类型分子目录）')
+    parser.add_argument('--output', '-o', type=Path, required=True,
+                       help='覆写输出基础目录')
+    parser.add_argument('--templates', '-t', type=Path,
+                       default=Path('templates'))
+    parser.add_argument('--config-types', '-c', type=Path,
+                       default=Path('src/config_types.json'))
+    parser.add_argument('--repo-url',
+                       default='https://raw.githubusercontent.com/USER/REPO/main',
+                       help='Repository base URL for YAML downloads')
+    parser.add_argument('--provider-index', type=Path,
+                       help='同时写出 rule-providers 索引（见 provider_index.py）')
+    parser.add_argument('--verbose', '-v', action='store_true')
+    parser.add_argument('--incremental', action='store_true',
+                       help='只重新处理内容哈希变化的 YAML')
+    parser.add_argument('--files-from', type=parse_source, action='append', default=[],
+                       metavar='NAME=FILE',
+                       help='该来源中变化的文件列表（upstream_sync.py --changed-list），'
+                            '其余文件沿用清单中的哈希；可重复，隐含 --incremental')
+    parser.add_argument('--yaml-backend', choices=('auto',) + yaml_io.BACKENDS,
+                       default='auto', help='YAML 后端（默认优先 libyaml）')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                       help='并行进程数（0 = 全部 CPU）')
+    parser.add_argument('--streaming', action='store_true',
+                       help='解析时跳过不保留的顶层键')
+    parser.add_argument('--optimize-rules', action='store_true',
+                       help='删除重复、被覆盖及不可达的规则')
+    parser.add_argument('--prune-groups', action='store_true',
+                       help='删除规则无法到达的策略组')
+    parser.add_argument('--rewrite-filters', action='store_true',
+                       help='把 filter 改写为等价且更快的写法')
+    parser.add_argument('--probe-budget', type=float,
+                       help='每个配置每小时测速次数上限（见 cost_model.py）')
+    parser.add_argument('--minify', action='store_true',
+                       help='另外写出 X.min.yaml（与 X.yaml 并存）')
+    parser.add_argument('--compress', action='append', choices=COMPRESSIONS, default=[],
+                       help='预压缩 X.min.yaml（可重复；隐含 --minify）')
+    parser.add_argument('--prefer-minified', action='store_true',
+                       help='存在 X.min.yaml 时覆写的下载地址指向精简版本')
+    parser.add_argument('--bundle-rule-sets', action='store_true',
+                       help='合并相邻、目标相同的 RULE-SET（合并结果写入 <processed>/rule-sets，见 rule_bundler.py）')
+    parser.add_argument('--rule-sets', type=Path,
+                       help='本地规则集目录（合并时优先于下载）')
+    parser.add_argument('--rule-set-cache', type=Path, default=RULE_SET_CACHE,
+                       help='合并时下载的规则集缓存目录')
+    parser.add_argument('--bytecode-cache', type=Path,
+                       help='Jinja 字节码缓存目录')
+    parser.add_argument('--precompiled', type=Path,
+                       help='预编译模板目录')
+    parser.add_argument('--reproducible', action='store_true',
+                       help='可复现输出（时间取自 SOURCE_DATE_EPOCH）')
+    parser.add_argument('--store', type=Path,
+                       help='另外写出内容寻址的分段存储（如 processed_configs/.store，见 section_store.py）')
+    parser.add_argument('--watch', action='store_true',
+                       help='完成后继续监视来源目录、模板与 config_types，变化时增量重建（隐含 --incremental）')
+    parser.add_argument('--watch-interval', type=float, default=DEFAULT_INTERVAL,
+                       help='监视时的轮询间隔（秒）')
+    parser.add_argument('--profile', type=Path,
+                       help='写出按文件、按阶段的耗时报告（JSON，精简与生成两个阶段合并）')
+    parser.add_argument('--cprofile', type=Path,
+                       help='写出主进程的 cProfile 数据')
+
+    args = parser.parse_args()
+
+    level = logging.DEBUG if args.verbose else logging.INFO
+    logging.basicConfig(
+        level=level,
+        format='%(levelname)s: %(message)s'
+    )
+
+    missing = set(args.compress) - set(available_compressions())
+    if missing:
+        print(f"❌ 压缩格式不可用（需安装 brotli）: {', '.join(sorted(missing))}")
+        return 1
+
+    changed = {name: read_file_list(path) for name, path in args.files_from}
+    if changed or args.watch:
+        args.incremental = True
+
+    try:
+        yaml_io.set_backend(args.yaml_backend)
+        profiler = Profiler(enabled=bool(args.profile))
+        pipeline = Pipeline(
+            YAMLProcessor(streaming=args.streaming, optimize=args.optimize_rules,
+                          prune=args.prune_groups, probe_budget=args.probe_budget,
+                          minify=args.minify, compressions=tuple(args.compress),
+                          rewrite_filters=args.rewrite_filters, profiler=profiler,
+                          store=args.store,
+                          bundle_dir=args.processed / 'rule-sets' if args.bundle_rule_sets else None,
+                          # 与生成器中 DOWNLOAD_FILE 的地址规则一致
+                          bundle_url=f"{args.repo_url}/processed_configs/rule-sets",
+                          rule_set_source=RuleSetSource(args.rule_sets, args.rule_set_cache,
+                                                        fetch=True)),
+            OverwriteGenerator(args.templates, args.config_types,
+                               reproducible=args.reproducible,
+                               bytecode_cache=args.bytecode_cache,
+                               precompiled=args.precompiled,
+                               probe_budget=args.probe_budget,
+                               prefer_minified=args.prefer_minified,
+                               profiler=profiler)
+        )
+
+        if args.provider_index:
+            pipeline.index = ProviderIndex()
+            pipeline.index_path = args.provider_index
+        # 首次构建的处理结果即保留在内存中
+        pipeline.warm = args.watch
+
+        with cprofile(args.cprofile):
+            all_stats = pipeline.run(
+                args.source, args.processed, args.output, args.repo_url,
+                incremental=args.incremental,
+                jobs=args.jobs or os.cpu_count() or 1, changed=changed
+            )
+
+        for source_type, stats in all_stats.items():
+            print(f"\n{'='*60}")
+            print(f"[{source_type}] 精简: {len(stats['processed'])} 个 YAML"
+                  + (f"，未变化跳过: {stats['processed_skipped']}" if args.incremental else ''))
+            print(f"[{source_type}] 总计生成: {stats['total']} 个文件"
+                  + (f"，未变化变体: {stats['reused']}" if args.incremental else ''))
+            print(f"[{source_type}] 写入: {stats['written']} / 未变化: {stats['unchanged']} / 删除: {stats['deleted']}")
+            if args.bundle_rule_sets:
+                bundled = [b for r in stats['processed'] for b in r['meta'].get('rule_sets_bundled', [])]
+                print(f"[{source_type}] 合并规则集: {sum(len(b['providers']) for b in bundled)} → {len(bundled)}")
+            if stats['errors'] > 0:
+                print(f"⚠️  错误数: {stats['errors']}")
+
+        if not all_stats:
+            print("❌ No input directories found")
+            return 1
+
+        if pipeline.index is not None:
+            pipeline.index.save(args.provider_index, pipeline.generator.writer)
+            summary = pipeline.index.report(top=0)
+            print(f"\n🔗 Rule-providers: {summary['declared']} declared → "
+                  f"{summary['unique']} unique ({summary['shared']} shared)")
+        if args.profile:
+            profiler.write(args.profile)
+            print(f"\n📈 耗时: {profiler.summary()}")
+
+        if args.watch:
+            try:
+                pipeline.watch(args.source, args.processed, args.output, args.repo_url,
+                               interval=args.watch_interval)
+            except KeyboardInterrupt:
+                print("\n👋 停止监视")
+        return 0
+
+    except Exception as e:
+        print(f"❌ Fatal error: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+
+if __name__ == '__main__':
+    exit(main())
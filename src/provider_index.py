@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Provider Index - 全语料 rule-providers 索引
+按 (规范化 URL, behavior, format) 合并各配置中重复声明的规则集，
+记录 配置 -> 规则集 及 规则集 -> (配置, 名称) 的双向映射，
+用于回答“哪些配置共用这个规则集”“切换到配置 X 需要下载多少字节”等问题。
+"""
+import re
+import json
+import gzip
+import argparse
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+import yaml_io
+from minify import is_minified
+from output_writer import OutputWriter
+
+INDEX_FORMAT = 1
+
+# 以完整 URL 作为路径的加速代理：https://proxy.example/https://github.com/...
+_WRAPPED_URL = re.compile(r'^https?://[^/]+/(https?://.+)$', re.IGNORECASE)
+# 以 GitHub 主机名作为路径首段的加速代理：https://gh-proxy.com/raw.githubusercontent.com/...
+_GITHUB_HOSTS = ('github.com', 'raw.githubusercontent.com', 'gist.githubusercontent.com')
+_WRAPPED_HOST = re.compile(r'^https?://[^/]+/((?:%s)/.+)$' % '|'.join(map(re.escape, _GITHUB_HOSTS)),
+                           re.IGNORECASE)
+# jsDelivr GitHub 镜像：https://cdn.jsdelivr.net/gh/owner/repo@ref/path
+_JSDELIVR = re.compile(r'^[a-z0-9-]+\.jsdelivr\.net$')
+
+ProviderKey = Tuple[str, str, str]
+
+
+def normalize_url(url: str) -> str:
+    """
+    规范化规则集 URL，使同一文件的不同写法映射到同一个键：
+      - 去掉加速代理前缀（gh-proxy、ghfast 等）
+      - jsDelivr / github.com/.../raw/... 统一为 raw.githubusercontent.com
+      - refs/heads/<分支> 统一为 <分支>
+      - 协议与主机名小写，去掉默认端口与片段
+    """
+    url = url.strip()
+    while True:
+        match = _WRAPPED_URL.match(url) or _WRAPPED_HOST.match(url)
+        if not match:
+            break
+        inner = match.group(1)
+        url = inner if '://' in inner else f'https://{inner}'
+
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower() or 'https'
+    host = (parts.hostname or '').lower()
+    if parts.port and parts.port != {'http': 80, 'https': 443}.get(scheme):
+        host = f'{host}:{parts.port}'
+    segments = parts.path.split('/')[1:]
+
+    if _JSDELIVR.match(host) and segments[:1] == ['gh'] and len(segments) >= 4:
+        owner, repo_ref = segments[1], segments[2]
+        repo, _, ref = repo_ref.partition('@')
+        host, segments = 'raw.githubusercontent.com', [owner, repo, ref or 'HEAD'] + segments[3:]
+    elif host == 'github.com' and len(segments) >= 5 and segments[2] in ('raw', 'blob'):
+        host, segments = 'raw.githubusercontent.com', segments[:2] + segments[3:]
+
+    if host == 'raw.githubusercontent.com' and segments[2:4] == ['refs', 'heads']:
+        segments = segments[:2] + segments[4:]
+
+    return urlunsplit((scheme, host, '/' + '/'.join(segments), parts.query, ''))
+
+
+def provider_key(provider: Dict) -> Optional[ProviderKey]:
+    """规则集的去重键；非 http 类型（如 inline/file）返回 None"""
+    url = provider.get('url')
+    if provider.get('type', 'http') != 'http' or not url:
+        return None
+    return (normalize_url(str(url)),
+            str(provider.get('behavior', 'classical')),
+            str(provider.get('format', 'yaml')))
+
+
+class ProviderIndex:
+    """
+    entries   - 去重键 -> {'refs': [(配置, 规则集名)], 'urls': 原始 URL 集合, 'size': 字节数或 None}
+    by_config - 配置 -> 去重键列表（按声明顺序）
+    """
+
+    def __init__(self):
+        self.entries: Dict[ProviderKey, Dict] = {}
+        self.by_config: Dict[str, List[ProviderKey]] = {}
+        self.logger = logging.getLogger(__name__)
+
+    def add_config(self, config_id: str, config: Dict):
+        """加入一个已解析的配置"""
+        keys = self.by_config.setdefault(config_id, [])
+        for name, provider in (config.get('rule-providers') or {}).items():
+            if not isinstance(provider, dict):
+                continue
+            key = provider_key(provider)
+            if key is None:
+                continue
+            entry = self.entries.setdefault(key, {'refs': [], 'urls': set(), 'size': None})
+            entry['refs'].append((config_id, str(name)))
+            entry['urls'].add(str(provider['url']).strip())
+            if key not in keys:
+                keys.append(key)
+
+    def add_directory(self, base: Path, configs: Optional[Dict[Path, Dict]] = None,
+                      prefix: str = ''):
+        """加入目录下全部 YAML；configs 中已有的（流水线内存结果）不再读取"""
+        configs = configs or {}
+        for yaml_file in sorted(base.glob('**/*.yaml')):
+            if is_minified(yaml_file):
+                continue
+            config = configs.get(yaml_file)
+            if config is None:
+                try:
+                    with open(yaml_file, 'r', encoding='utf-8') as f:
+                        config = yaml_io.safe_load(f) or {}
+                except Exception as e:
+                    self.logger.error(f"Error reading {yaml_file}: {e}")
+                    continue
+            self.add_config(prefix + yaml_file.relative_to(base).as_posix(), config)
+
+    def set_sizes(self, sizes: Dict[str, int]):
+        """设置规则集大小（规范化 URL 或原始 URL -> 字节数）"""
+        normalized = {normalize_url(url): size for url, size in sizes.items()}
+        for key, entry in self.entries.items():
+            if key[0] in normalized:
+                entry['size'] = normalized[key[0]]
+
+    # ---------- 查询 ----------
+
+    def lookup(self, url: str) -> List[ProviderKey]:
+        """URL 对应的全部去重键（不同 behavior/format 视为不同规则集）"""
+        normalized = normalize_url(url)
+        return [key for key in self.entries if key[0] == normalized]
+
+    def configs_sharing(self, url: str) -> Dict[str, List[str]]:
+        """声明了该规则集的配置 -> 其中使用的规则集名"""
+        result: Dict[str, List[str]] = {}
+        for key in self.lookup(url):
+            for config_id, name in self.entries[key]['refs']:
+                result.setdefault(config_id, []).append(name)
+        return result
+
+    def fetch_cost(self, config_ids: Iterable[str],
+                   cached: Iterable[str] = ()) -> Dict:
+        """
+        一组配置需要下载的规则集（去重后）及字节数；
+        cached 为路由器上已有的配置，其规则集不再计入。
+        """
+        have: Set[ProviderKey] = set()
+        for config_id in cached:
+            have.update(self.by_config.get(config_id, []))
+
+        needed: Set[ProviderKey] = set()
+        declared = 0
+        for config_id in config_ids:
+            if config_id not in self.by_config:
+                raise KeyError(config_id)
+            keys = self.by_config[config_id]
+            declared += len(keys)
+            needed.update(k for k in keys if k not in have)
+
+        sizes = [self.entries[k]['size'] for k in needed]
+        return {
+            'declared': declared,
+            'unique': len(needed),
+            'bytes': sum(s for s in sizes if s is not None),
+            'unknown_size': sum(1 for s in sizes if s is None)
+        }
+
+    def report(self, top: int = 20) -> Dict:
+        """跨配置去重统计"""
+        declared = sum(len(e['refs']) for e in self.entries.values())
+        shared = sorted(
+            ((key, e) for key, e in self.entries.items()
+             if len({c for c, _ in e['refs']}) > 1),
+            key=lambda item: (-len(item[1]['refs']), item[0])
+        )
+        return {
+            'configs': len(self.by_config),
+            'declared': declared,
+            'unique': len(self.entries),
+            'shared': len(shared),
+            'top_shared': [
+                {'url': key[0], 'behavior': key[1], 'format': key[2],
+                 'configs': len({c for c, _ in e['refs']}),
+                 'names': sorted({n for _, n in e['refs']}),
+                 'spellings': len(e['urls'])}
+                for key, e in shared[:top]
+            ]
+        }
+
+    # ---------- 序列化 ----------
+
+    def to_json(self) -> Dict:
+        """紧凑格式：配置以下标引用"""
+        config_ids = sorted(self.by_config)
+        position = {c: i for i, c in enumerate(config_ids)}
+        providers = []
+        for key in sorted(self.entries):
+            entry = self.entries[key]
+            item = {'u': key[0], 'b': key[1], 'f': key[2],
+                    'r': [[position[c], n] for c, n in entry['refs']]}
+            if entry['size'] is not None:
+                item['s'] = entry['size']
+            if entry['urls'] != {key[0]}:
+                item['o'] = sorted(entry['urls'])
+            providers.append(item)
+        return {'format': INDEX_FORMAT, 'configs': config_ids, 'providers': providers}
+
+    @classmethod
+    def from_json(cls, data: Dict) -> 'ProviderIndex':
+        if data.get('format') != INDEX_FORMAT:
+            raise ValueError(f"Unsupported provider index format: {data.get('format')}")
+        index = cls()
+        config_ids = data['configs']
+        for config_id in config_ids:
+            index.by_config[config_id] = []
+        for item in data['providers']:
+            key = (item['u'], item['b'], item['f'])
+            refs = [(config_ids[i], name) for i, name in item['r']]
+            index.entries[key] = {'refs': refs, 'urls': set(item.get('o', [item['u']])),
+                                  'size': item.get('s')}
+            for config_id, _ in refs:
+                if key not in index.by_config[config_id]:
+                    index.by_config[config_id].append(key)
+        return index
+
+    def save(self, path: Path, writer: Optional[OutputWriter] = None) -> bool:
+        """写入索引（.gz 结尾时 gzip 压缩）；返回是否实际写入"""
+        text = json.dumps(self.to_json(), ensure_ascii=False, separators=(',', ':')) + '\n'
+        if path.suffix == '.gz':
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with gzip.GzipFile(path, 'wb', mtime=0) as f:
+                f.write(text.encode('utf-8'))
+            return True
+        return (writer or OutputWriter()).write(path, text)
+
+    @classmethod
+    def load(cls, path: Path) -> 'ProviderIndex':
+        opener = gzip.open if path.suffix == '.gz' else open
+        with opener(path, 'rt', encoding='utf-8') as f:
+            return cls.from_json(json.load(f))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Index rule-providers across configs')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    build = sub.add_parser('build', help='Build the index from processed configs')
+    build.add_argument('--input', '-i', type=Path, required=True,
+                       help='Processed configs directory')
+    build.add_argument('--output', '-o', type=Path, required=True,
+                       help='Index path (.json or .json.gz)')
+    build.add_argument('--sizes', type=Path,
+                       help='JSON mapping of provider URL -> size in bytes')
+
+    shared = sub.add_parser('shared', help='Configs that declare a provider URL')
+    shared.add_argument('--index', type=Path, required=True)
+    shared.add_argument('url')
+
+    cost = sub.add_parser('cost', help='Unique providers/bytes to fetch for configs')
+    cost.add_argument('--index', type=Path, required=True)
+    cost.add_argument('--cached', nargs='*', default=[],
+                      help='Configs whose providers are already on the router')
+    cost.add_argument('--probe-cache', type=Path,
+                      help='Read sizes from provider_prober.py results (e.g. .cache/provider-probe.json)')
+    cost.add_argument('configs', nargs='+')
+
+    report = sub.add_parser('report', help='Cross-config deduplication report')
+    report.add_argument('--index', type=Path, required=True)
+    report.add_argument('--top', type=int, default=20)
+    report.add_argument('--probe-cache', type=Path,
+                        help='Read sizes from provider_prober.py results (e.g. .cache/provider-probe.json)')
+
+    parser.add_argument('--verbose', '-v', action='store_true')
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format='%(levelname)s: %(message)s'
+    )
+
+    if args.command == 'build':
+        if not args.input.exists():
+            print(f"❌ Input directory not found: {args.input}")
+            return 1
+        index = ProviderIndex()
+        index.add_directory(args.input)
+        if args.sizes:
+            index.set_sizes(json.loads(args.sizes.read_text(encoding='utf-8')))
+        index.save(args.output)
+        summary = index.report(top=0)
+        print(f"✅ Indexed {summary['declared']} rule-providers in {summary['configs']} configs "
+              f"→ {summary['unique']} unique ({summary['shared']} shared)")
+        return 0
+
+    index = ProviderIndex.load(args.index)
+    if getattr(args, 'probe_cache', None):
+        # 探测结果每天变化，不写入发布的索引，查询时再合并
+        from provider_prober import ProviderProber
+        index.set_sizes(ProviderProber(args.probe_cache).sizes())
+
+    if args.command == 'shared':
+        for config_id, names in sorted(index.configs_sharing(args.url).items()):
+            print(f"{config_id}: {', '.join(names)}")
+        return 0
+
+    if args.command == 'cost':
+        try:
+            result = index.fetch_cost(args.configs, cached=args.cached)
+        except KeyError as e:
+            print(f"❌ Unknown config: {e.args[0]}")
+            return 1
+        print(json.dumps(result, indent=2))
+        return 0
+
+    print(json.dumps(index.report(top=args.top), ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Provider Prober - 探测 rule-providers / proxy-providers 的可达性与大小
+全语料按 URL 去重（镜像前缀照原样请求，镜像本身是否可用同样重要），
+并发 HEAD（无 Content-Length 或不支持 HEAD 时改用 Range: bytes=0-0 的 GET），
+记录状态码、延迟与字节数；结果缓存在 JSON 文件中，超过 TTL 才重新探测。
+报告首次启动需下载量过大、或有失效订阅/规则集的配置；大小只保存在缓存中，
+不写入发布的 provider-index（provider_index.py cost/report --probe-cache 查询时读取）。
+"""
+import re
+import json
+import time
+import asyncio
+import argparse
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+import yaml_io
+from http_pool import HTTPPool
+from minify import is_minified
+from output_writer import OutputWriter
+from overwrite_generator import OverwriteGenerator
+
+# 缓存格式变化时递增
+PROBER_VERSION = '1'
+
+DEFAULT_TTL = 86400
+# 失败的结果较快重试（可能只是暂时不可用）
+DEFAULT_FAILURE_TTL = 3600
+DEFAULT_CONCURRENCY = 16
+DEFAULT_TIMEOUT = 15
+# 首次启动需下载的规则集总量超过该值时标出（字节）
+DEFAULT_MAX_BYTES = 8 * 1024 * 1024
+# 上游配置中订阅地址的占位写法（如 https://example.com/xxx），不探测
+PLACEHOLDER_HOSTS = ('example.com', 'example.org', 'example.net')
+# 不支持 HEAD 或 HEAD 结果不可信时改用 GET
+_HEAD_FALLBACK = {400, 403, 404, 405, 501}
+_CONTENT_RANGE = re.compile(r'bytes\s+\d+-\d+/(\d+)', re.IGNORECASE)
+
+
+def probeable(url: str) -> bool:
+    """http(s) 且不是占位地址"""
+    parts = urlsplit(url)
+    host = (parts.hostname or '').lower()
+    if parts.scheme not in ('http', 'https') or not host:
+        return False
+    return not any(host == h or host.endswith('.' + h) for h in PLACEHOLDER_HOSTS)
+
+
+def config_providers(config: Dict) -> Dict[str, List[str]]:
+    """配置中需要下载的 URL：rule-providers 取处理后保留的声明，proxy-providers 取生成器的分析结果"""
+    rules = [str(p['url']).strip() for p in (config.get('rule-providers') or {}).values()
+             if isinstance(p, dict) and p.get('type', 'http') == 'http' and p.get('url')]
+    proxies = [str(p['url']).strip()
+               for p in OverwriteGenerator.analyze_config(config, '')['proxy_providers']
+               if p['type'] == 'http' and p['url']]
+    return {'rule': [u for u in rules if probeable(u)],
+            'proxy': [u for u in proxies if probeable(u)]}
+
+
+def collect(base: Path) -> Dict[str, Dict[str, List[str]]]:
+    """目录下每个配置（相对路径）的 provider URL"""
+    configs = {}
+    for yaml_file in sorted(base.glob('**/*.yaml')):
+        if is_minified(yaml_file):
+            continue
+        try:
+            with open(yaml_file, 'r', encoding='utf-8') as f:
+                config = yaml_io.safe_load(f) or {}
+        except Exception as e:
+            logging.getLogger(__name__).error(f"Error reading {yaml_file}: {e}")
+            continue
+        configs[yaml_file.relative_to(base).as_posix()] = config_providers(config)
+    return configs
+
+
+def _length(headers: Dict[str, str]) -> Optional[int]:
+    match = _CONTENT_RANGE.match(headers.get('content-range', ''))
+    if match:
+        return int(match.group(1))
+    if headers.get('content-length', '').isdigit():
+        return int(headers['content-length'])
+    return None
+
+
+class ProviderProber:
+    def __init__(self, cache_path: Optional[Path] = None, ttl: float = DEFAULT_TTL,
+                 failure_ttl: float = DEFAULT_FAILURE_TTL):
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.failure_ttl = failure_ttl
+        self.logger = logging.getLogger(__name__)
+        self.results: Dict[str, Dict] = self.load()
+
+    def load(self) -> Dict[str, Dict]:
+        if not self.cache_path or not self.cache_path.is_file():
+            return {}
+        try:
+            data = json.loads(self.cache_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Ignoring unreadable probe cache {self.cache_path}: {e}")
+            return {}
+        return data.get('results', {}) if data.get('version') == PROBER_VERSION else {}
+
+    def save(self, writer: Optional[OutputWriter] = None) -> bool:
+        data = {'version': PROBER_VERSION,
+                'results': {url: self.results[url] for url in sorted(self.results)}}
+        text = json.dumps(data, ensure_ascii=False, indent=1) + '\n'
+        return (writer or OutputWriter()).write(self.cache_path, text)
+
+    def is_fresh(self, url: str, now: float) -> bool:
+        result = self.results.get(url)
+        if not result:
+            return False
+        ttl = self.ttl if result['ok'] else self.failure_ttl
+        return now - result['checked'] < ttl
+
+    async def probe_one(self, pool: HTTPPool, url: str, now: float) -> Dict:
+        identity = {'Accept-Encoding': 'identity'}
+        result = {'ok': False, 'status': None, 'length': None, 'latency_ms': None,
+                  'method': 'HEAD', 'checked': int(now)}
+        try:
+            response = await pool.request('HEAD', url, identity)
+            length = _length(response.headers)
+            if response.status in _HEAD_FALLBACK or (response.status == 200 and length is None):
+                result['method'] = 'GET'
+                response = await pool.get(url, {**identity, 'Range': 'bytes=0-0'})
+                length = _length(response.headers)
+                # 服务端忽略 Range 时返回完整内容
+                if response.status == 200 and length is None:
+                    length = len(response.body)
+            result.update(ok=response.status in (200, 206), status=response.status,
+                          length=length, latency_ms=round(response.elapsed * 1000))
+        except Exception as e:
+            result['error'] = f'{type(e).__name__}: {e}'
+        return result
+
+    async def probe(self, urls: Iterable[str], concurrency: int = DEFAULT_CONCURRENCY,
+                    timeout: float = DEFAULT_TIMEOUT, now: Optional[float] = None) -> Dict:
+        """探测缓存过期或没有记录的 URL，返回本次统计"""
+        now = time.time() if now is None else now
+        pending = sorted({u for u in urls if not self.is_fresh(u, now)})
+        async with HTTPPool(concurrency=concurrency, timeout=timeout) as pool:
+            results = await asyncio.gather(*(self.probe_one(pool, u, now) for u in pending))
+            stats = dict(pool.stats)
+        self.results.update(zip(pending, results))
+        return {'probed': len(pending), 'failed': sum(1 for r in results if not r['ok']), **stats}
+
+    def retain(self, urls: Iterable[str]):
+        """丢弃已不在任何配置中的 URL 的记录"""
+        keep = set(urls)
+        self.results = {u: r for u, r in self.results.items() if u in keep}
+
+    def sizes(self) -> Dict[str, int]:
+        """可访问且已知大小的 URL -> 字节数（供 ProviderIndex.set_sizes）"""
+        return {url: r['length'] for url, r in self.results.items()
+                if r['ok'] and r['length'] is not None}
+
+    def report(self, configs: Dict[str, Dict[str, List[str]]],
+               max_bytes: int = DEFAULT_MAX_BYTES) -> Dict:
+        """每个配置的首次下载量（规则集，去重）与失效 URL；订阅大小因人而异，不计入"""
+        per_config = {}
+        for config_id, urls in configs.items():
+            rule_urls = sorted(set(urls['rule']))
+            known = [self.results[u] for u in rule_urls if u in self.results]
+            dead = sorted(u for u in set(urls['rule']) | set(urls['proxy'])
+                          if u in self.results and not self.results[u]['ok'])
+            total = sum(r['length'] for r in known if r['ok'] and r['length'] is not None)
+            per_config[config_id] = {
+                'rule_providers': len(rule_urls),
+                'bytes': total,
+                'unknown_size': sum(1 for r in known if not r['ok'] or r['length'] is None),
+                'dead': dead,
+            }
+        results = list(self.results.values())
+        return {
+            'urls': len(results),
+            'dead': sorted(u for u, r in self.results.items() if not r['ok']),
+            'slowest': sorted(((u, r['latency_ms']) for u, r in self.results.items()
+                               if r['latency_ms'] is not None), key=lambda x: -x[1])[:10],
+            'oversized': sorted(c for c, r in per_config.items() if r['bytes'] > max_bytes),
+            'with_dead': sorted(c for c, r in per_config.items() if r['dead']),
+            'configs': per_config,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Probe provider URLs for reachability and size')
+    parser.add_argument('--input', '-i', type=Path, required=True,
+                       help='Processed configs directory')
+    parser.add_argument('--cache', type=Path, default=Path('.cache/provider-probe.json'),
+                       help='Probe results cache')
+    parser.add_argument('--ttl', type=float, default=DEFAULT_TTL,
+                       help='Re-probe reachable URLs older than this (seconds)')
+    parser.add_argument('--failure-ttl', type=float, default=DEFAULT_FAILURE_TTL,
+                       help='Re-probe failed URLs older than this (seconds)')
+    parser.add_argument('--concurrency', '-j', type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT)
+    parser.add_argument('--max-bytes', type=int, default=DEFAULT_MAX_BYTES,
+                       help='Flag configs whose rule-providers exceed this many bytes')
+    parser.add_argument('--json', type=Path, help='Write the full report as JSON')
+    parser.add_argument('--strict', action='store_true',
+                       help='Exit 1 when any config is oversized or has dead providers')
+    parser.add_argument('--verbose', '-v', action='store_true')
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format='%(levelname)s: %(message)s'
+    )
+
+    if not args.input.exists():
+        print(f"❌ Input directory not found: {args.input}")
+        return 1
+
+    configs = collect(args.input)
+    urls = {u for c in configs.values() for kind in c.values() for u in kind}
+    prober = ProviderProber(args.cache, ttl=args.ttl, failure_ttl=args.failure_ttl)
+    stats = asyncio.run(prober.probe(urls, concurrency=args.concurrency, timeout=args.timeout))
+    prober.retain(urls)
+    prober.save()
+
+    report = prober.report(configs, max_bytes=args.max_bytes)
+    print(f"🔍 {len(urls)} unique URLs in {len(configs)} configs: probed {stats['probed']} "
+          f"({stats['failed']} failed, {stats['connections']} connections), "
+          f"{len(urls) - stats['probed']} cached")
+    for url in report['dead']:
+        result = prober.results[url]
+        print(f"  ❌ {url}: {result.get('status') or result.get('error')}")
+    for config_id in report['oversized']:
+        print(f"  📦 {config_id}: {report['configs'][config_id]['bytes'] / 1024 / 1024:.1f} MB")
+    print(f"⚠️  {len(report['with_dead'])} configs with dead providers, "
+          f"{len(report['oversized'])} over {args.max_bytes / 1024 / 1024:.1f} MB")
+
+    if args.json:
+        args.json.write_text(json.dumps(report, ensure_ascii=False, indent=2) + '\n',
+                             encoding='utf-8')
+    if args.strict and (report['oversized'] or report['with_dead']):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
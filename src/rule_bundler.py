@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Rule Bundler - 把相邻、目标相同的 RULE-SET 合并为一个规则集
+每个 http 规则集在路由器上都是一次下载、一个文件和一个定时刷新；
+连续几条 RULE-SET 指向同一策略组、options 相同、规则集 behavior/format/proxy 等也相同时，
+先命中哪一条结果都一样，合并（按顺序去重）后语义不变。
+  - 只合并 yaml/text 格式（mrs 为二进制格式，无法在这里合并）
+  - 只合并在 rules 中只被引用一次的规则集（逻辑规则、sub-rules 中出现的不动）
+  - 合并结果写为 <bundle_dir>/<id>.list（text 格式），id 由成员 URL 决定，
+    内容变化时文件名不变，`refresh` 据旁边的 <id>.json 重新下载成员并更新内容
+"""
+import os
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import yaml_io
+from http_pool import HTTPPool
+from minify import is_minified
+from output_writer import OutputWriter
+from rule_engine import find_rule_set, load_rule_set
+from rule_parser import parse_rule
+
+# 合并逻辑或输出格式变化时递增
+BUNDLER_VERSION = '1'
+
+BUNDLEABLE_FORMATS = ('yaml', 'text')
+# 合并时允许不同的键（yaml/text 都读成条目，合并结果为 text）；其余键（behavior、proxy 等）必须相同
+VARYING_KEYS = ('url', 'path', 'interval', 'format')
+MIN_BUNDLE = 2
+DEFAULT_TTL = 86400
+RULE_SET_CACHE = Path('.cache/rule-sets')
+
+
+def _suffix(fmt: str) -> str:
+    return '.yaml' if fmt == 'yaml' else '.list'
+
+
+class RuleSetSource:
+    """
+    规则集内容来源：
+      local_dir - 本地规则集目录（按规则集名或 URL 文件名查找，与 rule_engine.py 相同）
+      cache_dir - 下载缓存（按 URL 哈希命名）；fetch 为 True 时下载缺失或超过 ttl 的文件
+    """
+
+    def __init__(self, local_dir: Optional[Path] = None, cache_dir: Optional[Path] = None,
+                 fetch: bool = False, ttl: float = DEFAULT_TTL, concurrency: int = 8):
+        self.local_dir = local_dir
+        self.cache_dir = cache_dir
+        self.fetch = fetch and cache_dir is not None
+        self.ttl = ttl
+        self.concurrency = concurrency
+        self.logger = logging.getLogger(__name__)
+
+    def cache_path(self, url: str, fmt: str) -> Path:
+        return self.cache_dir / f'{hashlib.sha256(url.encode()).hexdigest()[:32]}{_suffix(fmt)}'
+
+    def _local(self, name: str, provider: Dict) -> Optional[Path]:
+        if self.local_dir is None:
+            return None
+        return find_rule_set(self.local_dir, name, str(provider.get('url', '')))
+
+    def prefetch(self, members: Iterable[Tuple[str, Dict]]):
+        """下载本地没有、缓存缺失或过期的成员；失败时沿用旧缓存"""
+        if not self.fetch:
+            return
+        now = time.time()
+        pending = {}
+        for name, provider in members:
+            if self._local(name, provider):
+                continue
+            path = self.cache_path(provider['url'], provider.get('format', 'yaml'))
+            if not path.is_file() or now - path.stat().st_mtime >= self.ttl:
+                pending[path] = provider['url']
+        if not pending:
+            return
+
+        async def run():
+            async with HTTPPool(concurrency=self.concurrency) as pool:
+                responses = await asyncio.gather(*(pool.get(url) for url in pending.values()),
+                                                 return_exceptions=True)
+            for (path, url), response in zip(pending.items(), responses):
+                if isinstance(response, Exception) or response.status != 200:
+                    self.logger.warning(f"Rule set not fetched: {url} "
+                                        f"({getattr(response, 'status', response)})")
+                    continue
+                OutputWriter().write(path, response.body)
+                # 内容未变化时 write 不改动文件，仍需更新时间
+                os.utime(path)
+
+        asyncio.run(run())
+
+    def entries(self, name: str, provider: Dict) -> Optional[List[str]]:
+        """规则集条目；没有内容时返回 None"""
+        path = self._local(name, provider)
+        if path is None and self.cache_dir is not None:
+            path = self.cache_path(str(provider.get('url', '')), provider.get('format', 'yaml'))
+        if path is None or not path.is_file():
+            return None
+        try:
+            return load_rule_set(path)
+        except Exception as e:
+            self.logger.warning(f"Unreadable rule set {path}: {e}")
+            return None
+
+
+def bundle_id(behavior: str, urls: List[str]) -> str:
+    return hashlib.sha256(json.dumps([behavior, urls]).encode('utf-8')).hexdigest()[:16]
+
+
+def merge_entries(parts: Iterable[List[str]]) -> List[str]:
+    """按顺序合并，去掉重复条目"""
+    seen: Set[str] = set()
+    merged = []
+    for entries in parts:
+        for entry in entries:
+            if entry not in seen:
+                seen.add(entry)
+                merged.append(entry)
+    return merged
+
+
+def _reference_counts(config: Dict) -> Dict[str, int]:
+    """每个规则集被引用的次数；逻辑规则、sub-rules 中出现的按名称保守计入"""
+    providers = config.get('rule-providers') or {}
+    counts: Dict[str, int] = {}
+    nested = []
+    for raw in config.get('rules') or []:
+        rule = parse_rule(str(raw))
+        if rule and rule.type == 'RULE-SET':
+            counts[rule.payload] = counts.get(rule.payload, 0) + 1
+        else:
+            nested.append(str(raw))
+    sub_rules = config.get('sub-rules')
+    if isinstance(sub_rules, dict):
+        for rules in sub_rules.values():
+            nested.extend(str(r) for r in rules or [])
+    for raw in nested:
+        if 'RULE-SET' not in raw:
+            continue
+        for name in providers:
+            if str(name) in raw:
+                counts[name] = counts.get(name, 0) + 1
+    return counts
+
+
+class RuleSetBundler:
+    def __init__(self, bundle_dir: Path, base_url: str, source: Optional[RuleSetSource] = None,
+                 writer: Optional[OutputWriter] = None):
+        self.bundle_dir = bundle_dir
+        self.base_url = base_url.rstrip('/')
+        self.source = source or RuleSetSource()
+        self.writer = writer or OutputWriter()
+        self.logger = logging.getLogger(__name__)
+
+    def _runs(self, config: Dict) -> List[List[Tuple[int, str]]]:
+        """可合并的相邻 RULE-SET：[(规则下标, 规则集名)]"""
+        providers = config['rule-providers']
+        counts = _reference_counts(config)
+        runs, run, previous = [], [], None
+        for index, raw in enumerate(config['rules']):
+            rule = parse_rule(str(raw))
+            provider = providers.get(rule.payload) if rule and rule.type == 'RULE-SET' else None
+            key = None
+            if (isinstance(provider, dict) and provider.get('type', 'http') == 'http'
+                    and provider.get('url')
+                    and provider.get('format', 'yaml') in BUNDLEABLE_FORMATS
+                    and counts.get(rule.payload) == 1):
+                shared = {k: v for k, v in provider.items() if k not in VARYING_KEYS}
+                key = (rule.target, rule.options,
+                       json.dumps(shared, sort_keys=True, ensure_ascii=False, default=str))
+            if key is None or key != previous:
+                runs.append(run)
+                run = []
+            if key is not None:
+                run.append((index, rule.payload))
+            previous = key
+        runs.append(run)
+        return [r for r in runs if len(r) >= MIN_BUNDLE]
+
+    def write_bundle(self, behavior: str, members: List[Tuple[str, Dict]],
+                     parts: List[List[str]]) -> Tuple[str, int]:
+        """写出合并后的规则集及成员说明，返回 (文件名, 条目数)"""
+        urls = [str(p['url']) for _, p in members]
+        name = f'{bundle_id(behavior, urls)}.list'
+        merged = merge_entries(parts)
+        self.writer.write(self.bundle_dir / name, ''.join(f'{e}\n' for e in merged))
+        sources = [{'name': n, 'url': str(p['url']), 'format': p.get('format', 'yaml')}
+                   for n, p in members]
+        self.writer.write(self.bundle_dir / f'{name[:-len(".list")]}.json',
+                          json.dumps({'version': BUNDLER_VERSION, 'behavior': behavior,
+                                      'sources': sources}, ensure_ascii=False, indent=1) + '\n')
+        return name, len(merged)
+
+    def bundle(self, config: Dict) -> List[Dict]:
+        """原地合并配置中的规则集，返回合并记录"""
+        providers, rules = config.get('rule-providers'), config.get('rules')
+        if not isinstance(providers, dict) or not isinstance(rules, list):
+            return []
+        runs = self._runs(config)
+        self.source.prefetch((n, providers[n]) for run in runs for _, n in run)
+
+        bundled, replaced, dropped = [], {}, {}
+        for run in runs:
+            # 取不到内容的成员把连续段截断
+            segments, segment = [], []
+            for index, name in run:
+                entries = self.source.entries(name, providers[name])
+                if entries is None:
+                    segments.append(segment)
+                    segment = []
+                else:
+                    segment.append((index, name, entries))
+            segments.append(segment)
+
+            for segment in (s for s in segments if len(s) >= MIN_BUNDLE):
+                members = [(name, providers[name]) for _, name, _ in segment]
+                first = members[0][1]
+                behavior = str(first.get('behavior', 'classical'))
+                file_name, count = self.write_bundle(behavior, members,
+                                                     [e for _, _, e in segment])
+                new_name = f'{members[0][0]}+{len(members) - 1}'
+                while new_name in providers:
+                    new_name += '+'
+                intervals = [p['interval'] for _, p in members if isinstance(p.get('interval'), int)]
+                merged = {}
+                for key, value in first.items():
+                    if key == 'url':
+                        merged['url'] = f'{self.base_url}/{file_name}'
+                    elif key == 'interval':
+                        merged['interval'] = min(intervals)
+                    elif key == 'format':
+                        merged['format'] = 'text'
+                    elif key != 'path':
+                        merged[key] = value
+                merged.setdefault('format', 'text')
+                if intervals:
+                    merged.setdefault('interval', min(intervals))
+
+                rule = parse_rule(str(rules[segment[0][0]]))
+                replaced[segment[0][0]] = ','.join(('RULE-SET', new_name, rule.target) + rule.options)
+                dropped.update({index: None for index, _, _ in segment[1:]})
+                bundled.append({'name': new_name, 'url': merged['url'], 'entries': count,
+                                'providers': [n for n, _ in members], 'provider': merged})
+
+        if not bundled:
+            return []
+
+        # 原地修改（对象可能带锚点）；合并后的规则集放在第一个成员的位置
+        first_of = {b['providers'][0]: b for b in bundled}
+        members = {n for b in bundled for n in b['providers']}
+        items = list(providers.items())
+        providers.clear()
+        for name, provider in items:
+            if name in first_of:
+                providers[first_of[name]['name']] = first_of[name].pop('provider')
+            elif name not in members:
+                providers[name] = provider
+        rules[:] = [replaced.get(i, raw) for i, raw in enumerate(rules) if i not in dropped]
+        return bundled
+
+    # ---------- 维护 ----------
+
+    def bundle_files(self) -> List[Path]:
+        return sorted(self.bundle_dir.glob('*.json'))
+
+    def refresh(self) -> Dict[str, int]:
+        """按成员说明重新取得内容并更新合并文件（名称不变，配置无需重新处理）"""
+        stats = {'bundles': 0, 'updated': 0, 'incomplete': 0}
+        for info_path in self.bundle_files():
+            info = json.loads(info_path.read_text(encoding='utf-8'))
+            members = [(s['name'], {'url': s['url'], 'format': s['format']})
+                       for s in info['sources']]
+            self.source.prefetch(members)
+            parts = [self.source.entries(n, p) for n, p in members]
+            stats['bundles'] += 1
+            if any(p is None for p in parts):
+                stats['incomplete'] += 1
+                continue
+            text = ''.join(f'{e}\n' for e in merge_entries(parts))
+            if self.writer.write(info_path.with_suffix('.list'), text):
+                stats['updated'] += 1
+        return stats
+
+    def gc(self, processed_dir: Path) -> int:
+        """删除不再被任何处理后配置引用的合并文件，返回删除数量"""
+        live = set()
+        for yaml_file in processed_dir.glob('**/*.yaml'):
+            if is_minified(yaml_file):
+                continue
+            with open(yaml_file, 'r', encoding='utf-8') as f:
+                config = yaml_io.safe_load(f) or {}
+            for provider in (config.get('rule-providers') or {}).values():
+                url = str(provider.get('url', '')) if isinstance(provider, dict) else ''
+                if url.startswith(self.base_url + '/'):
+                    live.add(url.rsplit('/', 1)[-1][:-len('.list')])
+        removed = 0
+        for info_path in self.bundle_files():
+            if info_path.stem not in live:
+                self.writer.delete(info_path.with_suffix('.list'))
+                self.writer.delete(info_path)
+                removed += 1
+        return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Maintain bundled rule-set files')
+    parser.add_argument('--dir', type=Path, required=True,
+                       help='Bundle directory (e.g. processed_configs/rule-sets)')
+    parser.add_argument('--url', required=True,
+                       help='Published base URL of the bundle directory')
+    parser.add_argument('--rule-sets', type=Path, help='Local rule-set directory')
+    parser.add_argument('--cache', type=Path, default=RULE_SET_CACHE,
+                       help='Download cache for member rule sets')
+    parser.add_argument('--ttl', type=float, default=DEFAULT_TTL,
+                       help='Re-download cached member rule sets older than this (seconds)')
+    parser.add_argument('--offline', action='store_true', help='Do not download')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('refresh', help='Re-fetch members and rewrite bundle contents')
+    gc = sub.add_parser('gc', help='Remove bundles no processed config references')
+    gc.add_argument('--input', '-i', type=Path, required=True, help='Processed configs directory')
+    parser.add_argument('--verbose', '-v', action='store_true')
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format='%(levelname)s: %(message)s'
+    )
+
+    source = RuleSetSource(args.rule_sets, args.cache, fetch=not args.offline, ttl=args.ttl)
+    bundler = RuleSetBundler(args.dir, args.url, source)
+    if args.command == 'refresh':
+        stats = bundler.refresh()
+        print(f"📦 {stats['bundles']} bundles: {stats['updated']} updated, "
+              f"{stats['incomplete']} kept (members unavailable)")
+    else:
+        print(f"Removed {bundler.gc(args.input)} unreferenced bundles")
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -0,0 +1,561 @@
+#!/usr/bin/env python3
+"""
+Rule Engine - 离线规则匹配模拟
+对 YAMLProcessor 精简后的 rules + rule-providers + proxy-groups 建立索引，
+批量回答“example.com:443/udp 在配置 X 下走哪个策略组”。
+
+规则按类型编译为索引，每个索引返回命中规则的最小下标（即最先匹配的规则）：
+  DOMAIN          - 哈希表
+  DOMAIN-SUFFIX   - 反转标签后缀树
+  DOMAIN-KEYWORD  - Aho-Corasick 自动机
+  IP-CIDR(6)      - 有序区间表（二分查找）
+  DST-PORT        - 有序区间表
+  NETWORK         - 哈希表
+其余可离线判断的规则（AND/OR/NOT、DOMAIN-REGEX、GEOIP,private 等）按顺序逐条检查，
+且只检查下标小于索引结果的部分。RULE-SET 由本地规则集文件展开。
+离线无法判断的规则（GEOIP,CN、PROCESS-NAME、SRC-* 等）及本地没有文件的 RULE-SET 被跳过；
+查询在命中之前经过这样的规则（且其目标与命中的不同）时，结果标为不确定，不报告后面的目标。
+
+查询格式：host[=ip][:port][/tcp|udp]，IPv6 写作 [2001:db8::1]:443
+不给出 IP 的域名查询不会命中 IP 类规则（离线无法解析）。
+"""
+import re
+import sys
+import json
+import bisect
+import heapq
+import argparse
+import ipaddress
+import logging
+from collections import deque
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import yaml_io
+from rule_parser import Rule, parse_rule, split_logic_payload, IP_TYPES, LOGIC_TYPES, MATCH_TYPES
+
+RULE_SET_SUFFIXES = ('.yaml', '.yml', '.list', '.txt')
+
+
+class Query(NamedTuple):
+    host: Optional[str]
+    ip: Optional[ipaddress._BaseAddress]
+    port: Optional[int]
+    network: str
+    text: str
+
+
+def parse_query(text: str) -> Query:
+    """host[=ip][:port][/network]"""
+    rest = text.strip()
+    network = 'tcp'
+    if '/' in rest:
+        rest, network = rest.rsplit('/', 1)
+    port = None
+    if rest.startswith('['):
+        rest, _, tail = rest[1:].partition(']')
+        if tail.startswith(':'):
+            port = int(tail[1:])
+    elif rest.count(':') == 1:
+        rest, port_text = rest.split(':')
+        port = int(port_text)
+
+    host, _, ip_text = rest.partition('=')
+    ip = None
+    try:
+        ip = ipaddress.ip_address(ip_text or host)
+        if not ip_text:
+            host = ''
+    except ValueError:
+        if ip_text:
+            raise
+    host = host.lower().rstrip('.') or None
+    return Query(host, ip, port, network.lower(), text.strip())
+
+
+class IntervalTable:
+    """区间 -> 规则下标；预先切分为互不重叠的基本区间，查询时二分"""
+
+    def __init__(self):
+        self.intervals: List[Tuple[int, int, int]] = []
+        self.starts: List[int] = []
+        self.mins: List[Optional[int]] = []
+
+    def add(self, start: int, end: int, index: int):
+        self.intervals.append((start, end, index))
+
+    def build(self):
+        points = sorted({s for s, _, _ in self.intervals} | {e + 1 for _, e, _ in self.intervals})
+        ordered = sorted(self.intervals)
+        active: List[Tuple[int, int]] = []
+        i = 0
+        starts, mins = [], []
+        for point in points:
+            while i < len(ordered) and ordered[i][0] <= point:
+                heapq.heappush(active, (ordered[i][2], ordered[i][1]))
+                i += 1
+            while active and active[0][1] < point:
+                heapq.heappop(active)
+            best = active[0][0] if active else None
+            if mins and mins[-1] == best:
+                continue
+            starts.append(point)
+            mins.append(best)
+        self.starts, self.mins = starts, mins
+        self.intervals = []
+
+    def find(self, value: int) -> Optional[int]:
+        pos = bisect.bisect_right(self.starts, value) - 1
+        return self.mins[pos] if pos >= 0 else None
+
+
+class SuffixIndex:
+    """反转标签后缀树，节点上记录以此为后缀的最小规则下标"""
+    _END = ''
+
+    def __init__(self):
+        self.root: Dict = {}
+
+    def add(self, suffix: str, index: int):
+        node = self.root
+        for label in reversed(suffix.split('.')):
+            node = node.setdefault(label, {})
+        node[self._END] = min(node.get(self._END, index), index)
+
+    def find(self, domain: str) -> Optional[int]:
+        best = None
+        node = self.root
+        for label in reversed(domain.split('.')):
+            node = node.get(label)
+            if node is None:
+                break
+            index = node.get(self._END)
+            if index is not None and (best is None or index < best):
+                best = index
+        return best
+
+
+class KeywordIndex:
+    """Aho-Corasick 自动机；输出为命中关键字中的最小规则下标"""
+
+    def __init__(self):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.out: List[Optional[int]] = [None]
+        self.fail: List[int] = [0]
+
+    def add(self, keyword: str, index: int):
+        node = 0
+        for ch in keyword:
+            nxt = self.goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[node][ch] = nxt
+                self.goto.append({})
+                self.out.append(None)
+                self.fail.append(0)
+            node = nxt
+        if self.out[node] is None or index < self.out[node]:
+            self.out[node] = index
+
+    def build(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self.goto[node].items():
+                queue.append(child)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                target = self.goto[f].get(ch, 0)
+                self.fail[child] = target if target != child else 0
+                inherited = self.out[self.fail[child]]
+                if inherited is not None and (self.out[child] is None or inherited < self.out[child]):
+                    self.out[child] = inherited
+
+    def find(self, text: str) -> Optional[int]:
+        best = None
+        node = 0
+        goto, fail, out = self.goto, self.fail, self.out
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            index = out[node]
+            if index is not None and (best is None or index < best):
+                best = index
+        return best
+
+
+def _port_ranges(payload: str) -> List[Tuple[int, int]]:
+    """80/443/1000-2000 -> [(80, 80), (443, 443), (1000, 2000)]"""
+    ranges = []
+    for part in payload.split('/'):
+        low, _, high = part.strip().partition('-')
+        ranges.append((int(low), int(high or low)))
+    return ranges
+
+
+def load_rule_set(path: Path) -> List[str]:
+    """读取本地规则集（yaml 的 payload 或每行一条的文本）"""
+    if path.suffix in ('.yaml', '.yml'):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = yaml_io.safe_load(f) or {}
+        entries = data.get('payload', []) if isinstance(data, dict) else data
+    else:
+        entries = path.read_text(encoding='utf-8').splitlines()
+    result = []
+    for entry in entries or []:
+        entry = str(entry).strip().strip("'\"")
+        if entry and not entry.startswith('#'):
+            result.append(entry)
+    return result
+
+
+def find_rule_set(rule_set_dir: Path, name: str, url: str = '') -> Optional[Path]:
+    """本地规则集目录中按规则集名或 URL 文件名查找"""
+    names = [name]
+    if url:
+        names.append(url.rstrip('/').rsplit('/', 1)[-1].rsplit('.', 1)[0])
+    for candidate in names:
+        for suffix in RULE_SET_SUFFIXES:
+            path = rule_set_dir / f'{candidate}{suffix}'
+            if path.is_file():
+                return path
+    return None
+
+
+class RuleEngine:
+    def __init__(self, config: Dict, rule_set_dir: Optional[Path] = None):
+        self.logger = logging.getLogger(__name__)
+        self.rules: List[Rule] = []
+        self.providers = config.get('rule-providers') or {}
+        self.groups = {g.get('name'): g for g in config.get('proxy-groups') or []
+                       if isinstance(g, dict)}
+        self.rule_set_dir = rule_set_dir
+        self.unsupported: Dict[str, int] = {}
+        self.missing_rule_sets: List[str] = []
+        # 含跳过条件的规则下标（升序）
+        self.skipped: List[int] = []
+
+        self.domains: Dict[str, int] = {}
+        self.suffixes = SuffixIndex()
+        self.keywords = KeywordIndex()
+        self.networks: Dict[str, int] = {}
+        self.ports = IntervalTable()
+        # ip_all: 纯 IP 查询；ip_resolved: 域名查询（已知解析结果）时可见的 IP 规则
+        self.ip_all = {4: IntervalTable(), 6: IntervalTable()}
+        self.ip_resolved = {4: IntervalTable(), 6: IntervalTable()}
+        # 需要逐条检查的规则：(下标, 判断函数)
+        self.fallback: List[Tuple[int, Callable[[Query], bool]]] = []
+        # 线性参考实现：每条顶层规则一个判断函数
+        self.linear: List[Tuple[int, Callable[[Query], bool]]] = []
+        self.match_index: Optional[int] = None
+
+        parsed = [parse_rule(raw) for raw in config.get('rules') or []]
+        self.rules = [r for r in parsed if r is not None]
+        self.first_resolve = self._first_resolve_index()
+        for index, rule in enumerate(self.rules):
+            self._compile(index, rule)
+
+        self.keywords.build()
+        self.ports.build()
+        for table in list(self.ip_all.values()) + list(self.ip_resolved.values()):
+            table.build()
+
+    # ---------- 编译 ----------
+
+    def _rule_set_entries(self, rule: Rule) -> Optional[Tuple[str, List[str]]]:
+        """RULE-SET 对应的 (behavior, 条目)；本地没有文件时返回 None"""
+        provider = self.providers.get(rule.payload)
+        if not isinstance(provider, dict):
+            return None
+        behavior = str(provider.get('behavior', 'classical'))
+        if provider.get('type') == 'inline':
+            return behavior, [str(e) for e in provider.get('payload') or []]
+        if self.rule_set_dir is None:
+            return None
+        path = find_rule_set(self.rule_set_dir, rule.payload, str(provider.get('url', '')))
+        return (behavior, load_rule_set(path)) if path else None
+
+    def _first_resolve_index(self) -> int:
+        """第一条会触发 DNS 解析的规则；之后带 no-resolve 的 IP 规则才能看到解析结果"""
+        for index, rule in enumerate(self.rules):
+            if rule.no_resolve:
+                continue
+            if rule.type in IP_TYPES or rule.type in ('GEOIP', 'IP-ASN'):
+                return index
+            if rule.type == 'RULE-SET':
+                provider = self.providers.get(rule.payload) or {}
+                if provider.get('behavior') in ('ipcidr', 'classical'):
+                    return index
+        return len(self.rules)
+
+    def _ip_visible(self, index: int, no_resolve: bool, query: Query):
+        if query.host is None or not no_resolve or index > self.first_resolve:
+            return query.ip
+        return None
+
+    def _add_ip(self, network, index: int, no_resolve: bool):
+        start, end = int(network.network_address), int(network.broadcast_address)
+        self.ip_all[network.version].add(start, end, index)
+        if not no_resolve or index > self.first_resolve:
+            self.ip_resolved[network.version].add(start, end, index)
+
+    def _predicate(self, rule_type: str, payload: str, no_resolve: bool,
+                   index: int) -> Optional[Callable[[Query], bool]]:
+        """单个条件的判断函数；离线无法判断的类型返回 None"""
+        if rule_type == 'DOMAIN':
+            value = payload.lower()
+            return lambda q: q.host == value
+        if rule_type == 'DOMAIN-SUFFIX':
+            value = payload.lower()
+            dotted = '.' + value
+            return lambda q: q.host is not None and (q.host == value or q.host.endswith(dotted))
+        if rule_type == 'DOMAIN-KEYWORD':
+            value = payload.lower()
+            return lambda q: q.host is not None and value in q.host
+        if rule_type == 'DOMAIN-REGEX':
+            pattern = re.compile(payload)
+            return lambda q: q.host is not None and pattern.search(q.host) is not None
+        if rule_type in IP_TYPES:
+            network = ipaddress.ip_network(payload, strict=False)
+
+            def match_ip(q):
+                ip = self._ip_visible(index, no_resolve, q)
+                return ip is not None and ip.version == network.version and ip in network
+            return match_ip
+        if rule_type == 'GEOIP' and payload.lower() in ('private', 'lan'):
+            def match_private(q):
+                ip = self._ip_visible(index, no_resolve, q)
+                return ip is not None and (ip.is_private or ip.is_loopback or ip.is_link_local)
+            return match_private
+        if rule_type == 'DST-PORT':
+            ranges = _port_ranges(payload)
+            return lambda q: q.port is not None and any(lo <= q.port <= hi for lo, hi in ranges)
+        if rule_type == 'NETWORK':
+            value = payload.lower()
+            return lambda q: q.network == value
+        if rule_type in LOGIC_TYPES:
+            parts = []
+            for sub in split_logic_payload(payload):
+                sub_rule = parse_rule(f'{sub},_')
+                if sub_rule is None:
+                    return None
+                pred = self._predicate(sub_rule.type, sub_rule.payload,
+                                       no_resolve or sub_rule.no_resolve, index)
+                if pred is None:
+                    return None
+                parts.append(pred)
+            if rule_type == 'AND':
+                return lambda q: all(p(q) for p in parts)
+            if rule_type == 'OR':
+                return lambda q: any(p(q) for p in parts)
+            return lambda q: not parts[0](q)
+        return None
+
+    def _rule_set_predicates(self, rule: Rule, index: int) -> Optional[List[Tuple[str, str]]]:
+        """展开 RULE-SET 为 (类型, 载荷) 列表"""
+        found = self._rule_set_entries(rule)
+        if found is None:
+            self.missing_rule_sets.append(rule.payload)
+            return None
+        behavior, entries = found
+        conditions = []
+        for entry in entries:
+            if behavior == 'domain':
+                if entry.startswith('+.'):
+                    conditions.append(('DOMAIN-SUFFIX', entry[2:]))
+                elif entry.startswith('.') or '*' in entry:
+                    regex = '^' + re.escape(entry.lstrip('.') if entry.startswith('.') else entry) \
+                        .replace(r'\*', '[^.]+') + '$'
+                    if entry.startswith('.'):
+                        regex = r'^.+\.' + regex[1:]
+                    conditions.append(('DOMAIN-REGEX', regex))
+                else:
+                    conditions.append(('DOMAIN', entry))
+            elif behavior == 'ipcidr':
+                conditions.append(('IP-CIDR', entry))
+            else:
+                sub = parse_rule(entry + ',_')
+                if sub is not None:
+                    conditions.append((sub.type, sub.payload))
+        return conditions
+
+    def _index_condition(self, rule_type: str, payload: str, no_resolve: bool,
+                         index: int) -> bool:
+        """放入对应索引；返回 False 表示需要逐条检查"""
+        if rule_type == 'DOMAIN':
+            value = payload.lower()
+            self.domains.setdefault(value, index)
+        elif rule_type == 'DOMAIN-SUFFIX':
+            self.suffixes.add(payload.lower(), index)
+        elif rule_type == 'DOMAIN-KEYWORD':
+            self.keywords.add(payload.lower(), index)
+        elif rule_type in IP_TYPES:
+            self._add_ip(ipaddress.ip_network(payload, strict=False), index, no_resolve)
+        elif rule_type == 'DST-PORT':
+            for low, high in _port_ranges(payload):
+                self.ports.add(low, high, index)
+        elif rule_type == 'NETWORK':
+            self.networks.setdefault(payload.lower(), index)
+        else:
+            return False
+        return True
+
+    def _skip(self, index: int):
+        if not self.skipped or self.skipped[-1] != index:
+            self.skipped.append(index)
+
+    def _compile(self, index: int, rule: Rule):
+        if rule.type in MATCH_TYPES:
+            if self.match_index is None:
+                self.match_index = index
+            self.linear.append((index, lambda q: True))
+            return
+
+        if rule.type == 'RULE-SET':
+            conditions = self._rule_set_predicates(rule, index)
+        else:
+            conditions = [(rule.type, rule.payload)]
+        if conditions is None:
+            if rule.type != 'RULE-SET':
+                self.unsupported[rule.type] = self.unsupported.get(rule.type, 0) + 1
+            self._skip(index)
+            return
+        if not conditions:
+            return
+
+        predicates = []
+        for rule_type, payload in conditions:
+            try:
+                pred = self._predicate(rule_type, payload, rule.no_resolve, index)
+                if pred is None:
+                    self.unsupported[rule_type] = self.unsupported.get(rule_type, 0) + 1
+                    self._skip(index)
+                    continue
+                predicates.append(pred)
+                if not self._index_condition(rule_type, payload, rule.no_resolve, index):
+                    self.fallback.append((index, pred))
+            except ValueError as e:
+                self.logger.warning(f"Skipping invalid rule {rule.raw!r}: {e}")
+        if predicates:
+            self.linear.append((index, lambda q, ps=predicates: any(p(q) for p in ps)))
+
+    # ---------- 查询 ----------
+
+    def _indexed(self, query: Query) -> Optional[int]:
+        candidates = []
+        if query.host is not None:
+            candidates.append(self.domains.get(query.host))
+            candidates.append(self.suffixes.find(query.host))
+            candidates.append(self.keywords.find(query.host))
+        if query.ip is not None:
+            tables = self.ip_all if query.host is None else self.ip_resolved
+            candidates.append(tables[query.ip.version].find(int(query.ip)))
+        if query.port is not None:
+            candidates.append(self.ports.find(query.port))
+        candidates.append(self.networks.get(query.network))
+        candidates.append(self.match_index)
+        return min((c for c in candidates if c is not None), default=None)
+
+    def match_index_of(self, query: Query) -> Optional[int]:
+        """最先命中的规则下标（索引查找）"""
+        best = self._indexed(query)
+        for index, pred in self.fallback:
+            if best is not None and index >= best:
+                break
+            if pred(query):
+                return index
+        return best
+
+    def match_linear(self, query: Query) -> Optional[int]:
+        """逐条匹配（参考实现，用于校验与基准对比）"""
+        for index, pred in self.linear:
+            if pred(query):
+                return index
+        return None
+
+    def resolve(self, query: Query, linear: bool = False) -> Dict:
+        """查询结果：命中规则、目标策略及其策略组类型；
+        之前有目标不同的跳过规则时 indeterminate 为 True，rule 为第一条这样的规则，target 为 None"""
+        index = self.match_linear(query) if linear else self.match_index_of(query)
+        target = None if index is None else self.rules[index].target
+        limit = len(self.rules) if index is None else index
+        for skipped in self.skipped[:bisect.bisect_left(self.skipped, limit)]:
+            if self.rules[skipped].target != target:
+                return {'query': query.text, 'target': None, 'rule': self.rules[skipped].raw,
+                        'index': skipped, 'indeterminate': True}
+        if index is None:
+            return {'query': query.text, 'target': None, 'rule': None, 'indeterminate': False}
+        rule = self.rules[index]
+        group = self.groups.get(rule.target)
+        return {
+            'query': query.text,
+            'target': rule.target,
+            'rule': rule.raw,
+            'index': index,
+            'group_type': group.get('type') if group else None,
+            'indeterminate': False
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate rule matching offline')
+    parser.add_argument('--config', '-c', type=Path, required=True,
+                       help='Processed config YAML')
+    parser.add_argument('--rule-sets', type=Path,
+                       help='Directory with local rule-set files (<name>.yaml/.list/.txt)')
+    parser.add_argument('--queries', '-q', type=Path,
+                       help='File with one query per line (default: stdin)')
+    parser.add_argument('--json', action='store_true', help='Output JSON lines')
+    parser.add_argument('--linear', action='store_true',
+                       help='Use the linear reference matcher')
+    parser.add_argument('--verbose', '-v', action='store_true')
+    parser.add_argument('query', nargs='*', help='host[=ip][:port][/tcp|udp]')
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format='%(levelname)s: %(message)s'
+    )
+
+    with open(args.config, 'r', encoding='utf-8') as f:
+        config = yaml_io.safe_load(f) or {}
+    engine = RuleEngine(config, args.rule_sets)
+    if engine.missing_rule_sets:
+        logging.warning(f"Rule-sets without local files (skipped): "
+                        f"{', '.join(sorted(set(engine.missing_rule_sets)))}")
+    if engine.unsupported:
+        logging.warning(f"Rule types that cannot be simulated offline (skipped): "
+                        + ', '.join(f'{t} x{n}' for t, n in sorted(engine.unsupported.items())))
+
+    if args.query:
+        lines: Iterable[str] = args.query
+    elif args.queries:
+        lines = args.queries.read_text(encoding='utf-8').splitlines()
+    else:
+        lines = sys.stdin
+
+    indeterminate = 0
+    for line in lines:
+        if not line.strip() or line.lstrip().startswith('#'):
+            continue
+        try:
+            result = engine.resolve(parse_query(line), linear=args.linear)
+        except ValueError as e:
+            print(f"❌ Invalid query {line.strip()!r}: {e}", file=sys.stderr)
+            continue
+        indeterminate += result['indeterminate']
+        if args.json:
+            print(json.dumps(result, ensure_ascii=False))
+        elif result['indeterminate']:
+            print(f"{result['query']}\t?\t{result['rule']} (cannot be simulated)")
+        else:
+            print(f"{result['query']}\t{result['target']}\t{result['rule']}")
+    if indeterminate:
+        print(f"⚠️  {indeterminate} queries reached a skipped rule before matching", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Rule Optimizer - 删除永远不会命中的规则
+mihomo 对每个新连接按顺序逐条匹配，以下规则可以安全删除：
+  - 条件与前面某条规则完全相同（duplicate）
+  - 被前面更宽的规则完全覆盖（shadowed）：
+      DOMAIN / DOMAIN-SUFFIX 落在前面的 DOMAIN-SUFFIX 之下，或包含前面的 DOMAIN-KEYWORD；
+      IP-CIDR 被前面的 IP-CIDR 包含（前面的规则带 no-resolve 而后面的不带时不算覆盖）
+  - MATCH 之后的全部规则（after-match）
+  - 引用未声明 rule-providers 的 RULE-SET（undeclared-provider）
+"""
+import ipaddress
+from typing import Dict, List, Optional, Set, Tuple
+
+from rule_parser import Rule, parse_rule, IP_TYPES, MATCH_TYPES
+
+# 优化逻辑变化时递增，使增量构建的旧结果失效
+OPTIMIZER_VERSION = '2'
+
+
+class SuffixTrie:
+    """按反转标签存储的域名后缀树：com -> example -> www"""
+    _END = ''
+
+    def __init__(self):
+        self.root: Dict = {}
+
+    def add(self, suffix: str, value):
+        node = self.root
+        for label in reversed(suffix.split('.')):
+            node = node.setdefault(label, {})
+        node.setdefault(self._END, value)
+
+    def find(self, domain: str):
+        """返回覆盖 domain 的最短后缀对应的值；没有时返回 None"""
+        node = self.root
+        for label in reversed(domain.split('.')):
+            node = node.get(label)
+            if node is None:
+                return None
+            if self._END in node:
+                return node[self._END]
+        return None
+
+
+class CIDRTable:
+    """按 (IP 版本, 前缀长度) 分组存储网络号，查询是否被已有网络包含"""
+
+    def __init__(self):
+        self.networks: Dict[Tuple[int, int], Dict[int, Rule]] = {}
+
+    def add(self, network, rule: Rule):
+        key = (network.version, network.prefixlen)
+        self.networks.setdefault(key, {}).setdefault(int(network.network_address), rule)
+
+    def find(self, network) -> Optional[Rule]:
+        """返回包含 network 的已有规则"""
+        address = int(network.network_address)
+        bits = network.max_prefixlen
+        for (version, prefixlen), table in self.networks.items():
+            if version != network.version or prefixlen > network.prefixlen:
+                continue
+            mask = ((1 << bits) - 1) ^ ((1 << (bits - prefixlen)) - 1)
+            rule = table.get(address & mask)
+            if rule is not None:
+                return rule
+        return None
+
+
+def optimize_rules(rules: List, rule_providers: Optional[Dict] = None) -> Tuple[List, List[Dict]]:
+    """
+    返回 (保留的规则, 删除记录)；删除记录为
+    {'index': 原下标, 'rule': 规则, 'reason': 原因, 'by': 覆盖它的规则}
+    无法解析的规则原样保留。
+    """
+    declared: Set[str] = set(rule_providers or {})
+    kept: List = []
+    removed: List[Dict] = []
+
+    seen: Dict[Tuple, Rule] = {}
+    suffixes = SuffixTrie()
+    keywords: List[Tuple[str, Rule]] = []
+    # 前面的规则会解析域名时，可覆盖后面任意 IP 规则；带 no-resolve 时只覆盖同样带 no-resolve 的
+    cidrs_resolve = CIDRTable()
+    cidrs_no_resolve = CIDRTable()
+    match_rule: Optional[Rule] = None
+
+    def drop(index, raw, reason, by=None):
+        removed.append({'index': index, 'rule': raw, 'reason': reason,
+                        'by': by.raw if by is not None else None})
+
+    for index, raw in enumerate(rules):
+        if match_rule is not None:
+            drop(index, raw, 'after-match', match_rule)
+            continue
+
+        rule = parse_rule(raw)
+        if rule is None:
+            kept.append(raw)
+            continue
+
+        earlier = seen.get(rule.condition)
+        if earlier is not None:
+            drop(index, raw, 'duplicate', earlier)
+            continue
+
+        if rule.type == 'RULE-SET' and rule.payload not in declared:
+            drop(index, raw, 'undeclared-provider')
+            continue
+
+        # 只有不带额外选项的域名规则参与覆盖判断
+        if rule.type in ('DOMAIN', 'DOMAIN-SUFFIX') and not rule.options:
+            domain = rule.payload.lower()
+            by = suffixes.find(domain)
+            if by is None:
+                by = next((r for keyword, r in keywords if keyword in domain), None)
+            if by is not None:
+                drop(index, raw, 'shadowed', by)
+                continue
+            if rule.type == 'DOMAIN-SUFFIX':
+                suffixes.add(domain, rule)
+
+        elif rule.type == 'DOMAIN-KEYWORD' and not rule.options:
+            keyword = rule.payload.lower()
+            by = next((r for k, r in keywords if k in keyword), None)
+            if by is not None:
+                drop(index, raw, 'shadowed', by)
+                continue
+            keywords.append((keyword, rule))
+
+        elif rule.type in IP_TYPES and set(rule.options) <= {'no-resolve'}:
+            try:
+                network = ipaddress.ip_network(rule.payload, strict=False)
+            except ValueError:
+                network = None
+            if network is not None:
+                by = cidrs_resolve.find(network)
+                if by is None and rule.no_resolve:
+                    by = cidrs_no_resolve.find(network)
+                if by is not None:
+                    drop(index, raw, 'shadowed', by)
+                    continue
+                (cidrs_no_resolve if rule.no_resolve else cidrs_resolve).add(network, rule)
+
+        elif rule.type in MATCH_TYPES:
+            match_rule = rule
+
+        seen[rule.condition] = rule
+        kept.append(raw)
+
+    return kept, removed
+
+
+def summarize(removed: List[Dict]) -> Dict[str, int]:
+    """按原因统计删除数量"""
+    counts: Dict[str, int] = {}
+    for item in removed:
+        counts[item['reason']] = counts.get(item['reason'], 0) + 1
+    return counts
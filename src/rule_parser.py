@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Rule Parser - 解析 mihomo 规则字符串
+  TYPE,payload,target[,options...]
+  AND,((DOMAIN,a.com),(NETWORK,UDP)),target
+  MATCH,target
+"""
+from typing import NamedTuple, Optional, Tuple
+
+LOGIC_TYPES = {'AND', 'OR', 'NOT'}
+MATCH_TYPES = {'MATCH', 'FINAL'}
+DOMAIN_TYPES = {'DOMAIN', 'DOMAIN-SUFFIX', 'DOMAIN-KEYWORD'}
+IP_TYPES = {'IP-CIDR', 'IP-CIDR6'}
+
+
+class Rule(NamedTuple):
+    type: str
+    payload: str
+    target: str
+    options: Tuple[str, ...]
+    raw: str
+
+    @property
+    def no_resolve(self) -> bool:
+        return 'no-resolve' in self.options
+
+    @property
+    def condition(self) -> Tuple:
+        """匹配条件（不含目标策略）；条件相同的后一条规则永远不会命中"""
+        payload = self.payload.lower() if self.type in DOMAIN_TYPES else self.payload
+        return (self.type, payload, self.options)
+
+
+def _closing_paren(text: str, start: int) -> int:
+    """text[start] 为 '('，返回与之匹配的 ')' 下标；不匹配时返回 -1"""
+    depth = 0
+    for i in range(start, len(text)):
+        if text[i] == '(':
+            depth += 1
+        elif text[i] == ')':
+            depth -= 1
+            if depth == 0:
+                return i
+    return -1
+
+
+def split_logic_payload(payload: str) -> Tuple[str, ...]:
+    """((DOMAIN,a.com),(NETWORK,UDP)) -> ('DOMAIN,a.com', 'NETWORK,UDP')"""
+    inner = payload.strip()
+    if inner.startswith('(') and inner.endswith(')'):
+        inner = inner[1:-1]
+    parts = []
+    i = 0
+    while i < len(inner):
+        if inner[i] == '(':
+            end = _closing_paren(inner, i)
+            if end < 0:
+                break
+            parts.append(inner[i + 1:end].strip())
+            i = end + 1
+        else:
+            i += 1
+    return tuple(parts)
+
+
+def parse_rule(raw) -> Optional[Rule]:
+    """解析单条规则；无法识别时返回 None"""
+    if not isinstance(raw, str):
+        return None
+    text = raw.strip()
+    rule_type, sep, rest = text.partition(',')
+    rule_type = rule_type.strip().upper()
+    if not sep or not rule_type:
+        return None
+
+    if rule_type in MATCH_TYPES:
+        parts = [p.strip() for p in rest.split(',')]
+        return Rule(rule_type, '', parts[0], tuple(parts[1:]), raw)
+
+    rest = rest.strip()
+    if rest.startswith('('):
+        # 逻辑规则（AND/OR/NOT/SUB-RULE）的载荷本身含逗号
+        end = _closing_paren(rest, 0)
+        if end < 0:
+            return None
+        # 兼容未加外层括号的写法：AND,(A),(B),target -> ((A),(B))
+        groups = [rest[:end + 1]]
+        while rest[end + 1:].lstrip().startswith(',') and \
+                rest[end + 1:].lstrip()[1:].lstrip().startswith('('):
+            start = rest.index('(', end + 1)
+            end = _closing_paren(rest, start)
+            if end < 0:
+                return None
+            groups.append(rest[start:end + 1])
+        payload = groups[0] if len(groups) == 1 else '(' + ','.join(groups) + ')'
+        tail = rest[end + 1:].strip().lstrip(',')
+        parts = [p.strip() for p in tail.split(',')] if tail else []
+    else:
+        pieces = [p.strip() for p in rest.split(',')]
+        payload, parts = pieces[0], pieces[1:]
+
+    target = parts[0] if parts else ''
+    return Rule(rule_type, payload, target, tuple(parts[1:]), raw)
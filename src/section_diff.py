@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Section Diff - 处理后配置的 Merkle 哈希树及构建间的语义差异
+  配置根哈希 ← 各顶层段哈希 ← 各条目哈希 ← 各字段哈希
+  proxy-providers / rule-providers 按名称、proxy-groups 按 name、rules 按顺序逐条哈希
+两次构建比较时根哈希相同的配置直接跳过，只在哈希不同的段/条目中继续比较，
+文件哈希（与构建清单相同的 file_hash）未变化的配置直接沿用上一次的树、不再解析，开销与变化量成正比；输出结构化的变更记录（如 “rule-provider X 的 url 变化”、“新增 3 条规则”）。
+生成器用同一棵树判断每个变体读取的段是否变化（见 variant_sections）。
+"""
+import json
+import difflib
+import hashlib
+import argparse
+import logging
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import yaml_io
+from build_manifest import file_hash
+from minify import is_minified
+from output_writer import OutputWriter
+
+# 树结构或哈希方式变化时递增（旧树不再用于比较）
+DIFF_VERSION = '1'
+
+# 按名称比较的映射段、按 name 比较的列表段、按顺序比较的列表段
+MAP_SECTIONS = ('proxy-providers', 'rule-providers')
+NAMED_LIST_SECTIONS = ('proxy-groups',)
+SEQUENCE_SECTIONS = ('rules',)
+# 变更记录中的单数名称
+SECTION_LABELS = {'proxy-providers': 'proxy-provider', 'rule-providers': 'rule-provider',
+                  'proxy-groups': 'proxy-group', 'rules': 'rule'}
+SECTION_KINDS = {'section-added': '新增', 'section-removed': '删除', 'section-changed': '变化'}
+# 覆写渲染读取的段：订阅列表；启用测速预算时还读取策略组（见 cost_model.probe_sources）
+RENDER_SECTIONS = ('proxy-providers',)
+PROBE_SECTIONS = ('proxy-groups',)
+# 叶子（字段、规则）哈希较短，可明显减小树文件；节点哈希用于跳过整棵子树
+LEAF_DIGITS = 12
+NODE_DIGITS = 16
+
+
+def _hash(data: Any, digits: int) -> str:
+    """语义哈希：映射的键顺序不影响结果"""
+    text = json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:digits]
+
+
+def _node(children: Any) -> str:
+    return _hash(children, NODE_DIGITS)
+
+
+def entry_tree(value: Any) -> Dict:
+    """单个条目：映射逐字段哈希，其余整体哈希"""
+    if isinstance(value, dict):
+        fields = {str(k): _hash(v, LEAF_DIGITS) for k, v in value.items()}
+        return {'hash': _node(fields), 'fields': fields}
+    return {'hash': _hash(value, LEAF_DIGITS)}
+
+
+def section_tree(key: str, value: Any) -> Dict:
+    if key in MAP_SECTIONS and isinstance(value, dict):
+        entries = {str(name): entry_tree(entry) for name, entry in value.items()}
+        order = list(entries)
+    elif key in NAMED_LIST_SECTIONS and isinstance(value, list):
+        entries, order = {}, []
+        for index, entry in enumerate(value):
+            name = str(entry.get('name', f'#{index}')) if isinstance(entry, dict) else f'#{index}'
+            entries[name] = entry_tree(entry)
+            order.append(name)
+    elif key in SEQUENCE_SECTIONS and isinstance(value, list):
+        items = [_hash(item, LEAF_DIGITS) for item in value]
+        return {'hash': _node(items), 'items': items}
+    else:
+        return {'hash': _hash(value, NODE_DIGITS)}
+    # 顺序计入哈希（规则按顺序引用，策略组顺序影响面板显示）
+    return {'hash': _node([order, {n: e['hash'] for n, e in entries.items()}]),
+            'order': order, 'entries': entries}
+
+
+def build_tree(config: Dict) -> Dict:
+    sections = {str(k): section_tree(str(k), v) for k, v in config.items()
+                if not str(k).startswith('_')}
+    return {'hash': _node({k: s['hash'] for k, s in sections.items()}), 'sections': sections}
+
+
+def sections_digest(tree: Dict, keys: Iterable[str]) -> str:
+    """若干段的组合哈希（缺少的段记为空）"""
+    return _node({k: tree['sections'].get(k, {}).get('hash') for k in keys})
+
+
+def variant_sections(probe_budget: Optional[float] = None) -> Tuple[str, ...]:
+    """生成器渲染一个变体时读取的段"""
+    return RENDER_SECTIONS + (PROBE_SECTIONS if probe_budget else ())
+
+
+def variant_digest(config: Dict, sections: Iterable[str], *extra: Any) -> str:
+    """变体输入的哈希：只对读取的段建树，extra 为变体定义、下载地址等其余输入"""
+    sections = tuple(sections)
+    tree = build_tree({k: config[k] for k in sections if k in config})
+    return _node([sections_digest(tree, sections), list(extra)])
+
+
+# ---------- 比较 ----------
+
+def _entry_changes(config_id: str, key: str, old: Dict, new: Dict,
+                   values: Optional[Dict]) -> List[Dict]:
+    label = SECTION_LABELS.get(key, key)
+    changes = []
+    for name in new['entries']:
+        if name not in old['entries']:
+            changes.append({'config': config_id, 'section': key, 'kind': 'added',
+                            'name': name, 'label': label})
+    for name in old['entries']:
+        if name not in new['entries']:
+            changes.append({'config': config_id, 'section': key, 'kind': 'removed',
+                            'name': name, 'label': label})
+    for name, entry in new['entries'].items():
+        before = old['entries'].get(name)
+        if before is None or before['hash'] == entry['hash']:
+            continue
+        old_fields, new_fields = before.get('fields', {}), entry.get('fields', {})
+        fields = sorted(f for f in set(old_fields) | set(new_fields)
+                        if old_fields.get(f) != new_fields.get(f))
+        change = {'config': config_id, 'section': key, 'kind': 'changed',
+                  'name': name, 'label': label, 'fields': fields}
+        if values and name in values and isinstance(values[name], dict):
+            # 新值（短的标量）便于阅读；旧值只有哈希
+            change['values'] = {f: values[name][f] for f in fields
+                                if isinstance(values[name].get(f), (str, int, float, bool))
+                                and len(str(values[name][f])) <= 200}
+        changes.append(change)
+    common_old = [n for n in old['order'] if n in new['entries']]
+    common_new = [n for n in new['order'] if n in old['entries']]
+    if common_old != common_new:
+        changes.append({'config': config_id, 'section': key, 'kind': 'reordered', 'label': label})
+    return changes
+
+
+def _sequence_changes(config_id: str, key: str, old: Dict, new: Dict,
+                      values: Optional[List]) -> List[Dict]:
+    matcher = difflib.SequenceMatcher(None, old['items'], new['items'], autojunk=False)
+    added, removed = [], 0
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag in ('replace', 'delete'):
+            removed += i2 - i1
+        if tag in ('replace', 'insert'):
+            added.extend(range(j1, j2))
+    change = {'config': config_id, 'section': key, 'kind': 'items',
+              'label': SECTION_LABELS.get(key, key), 'added': len(added), 'removed': removed}
+    if sorted(old['items']) == sorted(new['items']):
+        change['kind'] = 'reordered'
+    elif values is not None:
+        change['added_items'] = [str(values[i]) for i in added if i < len(values)]
+    return [change]
+
+
+def diff_config(config_id: str, old: Optional[Dict], new: Optional[Dict],
+                config: Optional[Dict] = None) -> List[Dict]:
+    """单个配置的变更；config 为新配置本身（可选，用于在记录中附上新值）"""
+    if old is None and new is None:
+        return []
+    if old is None:
+        return [{'config': config_id, 'kind': 'config-added'}]
+    if new is None:
+        return [{'config': config_id, 'kind': 'config-removed'}]
+    if old['hash'] == new['hash']:
+        return []
+    changes = []
+    for key, section in new['sections'].items():
+        before = old['sections'].get(key)
+        if before is None:
+            changes.append({'config': config_id, 'section': key, 'kind': 'section-added'})
+        elif before['hash'] != section['hash']:
+            values = (config or {}).get(key)
+            if 'entries' in section and 'entries' in before:
+                if isinstance(values, list):
+                    values = {str(e.get('name')): e for e in values if isinstance(e, dict)}
+                changes.extend(_entry_changes(config_id, key, before, section, values))
+            elif 'items' in section and 'items' in before:
+                changes.extend(_sequence_changes(config_id, key, before, section, values))
+            else:
+                changes.append({'config': config_id, 'section': key, 'kind': 'section-changed'})
+    for key in old['sections']:
+        if key not in new['sections']:
+            changes.append({'config': config_id, 'section': key, 'kind': 'section-removed'})
+    return changes
+
+
+def diff_builds(old: Dict[str, Dict], new: Dict[str, Dict],
+                configs: Optional[Dict[str, Dict]] = None) -> List[Dict]:
+    """两次构建（配置 -> 树）的变更；根哈希相同的配置不再展开"""
+    configs = configs or {}
+    changes = []
+    for config_id in sorted(set(old) | set(new)):
+        before, after = old.get(config_id), new.get(config_id)
+        if before and after and before['hash'] == after['hash']:
+            continue
+        changes.extend(diff_config(config_id, before, after, configs.get(config_id)))
+    return changes
+
+
+def describe(change: Dict) -> str:
+    """单条变更的可读描述"""
+    kind, label, name = change['kind'], change.get('label', ''), change.get('name', '')
+    if kind == 'config-added':
+        return '新增配置'
+    if kind == 'config-removed':
+        return '删除配置'
+    if kind in SECTION_KINDS:
+        return f"`{change['section']}` {SECTION_KINDS[kind]}"
+    if kind == 'added':
+        return f"新增 {label} `{name}`"
+    if kind == 'removed':
+        return f"删除 {label} `{name}`"
+    if kind == 'changed':
+        values = change.get('values', {})
+        fields = ', '.join(f"{f} → `{values[f]}`" if f in values else f for f in change['fields'])
+        return f"{label} `{name}` 变化: {fields}"
+    if kind == 'reordered':
+        return f"{label} 顺序调整"
+    parts = []
+    if change['added']:
+        parts.append(f"新增 {change['added']} 条")
+    if change['removed']:
+        parts.append(f"删除 {change['removed']} 条")
+    return f"{label}: {'，'.join(parts)}"
+
+
+def changelog(changes: List[Dict], max_items: int = 20) -> str:
+    """按配置分组的 Markdown 变更记录"""
+    if not changes:
+        return '无变化\n'
+    lines = []
+    by_config: Dict[str, List[Dict]] = {}
+    for change in changes:
+        by_config.setdefault(change['config'], []).append(change)
+    for config_id, items in by_config.items():
+        lines.append(f'### {config_id}')
+        for change in items:
+            lines.append(f'- {describe(change)}')
+            for rule in change.get('added_items', [])[:max_items]:
+                lines.append(f'  - `+ {rule}`')
+        lines.append('')
+    return '\n'.join(lines)
+
+
+# ---------- 树文件 ----------
+
+def collect_trees(base: Path, previous: Dict[str, Dict]) -> Tuple[Dict[str, Dict], Dict[str, Dict]]:
+    """
+    目录下全部处理后配置的树（相对路径 -> 树，树中记录文件哈希 digest）。
+    文件哈希与 previous 中相同的沿用旧树，其余解析后重建；同时返回解析过的配置（相对路径 -> 配置）
+    """
+    trees, configs = {}, {}
+    for yaml_file in sorted(base.glob('**/*.yaml')):
+        if is_minified(yaml_file):
+            continue
+        config_id = yaml_file.relative_to(base).as_posix()
+        digest = file_hash(yaml_file)
+        before = previous.get(config_id)
+        if before is not None and before.get('digest') == digest:
+            trees[config_id] = before
+            continue
+        try:
+            with open(yaml_file, 'r', encoding='utf-8') as f:
+                config = yaml_io.safe_load(f) or {}
+        except Exception as e:
+            logging.getLogger(__name__).error(f"Error reading {yaml_file}: {e}")
+            continue
+        trees[config_id] = {**build_tree(config), 'digest': digest}
+        configs[config_id] = config
+    return trees, configs
+
+
+def load_trees(path: Path) -> Dict[str, Dict]:
+    """上一次构建保存的树；没有或版本不符时返回空"""
+    try:
+        data = json.loads(path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+    return data.get('configs', {}) if data.get('version') == DIFF_VERSION else {}
+
+
+def save_trees(path: Path, trees: Dict[str, Dict], writer: Optional[OutputWriter] = None) -> bool:
+    data = {'version': DIFF_VERSION, 'configs': {k: trees[k] for k in sorted(trees)}}
+    text = json.dumps(data, ensure_ascii=False, separators=(',', ':')) + '\n'
+    return (writer or OutputWriter()).write(path, text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Semantic diff of processed configs between builds')
+    parser.add_argument('--input', '-i', type=Path, required=True,
+                       help='Processed configs directory')
+    parser.add_argument('--tree', type=Path, default=Path('.cache/section-tree.json'),
+                       help="Previous build's section tree (updated unless --dry-run)")
+    parser.add_argument('--changelog', type=Path, help='Write the changelog as Markdown')
+    parser.add_argument('--json', type=Path, help='Write the changes as JSON')
+    parser.add_argument('--dry-run', action='store_true', help='Do not update --tree')
+    parser.add_argument('--verbose', '-v', action='store_true')
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format='%(levelname)s: %(message)s'
+    )
+
+    if not args.input.exists():
+        print(f"❌ Input directory not found: {args.input}")
+        return 1
+
+    previous = load_trees(args.tree)
+    trees, configs = collect_trees(args.input, previous)
+    changes = diff_builds(previous, trees, configs) if previous else []
+
+    changed = {c['config'] for c in changes}
+    print(f"🌳 {len(trees)} configs ({len(configs)} parsed), {len(changed)} changed, "
+          f"{len(changes)} changes" + ('' if previous else ' (no previous tree)'))
+    text = changelog(changes)
+    if args.changelog:
+        args.changelog.parent.mkdir(parents=True, exist_ok=True)
+        args.changelog.write_text(text, encoding='utf-8')
+    elif changes:
+        print(text)
+    if args.json:
+        args.json.parent.mkdir(parents=True, exist_ok=True)
+        args.json.write_text(json.dumps(changes, ensure_ascii=False, indent=2) + '\n',
+                             encoding='utf-8')
+    if not args.dry_run:
+        args.tree.parent.mkdir(parents=True, exist_ok=True)
+        save_trees(args.tree, trees)
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
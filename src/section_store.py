@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Section Store - 处理后配置的内容寻址存储
+  objects/ab/cdef….json：每个不同的 provider 条目、策略组、其他顶层段只存一份（按内容 SHA-256 命名）
+  configs/<相对路径>.json：每个配置的清单（顶层键顺序 + 各条目的哈希）
+同一作者的相近配置（如 configfull / configfull_NoAd）共用大部分条目。
+export 按清单重新组装完整 YAML（加载结果与处理输出一致，锚点不保留）；
+生成器可直接从清单读取配置（JSON），不再解析 YAML。
+"""
+import os
+import json
+import hashlib
+import argparse
+import logging
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+import yaml_io
+from output_writer import OutputWriter
+
+# 存储格式变化时递增
+STORE_VERSION = '1'
+
+OBJECTS_DIR = 'objects'
+CONFIGS_DIR = 'configs'
+# 按条目存储的段：映射按键、列表按元素；其余顶层段整体存储
+ENTRY_SECTIONS = {'proxy-providers', 'rule-providers', 'proxy-groups'}
+
+
+def _encode(value: Any) -> bytes:
+    """规范化 JSON（保持键顺序，顺序影响输出）"""
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def object_hash(data: bytes) -> str:
+    """对象名：SHA-256 的前 128 位（清单中每个条目都要引用，短一些可明显减小清单）"""
+    return hashlib.sha256(data).hexdigest()[:32]
+
+
+class SectionStore:
+    def __init__(self, root: Path, writer: Optional[OutputWriter] = None):
+        self.root = root
+        self.writer = writer or OutputWriter()
+        self._cache: Dict[str, Any] = {}
+        # 本次已写入（batch 期间可能尚未落盘）的对象
+        self._written: Set[str] = set()
+        self.stats = {'objects_written': 0, 'objects_reused': 0}
+
+    def object_path(self, digest: str) -> Path:
+        return self.root / OBJECTS_DIR / digest[:2] / f'{digest[2:]}.json'
+
+    def key_for(self, output_path: Path) -> str:
+        """配置在存储中的键：相对于存储所在目录的路径（如 external/General_Config/A/x.yaml）"""
+        return Path(os.path.relpath(output_path, self.root.parent)).as_posix()
+
+    def config_path(self, key: str) -> Path:
+        return self.root / CONFIGS_DIR / f'{key}.json'
+
+    def put(self, value: Any) -> str:
+        """写入对象（已存在时跳过），返回哈希"""
+        data = _encode(value)
+        if json.loads(data) != value:
+            raise ValueError("value does not round-trip through JSON")
+        digest = object_hash(data)
+        path = self.object_path(digest)
+        if digest in self._written or path.exists():
+            self.stats['objects_reused'] += 1
+        else:
+            self.writer.write(path, data)
+            self._written.add(digest)
+            self.stats['objects_written'] += 1
+        return digest
+
+    def get(self, digest: str) -> Any:
+        if digest not in self._cache:
+            data = self.object_path(digest).read_bytes()
+            if object_hash(data) != digest:
+                raise ValueError(f"corrupt object: {digest}")
+            self._cache[digest] = json.loads(data)
+        return self._cache[digest]
+
+    def save_config(self, output_path: Path, config: Dict, source_hash: str = '') -> Path:
+        """
+        写入配置的各段及清单，返回清单路径。
+        source_hash：同时写出的 YAML 文件的哈希，读取时据此判断清单是否过期
+        """
+        sections = []
+        for key, value in config.items():
+            if key in ENTRY_SECTIONS and isinstance(value, dict):
+                entries = [[name, self.put(entry)] for name, entry in value.items()]
+                sections.append({'key': key, 'map': entries})
+            elif key in ENTRY_SECTIONS and isinstance(value, list):
+                sections.append({'key': key, 'list': [self.put(entry) for entry in value]})
+            else:
+                sections.append({'key': key, 'value': self.put(value)})
+        manifest = {'version': STORE_VERSION, 'source': source_hash, 'sections': sections}
+        path = self.config_path(self.key_for(output_path))
+        self.writer.write(path, _encode(manifest) + b'\n')
+        return path
+
+    def load_config(self, output_path: Path, source_hash: Optional[str] = None) -> Optional[Dict]:
+        """按清单组装配置；没有清单或清单与 source_hash 不符时返回 None"""
+        path = self.config_path(self.key_for(output_path))
+        if not path.is_file():
+            return None
+        manifest = json.loads(path.read_text(encoding='utf-8'))
+        if manifest.get('version') != STORE_VERSION:
+            return None
+        if source_hash is not None and manifest.get('source') != source_hash:
+            return None
+        config = {}
+        for section in manifest['sections']:
+            if 'map' in section:
+                config[section['key']] = {name: self.get(d) for name, d in section['map']}
+            elif 'list' in section:
+                config[section['key']] = [self.get(d) for d in section['list']]
+            else:
+                config[section['key']] = self.get(section['value'])
+        return config
+
+    def config_keys(self) -> List[str]:
+        base = self.root / CONFIGS_DIR
+        return sorted(p.relative_to(base).as_posix()[:-len('.json')]
+                      for p in base.glob('**/*.json'))
+
+    def referenced(self) -> Set[str]:
+        digests = set()
+        for key in self.config_keys():
+            manifest = json.loads(self.config_path(key).read_text(encoding='utf-8'))
+            for section in manifest['sections']:
+                if 'map' in section:
+                    digests.update(d for _, d in section['map'])
+                elif 'list' in section:
+                    digests.update(section['list'])
+                else:
+                    digests.add(section['value'])
+        return digests
+
+    def prune_configs(self) -> int:
+        """删除对应的处理结果（存储所在目录/键）已不存在的清单，返回删除数量。
+        非增量构建不会逐个删除源文件已消失的清单，由此清理"""
+        removed = 0
+        for key in self.config_keys():
+            if not (self.root.parent / key).is_file() and self.writer.delete(self.config_path(key)):
+                removed += 1
+        base = self.root / CONFIGS_DIR
+        for directory in sorted(base.glob('**/*'), reverse=True):
+            if directory.is_dir() and not any(directory.iterdir()):
+                self.writer.remove_dir(directory)
+        return removed
+
+    def gc(self) -> int:
+        """先删除失效的清单，再删除不再被任何清单引用的对象，返回删除的对象数量"""
+        self.prune_configs()
+        live = self.referenced()
+        removed = 0
+        for path in sorted((self.root / OBJECTS_DIR).glob('*/*.json')):
+            digest = path.parent.name + path.stem
+            if digest not in live:
+                # 同一实例之后再次 put 相同内容时必须重新写入
+                self._written.discard(digest)
+                self._cache.pop(digest, None)
+                if self.writer.delete(path):
+                    removed += 1
+        for directory in (self.root / OBJECTS_DIR).glob('*'):
+            if directory.is_dir() and not any(directory.iterdir()):
+                self.writer.remove_dir(directory)
+        return removed
+
+    def export(self, keys: Iterable[str], output_dir: Path) -> List[Path]:
+        """把清单组装回 YAML 文件（output_dir/<键>）"""
+        written = []
+        for key in keys:
+            config = self.load_config(self.root.parent / key)
+            if config is None:
+                raise KeyError(key)
+            path = output_dir / key
+            self.writer.write(path, yaml_io.dump(config, allow_unicode=True, sort_keys=False))
+            written.append(path)
+        return written
+
+    def size(self) -> Dict[str, int]:
+        objects = list((self.root / OBJECTS_DIR).glob('*/*.json'))
+        configs = list((self.root / CONFIGS_DIR).glob('**/*.json'))
+        return {
+            'objects': len(objects),
+            'object_bytes': sum(p.stat().st_size for p in objects),
+            'configs': len(configs),
+            'config_bytes': sum(p.stat().st_size for p in configs),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect or export the processed-config section store')
+    parser.add_argument('--store', type=Path, required=True, help='Store directory')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    sub.add_parser('stats', help='Object/config counts and sizes')
+    sub.add_parser('gc', help='Remove unreferenced objects')
+    export = sub.add_parser('export', help='Reassemble full YAML files')
+    export.add_argument('--output', '-o', type=Path, required=True)
+    export.add_argument('keys', nargs='*', help='Config keys (default: all)')
+    parser.add_argument('--verbose', '-v', action='store_true')
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format='%(levelname)s: %(message)s'
+    )
+
+    store = SectionStore(args.store)
+    if args.command == 'stats':
+        size = store.size()
+        print(f"{size['configs']} configs, {size['objects']} objects, "
+              f"{(size['object_bytes'] + size['config_bytes']) / 1024:.1f} KB")
+    elif args.command == 'gc':
+        print(f"Removed {store.gc()} unreferenced objects")
+    else:
+        keys = args.keys or store.config_keys()
+        try:
+            paths = store.export(keys, args.output)
+        except KeyError as e:
+            print(f"❌ Unknown config: {e.args[0]}")
+            return 1
+        print(f"Exported {len(paths)} configs to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
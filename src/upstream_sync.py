@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Upstream Sync - 并发同步上游配置，只下载变化的文件
+  github：把 ref 解析为提交 sha，带 ETag 请求该提交的仓库树（git/trees，304 表示整棵树未变），
+          按 blob SHA 与上次同步比较，只下载 SHA 变化的文件并校验 SHA
+  http：逐个 URL 带 If-None-Match / If-Modified-Since 请求
+输出变化文件列表（相对输出目录，每行一个），供 yaml_processor.py / pipeline.py 的 --files-from 使用；
+上游已删除的文件从输出目录中删除（处理器增量模式会删除其输出）。
+只删除本工具写入的文件，输出目录中的其他文件不受影响。
+"""
+import json
+import asyncio
+import hashlib
+import argparse
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from http_pool import HTTPPool, Response
+from output_writer import OutputWriter
+
+# 状态文件格式变化时递增
+SYNC_VERSION = '2'
+
+GITHUB_API = 'https://api.github.com'
+GITHUB_RAW = 'https://raw.githubusercontent.com'
+YAML_SUFFIXES = ('.yaml', '.yml')
+
+
+class SyncError(Exception):
+    pass
+
+
+def git_blob_sha(data: bytes) -> str:
+    """git 对文件内容计算的 SHA-1（与仓库树中的 sha 一致）"""
+    return hashlib.sha1(b'blob %d\0' % len(data) + data).hexdigest()
+
+
+def conditional_headers(entry: Dict) -> Dict[str, str]:
+    headers = {}
+    if entry.get('etag'):
+        headers['If-None-Match'] = entry['etag']
+    if entry.get('last_modified'):
+        headers['If-Modified-Since'] = entry['last_modified']
+    return headers
+
+
+def _check(response: Response, *expected: int):
+    if response.status not in expected:
+        raise SyncError(f"HTTP {response.status} for {response.url}")
+
+
+class UpstreamSync:
+    def __init__(self, sources: List[Dict], output_dir: Path, state_path: Path,
+                 pool: HTTPPool, writer: Optional[OutputWriter] = None):
+        self.sources = sources
+        self.output_dir = output_dir
+        self.state_path = state_path
+        self.pool = pool
+        self.writer = writer or OutputWriter()
+        self.logger = logging.getLogger(__name__)
+        self.state = self.load_state()
+
+    def load_state(self) -> Dict:
+        """上次同步的状态：files 为 相对路径 -> {source, sha/etag/last_modified}"""
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('version') == SYNC_VERSION:
+                return state
+        except (OSError, ValueError):
+            pass
+        return {'version': SYNC_VERSION, 'sources': {}, 'files': {}}
+
+    def save_state(self):
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        self.state_path.write_text(
+            json.dumps(self.state, ensure_ascii=False, indent=2, sort_keys=True) + '\n',
+            encoding='utf-8'
+        )
+
+    def _store(self, rel: str, data: bytes, entry: Dict, result: Dict):
+        if self.writer.write(self.output_dir / rel, data):
+            result['changed'].append(rel)
+        self.state['files'][rel] = entry
+
+    def _delete_missing(self, name: str, present: set, result: Dict):
+        """删除此来源上次写入、本次已不存在的文件"""
+        for rel, entry in list(self.state['files'].items()):
+            if entry.get('source') == name and rel not in present:
+                self.writer.delete(self.output_dir / rel)
+                del self.state['files'][rel]
+                result['deleted'].append(rel)
+
+    async def sync_github(self, source: Dict, result: Dict) -> Dict:
+        name, repo = source['name'], source['repo']
+        ref = source.get('ref', 'HEAD')
+        api = source.get('api_url', GITHUB_API).rstrip('/')
+        raw = source.get('raw_url', GITHUB_RAW).rstrip('/')
+        headers = {'Accept': 'application/vnd.github+json'}
+        if os.environ.get('GITHUB_TOKEN') and api == GITHUB_API:
+            headers['Authorization'] = f"Bearer {os.environ['GITHUB_TOKEN']}"
+
+        source_state = self.state['sources'].setdefault(name, {})
+        result.update(tree_cached=False)
+
+        # 先把 ref 解析为提交 sha，树与 raw 文件都按该 sha 请求（同步期间上游的新推送不影响本次）；
+        # 提交时间用作可复现构建的 SOURCE_DATE_EPOCH
+        commit = await self.pool.get(
+            f'{api}/repos/{repo}/commits/{ref}',
+            {**headers, **conditional_headers(source_state.get('commit', {}))}
+        )
+        _check(commit, 200, 304)
+        if commit.status == 200:
+            data = json.loads(commit.body)
+            date = data['commit']['committer']['date']
+            source_state['commit'] = {
+                'etag': commit.headers.get('etag', ''),
+                'sha': data['sha'],
+                'time': int(datetime.fromisoformat(date.replace('Z', '+00:00')).timestamp())
+            }
+        sha = source_state['commit']['sha']
+
+        tree = await self.pool.get(
+            f'{api}/repos/{repo}/git/trees/{sha}?recursive=1',
+            {**headers, **conditional_headers(source_state.get('tree', {}))}
+        )
+        _check(tree, 200, 304)
+
+        if tree.status == 304:
+            result['tree_cached'] = True
+            blobs = {rel: entry['sha'] for rel, entry in self.state['files'].items()
+                     if entry.get('source') == name}
+        else:
+            data = json.loads(tree.body)
+            if data.get('truncated'):
+                raise SyncError(f"Tree listing truncated for {repo}")
+            blobs = {}
+            for item in data.get('tree', []):
+                if item.get('type') != 'blob' or not item['path'].endswith(YAML_SUFFIXES):
+                    continue
+                for prefix, dest in source.get('paths', {'': ''}).items():
+                    prefix = prefix.strip('/')
+                    if prefix and not item['path'].startswith(prefix + '/'):
+                        continue
+                    rel = item['path'][len(prefix):].lstrip('/')
+                    blobs[f"{dest.strip('/')}/{rel}".lstrip('/')] = (item['sha'], item['path'])
+                    break
+
+        async def fetch(rel: str, blob_sha: str, path: str):
+            response = await self.pool.get(f'{raw}/{repo}/{sha}/{path}')
+            _check(response, 200)
+            if git_blob_sha(response.body) != blob_sha:
+                raise SyncError(f"SHA mismatch for {path}")
+            self._store(rel, response.body, {'source': name, 'sha': blob_sha, 'path': path}, result)
+
+        tasks = []
+        for rel, blob in blobs.items():
+            blob_sha, path = blob if isinstance(blob, tuple) else (blob, self.state['files'][rel]['path'])
+            known = self.state['files'].get(rel, {})
+            if known.get('sha') == blob_sha and (self.output_dir / rel).is_file():
+                result['unchanged'] += 1
+            else:
+                tasks.append(fetch(rel, blob_sha, path))
+        # 已下载的文件照常记入 changed；有失败时不记录树的 ETag，下次重新比较整棵树
+        errors = [e for e in await asyncio.gather(*tasks, return_exceptions=True)
+                  if isinstance(e, Exception)]
+        self._delete_missing(name, set(blobs), result)
+        if errors:
+            raise SyncError(f"{len(errors)} of {len(tasks)} files failed, first: {errors[0]}")
+        if tree.status == 200:
+            source_state['tree'] = {'etag': tree.headers.get('etag', '')}
+        return result
+
+    async def sync_http(self, source: Dict, result: Dict) -> Dict:
+        name = source['name']
+
+        async def fetch(rel: str, url: str):
+            known = self.state['files'].get(rel, {})
+            headers = conditional_headers(known) if (self.output_dir / rel).is_file() else {}
+            response = await self.pool.get(url, headers)
+            _check(response, 200, 304)
+            if response.status == 304:
+                result['unchanged'] += 1
+                return
+            self._store(rel, response.body, {
+                'source': name, 'url': url,
+                'etag': response.headers.get('etag', ''),
+                'last_modified': response.headers.get('last-modified', '')
+            }, result)
+
+        files = source.get('files', {})
+        errors = [e for e in await asyncio.gather(*(fetch(rel, url) for rel, url in files.items()),
+                                                  return_exceptions=True)
+                  if isinstance(e, Exception)]
+        self._delete_missing(name, set(files), result)
+        if errors:
+            raise SyncError(f"{len(errors)} of {len(files)} files failed, first: {errors[0]}")
+        return result
+
+    async def run(self) -> Dict[str, Dict]:
+        """并发同步全部来源；任一来源失败时其他来源的结果仍然保留，
+        失败来源中已写入的文件同样记入 changed（状态中已记录其新的 SHA/ETag）"""
+        handlers = {'github': self.sync_github, 'http': self.sync_http}
+
+        async def one(source):
+            result = {'changed': [], 'deleted': [], 'unchanged': 0}
+            try:
+                return await handlers[source.get('type', 'github')](source, result)
+            except Exception as e:
+                self.logger.error(f"Sync failed for {source['name']}: {e}")
+                result['error'] = str(e)
+                return result
+
+        with self.writer.batch():
+            results = await asyncio.gather(*(one(s) for s in self.sources))
+        self.save_state()
+        return {s['name']: r for s, r in zip(self.sources, results)}
+
+    def source_epoch(self) -> Optional[int]:
+        """各 github 来源最新提交时间中的最大值"""
+        times = [s.get('commit', {}).get('time') for s in self.state['sources'].values()]
+        times = [t for t in times if t]
+        return max(times) if times else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sync upstream configs, fetching only changed files')
+    parser.add_argument('--sources', type=Path, default=Path('src/upstreams.json'),
+                       help='Upstream definitions (JSON)')
+    parser.add_argument('--output', '-o', type=Path, required=True,
+                       help='Output directory (e.g. raw_configs/external)')
+    parser.add_argument('--state', type=Path, default=Path('.cache/upstream-sync.json'),
+                       help='Sync state (ETags, blob SHAs); keep it between runs')
+    parser.add_argument('--changed-list', type=Path,
+                       help='Write changed files (relative to --output), one per line')
+    parser.add_argument('--epoch-file', type=Path,
+                       help='Write the latest upstream commit time (for SOURCE_DATE_EPOCH)')
+    parser.add_argument('--concurrency', '-j', type=int, default=8)
+    parser.add_argument('--verbose', '-v', action='store_true')
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format='%(levelname)s: %(message)s'
+    )
+
+    with open(args.sources, 'r', encoding='utf-8') as f:
+        sources = json.load(f)['sources']
+
+    async def run():
+        async with HTTPPool(concurrency=args.concurrency) as pool:
+            sync = UpstreamSync(sources, args.output, args.state, pool)
+            return sync, await sync.run(), pool.stats
+
+    sync, results, stats = asyncio.run(run())
+
+    changed = sorted(rel for r in results.values() for rel in r['changed'])
+    failed = [name for name, r in results.items() if 'error' in r]
+    for name, r in results.items():
+        status = f"❌ {r['error']}" if 'error' in r else (
+            f"changed {len(r['changed'])}, deleted {len(r['deleted'])}, unchanged {r['unchanged']}"
+            + (' (tree not modified)' if r.get('tree_cached') else '')
+        )
+        print(f"{name}: {status}")
+    print(f"\n📥 {len(changed)} changed files, {stats['requests']} requests, "
+          f"{stats['connections']} connections")
+
+    if args.changed_list:
+        args.changed_list.parent.mkdir(parents=True, exist_ok=True)
+        args.changed_list.write_text(''.join(f'{rel}\n' for rel in changed), encoding='utf-8')
+    if args.epoch_file and sync.source_epoch():
+        args.epoch_file.parent.mkdir(parents=True, exist_ok=True)
+        args.epoch_file.write_text(f'{sync.source_epoch()}\n', encoding='utf-8')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+YAML I/O - 统一的加载/导出入口
+优先使用 libyaml（CSafeLoader/CSafeDumper），不可用时回退到纯 Python 实现
+"""
+import yaml
+from typing import Any, Collection, Dict, Optional, Tuple
+from yaml.composer import Composer
+from yaml.events import (AliasEvent, MappingEndEvent, MappingStartEvent,
+                         SequenceEndEvent, SequenceStartEvent)
+from yaml.nodes import MappingNode, ScalarNode
+from yaml.representer import SafeRepresenter
+from yaml.resolver import Resolver
+from yaml.serializer import Serializer
+
+try:
+    from yaml import CSafeLoader, CSafeDumper
+    from yaml._yaml import CEmitter
+    HAS_LIBYAML = True
+except ImportError:
+    CSafeLoader = CSafeDumper = CEmitter = None
+    HAS_LIBYAML = False
+
+BACKENDS = ('c', 'python')
+
+# 紧凑输出时，至少这么长的相同字符串对象输出为锚点/别名
+COMPACT_ALIAS_MIN_LENGTH = 24
+# flow 风格中需要加引号的字符；含这些字符的顶层列表（如 rules）仍用 block 风格
+_FLOW_UNSAFE = set(',[]{}:#&*!|>\'"%@`\n')
+
+_backend = 'c' if HAS_LIBYAML else 'python'
+
+
+def set_backend(name: str):
+    """切换后端：'c'、'python' 或 'auto'"""
+    global _backend
+    if name == 'auto':
+        name = 'c' if HAS_LIBYAML else 'python'
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown YAML backend: {name}")
+    if name == 'c' and not HAS_LIBYAML:
+        raise RuntimeError("libyaml is not available in this PyYAML build")
+    _backend = name
+
+
+def get_backend() -> str:
+    return _backend
+
+
+def loader_class():
+    """当前后端的 SafeLoader"""
+    return CSafeLoader if _backend == 'c' else yaml.SafeLoader
+
+
+def dumper_class():
+    """当前后端的 SafeDumper"""
+    return CSafeDumper if _backend == 'c' else yaml.SafeDumper
+
+
+def safe_load(stream) -> Any:
+    """等价于 yaml.safe_load"""
+    return yaml.load(stream, Loader=loader_class())
+
+
+class AnchorTrackingComposer(Composer):
+    """
+    在解析事件流的同时记录锚点：
+      anchor_objects      - 锚点名 -> 构造出的 Python 对象
+      anchor_defined_in   - 锚点名 -> 定义所在的顶层键
+      anchor_referenced_by - 锚点名 -> 引用它的顶层键集合
+    设置 keep_keys 时为流式模式：不在其中的顶层键只消费事件、不组装节点，
+    其中带锚点的子树例外（保留键可能通过别名引用它们）。
+    """
+    keep_keys: Optional[Collection[str]] = None
+
+    def __init__(self):
+        Composer.__init__(self)
+        self.anchor_objects: Dict[str, Any] = {}
+        self.anchor_defined_in: Dict[str, Optional[str]] = {}
+        self.anchor_referenced_by: Dict[str, set] = {}
+        self._anchor_by_node = {}
+        self._depth = 0
+        self._section = None
+
+    def compose_document(self):
+        # 与 Composer.compose_document 相同，但保留锚点表
+        self.get_event()
+        node = self.compose_node(None, None)
+        self.get_event()
+        self._anchor_by_node = {node: name for name, node in self.anchors.items()}
+        self.anchors = {}
+        return node
+
+    def compose_node(self, parent, index):
+        self._depth += 1
+        try:
+            # 根映射的值：进入新的顶层键
+            if self._depth == 2 and isinstance(index, ScalarNode):
+                self._section = index.value
+            
+            event = self.peek_event()
+            if isinstance(event, AliasEvent):
+                self.anchor_referenced_by.setdefault(event.anchor, set()).add(self._section)
+            elif event.anchor is not None:
+                self.anchor_defined_in[event.anchor] = self._section
+            
+            return Composer.compose_node(self, parent, index)
+        finally:
+            self._depth -= 1
+
+    def compose_mapping_node(self, anchor):
+        if self.keep_keys is None or self._depth != 1:
+            return Composer.compose_mapping_node(self, anchor)
+        
+        # 根映射：与 Composer.compose_mapping_node 相同，但跳过未保留的键
+        start_event = self.get_event()
+        tag = start_event.tag
+        if tag is None or tag == '!':
+            tag = self.resolve(MappingNode, None, start_event.implicit)
+        node = MappingNode(tag, [], start_event.start_mark, None,
+                           flow_style=start_event.flow_style)
+        if anchor is not None:
+            self.anchors[anchor] = node
+        while not self.check_event(MappingEndEvent):
+            item_key = self.compose_node(node, None)
+            if isinstance(item_key, ScalarNode) and item_key.value not in self.keep_keys:
+                self._section = item_key.value
+                self.skip_node()
+                continue
+            item_value = self.compose_node(node, item_key)
+            node.value.append((item_key, item_value))
+        end_event = self.get_event()
+        node.end_mark = end_event.end_mark
+        return node
+
+    def skip_node(self):
+        """消费一个节点的事件而不组装；带锚点的子树仍正常组装"""
+        level = 0
+        while True:
+            event = self.peek_event()
+            if getattr(event, 'anchor', None) is not None and not isinstance(event, AliasEvent):
+                self.compose_node(None, None)
+            else:
+                self.get_event()
+                if isinstance(event, (MappingStartEvent, SequenceStartEvent)):
+                    level += 1
+                elif isinstance(event, (MappingEndEvent, SequenceEndEvent)):
+                    level -= 1
+            if level == 0:
+                return
+
+    def construct_object(self, node, deep=False):
+        data = super().construct_object(node, deep)
+        name = self._anchor_by_node.get(node)
+        if name is not None:
+            self.anchor_objects[name] = data
+        return data
+
+    def anchor_info(self) -> Dict:
+        return {
+            'objects': self.anchor_objects,
+            'defined_in': self.anchor_defined_in,
+            'referenced_by': {k: sorted(v, key=str) for k, v in self.anchor_referenced_by.items()}
+        }
+
+
+class _TrackingSafeLoader(AnchorTrackingComposer, yaml.SafeLoader):
+    def __init__(self, stream):
+        yaml.SafeLoader.__init__(self, stream)
+        AnchorTrackingComposer.__init__(self)
+
+
+if HAS_LIBYAML:
+    class _TrackingCSafeLoader(AnchorTrackingComposer, CSafeLoader):
+        """libyaml 负责扫描/解析，组装节点时记录锚点"""
+        def __init__(self, stream):
+            CSafeLoader.__init__(self, stream)
+            AnchorTrackingComposer.__init__(self)
+
+
+def load_tracked(stream, keep_keys: Optional[Collection[str]] = None) -> Tuple[Any, Dict]:
+    """
+    加载 YAML，同时返回锚点信息（见 AnchorTrackingComposer）。
+    keep_keys 不为空时只组装这些顶层键。
+    """
+    cls = _TrackingCSafeLoader if _backend == 'c' else _TrackingSafeLoader
+    loader = cls(stream)
+    loader.keep_keys = keep_keys
+    try:
+        data = loader.get_single_data()
+        return data, loader.anchor_info()
+    finally:
+        loader.dispose()
+
+
+class NamedAnchorSerializer(Serializer):
+    """输出时沿用源文件中的锚点名，而不是 id001 之类的自动名称"""
+    anchor_names: Dict[int, str] = {}
+
+    def serialize(self, node):
+        self._names_by_node = None
+        self._used_anchor_names = set()
+        super().serialize(node)
+
+    def generate_anchor(self, node):
+        if self._names_by_node is None:
+            # represented_objects: id(obj) -> node，仅在当前文档序列化期间有效
+            self._names_by_node = {
+                id(n): self.anchor_names[obj_id]
+                for obj_id, n in self.represented_objects.items()
+                if obj_id in self.anchor_names
+            }
+        name = self._names_by_node.get(id(node))
+        while name is None or name in self._used_anchor_names:
+            name = super().generate_anchor(node)
+        self._used_anchor_names.add(name)
+        return name
+
+
+class _NamedSafeDumper(NamedAnchorSerializer, yaml.SafeDumper):
+    pass
+
+
+if HAS_LIBYAML:
+    class _NamedCSafeDumper(NamedAnchorSerializer, CEmitter, SafeRepresenter, Resolver):
+        """Python 序列化（命名锚点）+ libyaml emitter"""
+        def __init__(self, stream, default_style=None, default_flow_style=False,
+                     canonical=None, indent=None, width=None, allow_unicode=None,
+                     line_break=None, encoding=None, explicit_start=None,
+                     explicit_end=None, version=None, tags=None, sort_keys=True):
+            CEmitter.__init__(self, stream, canonical=canonical, indent=indent,
+                              width=width, encoding=encoding,
+                              allow_unicode=allow_unicode, line_break=line_break,
+                              explicit_start=explicit_start, explicit_end=explicit_end,
+                              version=version, tags=tags)
+            Serializer.__init__(self, encoding=encoding, explicit_start=explicit_start,
+                                explicit_end=explicit_end, version=version, tags=tags)
+            SafeRepresenter.__init__(self, default_style=default_style,
+                                     default_flow_style=default_flow_style,
+                                     sort_keys=sort_keys)
+            Resolver.__init__(self)
+
+
+def _flow_safe(item: Any) -> bool:
+    if isinstance(item, str):
+        return bool(item) and item.strip() == item and not _FLOW_UNSAFE.intersection(item)
+    return isinstance(item, (bool, int, float))
+
+
+def _ignore_aliases_named(self, data):
+    # 带原始锚点名的字符串标量（如 filter: &flt ...）同样输出为锚点/别名
+    if isinstance(data, str) and id(data) in self.anchor_names:
+        return False
+    return SafeRepresenter.ignore_aliases(self, data)
+
+
+def _ignore_aliases_compact(self, data):
+    if isinstance(data, str) and len(data) >= COMPACT_ALIAS_MIN_LENGTH:
+        return False
+    return _ignore_aliases_named(self, data)
+
+
+def _represent_compact(self, data):
+    # 根映射及其直接子节点用 block 风格，更深的集合一律 flow（每项一行）
+    self._root_id = id(data)
+    self._top_ids = {id(v) for v in data.values()} if isinstance(data, dict) else set()
+    SafeRepresenter.represent(self, data)
+
+
+def _compact_flow(self, data, scalars) -> bool:
+    if id(data) == self._root_id:
+        return False
+    if id(data) in self._top_ids:
+        return bool(data) and all(map(_flow_safe, scalars))
+    return True
+
+
+def _represent_list_compact(self, data):
+    flow = _compact_flow(self, data, data)
+    return self.represent_sequence('tag:yaml.org,2002:seq', data, flow_style=flow)
+
+
+def _represent_dict_compact(self, data):
+    flow = _compact_flow(self, data, [x for pair in data.items() for x in pair])
+    return self.represent_mapping('tag:yaml.org,2002:map', data, flow_style=flow)
+
+
+def _dumper(base, anchors: Optional[Dict[str, Any]], compact: bool = False):
+    if not anchors and not compact:
+        return base
+    names = {id(obj): name for name, obj in (anchors or {}).items()}
+    namespace = {'anchor_names': names, 'ignore_aliases': _ignore_aliases_named}
+    if compact:
+        namespace['ignore_aliases'] = _ignore_aliases_compact
+        namespace['represent'] = _represent_compact
+    cls = type(base.__name__, (base,), namespace)
+    if compact:
+        cls.add_representer(list, _represent_list_compact)
+        cls.add_representer(dict, _represent_dict_compact)
+    return cls
+
+
+def dump(data: Any, stream=None, anchors: Optional[Dict[str, Any]] = None,
+         compact: bool = False, **kwargs) -> Optional[str]:
+    """
+    等价于 yaml.safe_dump；anchors（锚点名 -> 对象）用于保留源文件中的锚点名。
+    compact: 长字符串也可共用锚点，顶层键以下的集合使用 flow 风格（需要加引号的顶层列表仍用 block）。
+    libyaml 的 emitter 即使开启 allow_unicode 也会把 BMP 以外的字符（如国旗 emoji）
+    转义为 \\UXXXXXXXX，此时回退到纯 Python emitter，保证两种后端输出逐字节一致。
+    """
+    named = bool(anchors) or compact
+    if _backend == 'c':
+        base = _NamedCSafeDumper if named else CSafeDumper
+        text = yaml.dump(data, Dumper=_dumper(base, anchors, compact), **kwargs)
+        if not (kwargs.get('allow_unicode') and '\\U' in text):
+            if stream is None:
+                return text
+            stream.write(text)
+            return None
+    base = _NamedSafeDumper if named else yaml.SafeDumper
+    return yaml.dump(data, stream, Dumper=_dumper(base, anchors, compact), **kwargs)
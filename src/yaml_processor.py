@@ -2,12 +2,30 @@
 """
 YAML Processor - 精简 YAML 配置文件
 """
-import yaml
-import re
+import os
+import json
+import hashlib
 import argparse
 import logging
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Any, Set, Optional
+from typing import Dict, List, Any, Set, Optional, Tuple
+
+import yaml_io
+from build_manifest import BuildManifest, file_hash
+from output_writer import OutputWriter
+from rule_optimizer import OPTIMIZER_VERSION, optimize_rules, summarize
+from group_graph import GRAPH_VERSION, prune_groups
+from cost_model import COST_MODEL_VERSION, normalize
+from filter_regex import FILTER_REGEX_VERSION, rewrite_filters, synthetic_names
+from instrumentation import Profiler, cprofile
+from section_store import STORE_VERSION, SectionStore
+from rule_bundler import BUNDLER_VERSION, RULE_SET_CACHE, RuleSetBundler, RuleSetSource
+from minify import (COMPRESSIONS, MINIFY_VERSION, available_compressions, compress,
+                    dump_minified, is_minified, minified_path)
+
+# 处理逻辑变化时递增，使增量构建的旧结果失效
+PROCESSOR_VERSION = '4'
 
 
 class YAMLProcessor:
@@ -18,54 +36,161 @@ class YAMLProcessor:
         'rules'
     }
 
-    def __init__(self):
+    def __init__(self, streaming: bool = False, optimize: bool = False,
+                 prune: bool = False, probe_budget: Optional[float] = None,
+                 minify: bool = False, compressions: Tuple[str, ...] = (),
+                 rewrite_filters: bool = False, profiler: Optional[Profiler] = None,
+                 store: Optional[Path] = None, bundle_dir: Optional[Path] = None,
+                 bundle_url: str = '', rule_set_source: Optional[RuleSetSource] = None):
         self.logger = logging.getLogger(__name__)
         self.anchors = {}
+        # 流式模式：解析时直接跳过未保留的顶层键，不为其构造对象
+        self.streaming = streaming
+        # 删除重复/被覆盖/不可达的规则（见 rule_optimizer.py）
+        self.optimize = optimize
+        # 删除规则无法到达的策略组（见 group_graph.py）
+        self.prune = prune
+        # 每小时测速次数上限：把过短的 health-check/策略组 interval 提升到下限（见 cost_model.py）
+        self.probe_budget = probe_budget
+        # 把 filter 改写为等价且更快的写法（见 filter_regex.py）
+        self.rewrite_filters = rewrite_filters
+        self.filter_names: Optional[List[str]] = None
+        self.filter_cache: Dict[str, Any] = {}
+        # 另外写出 X.min.yaml 及其预压缩文件（见 minify.py）
+        self.minify = minify or bool(compressions)
+        self.compressions = tuple(compressions)
+        # 分阶段计时（--profile），未启用时不记录；落盘耗时由 writer 记录
+        self.profiler = profiler or Profiler()
+        self.writer = OutputWriter(profiler=self.profiler)
+        # 另外写入内容寻址的分段存储（见 section_store.py）
+        self.store = SectionStore(store, self.writer) if store else None
+        # 合并相邻、目标相同的 RULE-SET，合并结果发布在 bundle_dir（见 rule_bundler.py）
+        self.bundler = (RuleSetBundler(bundle_dir, bundle_url, rule_set_source, self.writer)
+                        if bundle_dir else None)
+        # 为 True 时 process_one 的结果附带处理后的配置，供流水线直接渲染
+        self.keep_configs = False
 
-    def extract_anchors(self, content: str) -> Dict[str, str]:
-        """提取 YAML 锚点"""
+    @staticmethod
+    def shared_object_ids(data: Any) -> Set[int]:
+        """数据树中被多次引用的容器对象（即输出时需要锚点的对象）"""
+        seen, shared = set(), set()
+        stack = [data]
+        while stack:
+            item = stack.pop()
+            if not isinstance(item, (dict, list)):
+                continue
+            if id(item) in seen:
+                shared.add(id(item))
+                continue
+            seen.add(id(item))
+            stack.extend(item.values() if isinstance(item, dict) else item)
+        return shared
+
+    def collect_anchors(self, stripped: Dict, anchor_info: Dict) -> Dict[str, Any]:
+        """
+        保留下来、且仍被别名引用的锚点：原始锚点名 -> 对象
+        容器按对象身份判断；字符串标量（filter: &flt "(?i)港|HK"）在定义与全部别名都位于保留键中时保留。
+        数字、布尔等其他标量的锚点仍展开为值（小整数与布尔值是共享对象，无法按身份区分引用）。
+        """
+        shared = self.shared_object_ids(stripped)
         anchors = {}
-        pattern = r'^(\s*)&(\w+)\s+(.+)$'
-        for line in content.split('\n'):
-            match = re.match(pattern, line)
-            if match:
-                indent, name, value = match.groups()
-                anchors[name] = f"{indent}&{name} {value}"
+        for name, obj in anchor_info['objects'].items():
+            if isinstance(obj, str):
+                sections = {anchor_info['defined_in'].get(name),
+                            *anchor_info['referenced_by'].get(name, ())}
+                if name in anchor_info['referenced_by'] and sections <= self.KEEP_KEYS:
+                    anchors[name] = obj
+            elif id(obj) in shared:
+                anchors[name] = obj
         return anchors
 
-    def find_referenced_anchors(self, content: Any) -> Set[str]:
-        """查找引用的锚点"""
-        text = yaml.dump(content, allow_unicode=True)
-        return set(re.findall(r'\*(\w+)', text))
-
     def process_file(self, yaml_path: Path) -> Optional[Dict]:
         """处理单个 YAML 文件"""
         self.logger.info(f"Processing: {yaml_path}")
         
         try:
-            with open(yaml_path, 'r', encoding='utf-8') as f:
-                raw_content = f.read()
-            
-            self.anchors = self.extract_anchors(raw_content)
-            config = yaml.safe_load(raw_content)
+            profiler = self.profiler
+            with profiler.span('read', yaml_path) as span:
+                with open(yaml_path, 'r', encoding='utf-8') as f:
+                    text = f.read()
+                span.bytes = yaml_path.stat().st_size
+
+            # 一次解析：同时得到数据及锚点定义/引用位置
+            with profiler.span('parse', yaml_path) as span:
+                config, anchor_info = yaml_io.load_tracked(
+                    text, keep_keys=self.KEEP_KEYS if self.streaming else None
+                )
+                span.bytes = len(text)
+            del text
             
             if not config:
                 return None
 
-            # 只保留必要的键
-            stripped = {k: config[k] for k in self.KEEP_KEYS if k in config}
+            # 只保留必要的键（保持源文件中的顺序，输出与进程无关）
+            with profiler.span('strip', yaml_path):
+                stripped = {k: v for k, v in config.items() if k in self.KEEP_KEYS}
             
             if not stripped:
                 self.logger.warning(f"No valid keys in {yaml_path}")
                 return None
 
-            # 处理锚点
-            referenced = self.find_referenced_anchors(stripped)
-            if referenced and self.anchors:
-                stripped['_anchors'] = {
-                    name: self.anchors[name]
-                    for name in referenced if name in self.anchors
-                }
+            # 处理锚点：记录被保留键引用的锚点，输出时沿用原始锚点名
+            self.anchors = {
+                name: [s for s in sections if s in self.KEEP_KEYS]
+                for name, sections in anchor_info['referenced_by'].items()
+                if any(s in self.KEEP_KEYS for s in sections)
+            }
+
+            removed = []
+            if self.optimize and isinstance(stripped.get('rules'), list):
+                # 原地修改，保持列表对象不变（可能带锚点）
+                with profiler.span('optimize', yaml_path):
+                    kept, removed = optimize_rules(stripped['rules'], stripped.get('rule-providers'))
+                stripped['rules'][:] = kept
+                if removed:
+                    self.logger.info(f"Removed {len(removed)} rules: {summarize(removed)}")
+
+            # 在删除规则之后：规则被删后其目标组可能不再可达
+            pruned = []
+            if self.prune and isinstance(stripped.get('proxy-groups'), list):
+                with profiler.span('prune', yaml_path):
+                    pruned = prune_groups(stripped)
+                if pruned:
+                    self.logger.info(f"Pruned {len(pruned)} groups: {', '.join(pruned)}")
+
+            # 在删除规则之后：删除后原本不相邻的 RULE-SET 可能变为相邻
+            bundled = []
+            if self.bundler:
+                with profiler.span('bundle', yaml_path):
+                    bundled = self.bundler.bundle(stripped)
+                if bundled:
+                    self.logger.info(f"Bundled {sum(len(b['providers']) for b in bundled)} "
+                                     f"rule-providers into {len(bundled)}")
+
+            rewritten = []
+            if self.rewrite_filters:
+                if self.filter_names is None:
+                    self.filter_names = synthetic_names()
+                with profiler.span('filters', yaml_path):
+                    rewritten = rewrite_filters(stripped, self.filter_names, self.filter_cache)
+                if rewritten:
+                    self.logger.info(f"Rewrote {len(rewritten)} filters")
+
+            # 在删除策略组之后：只为保留下来的组计算测速量
+            probe_floor = 0
+            if self.probe_budget:
+                with profiler.span('probe', yaml_path):
+                    normalized = normalize(stripped, self.probe_budget)
+                probe_floor = normalized['floor']
+                if probe_floor:
+                    self.logger.info(f"Probe intervals raised to {probe_floor}s: "
+                                     f"{normalized['before']:g} -> {normalized['after']:g} probes/h")
+
+            # 删除之后再收集锚点：只被已删除内容引用的锚点不再需要
+            with profiler.span('anchor', yaml_path):
+                anchors = self.collect_anchors(stripped, anchor_info)
+            if anchors:
+                stripped['_anchors'] = anchors
 
             # 添加元数据
             stripped['_meta'] = {
@@ -73,7 +198,13 @@ class YAMLProcessor:
                 'proxy_providers': len(stripped.get('proxy-providers', {})),
                 'rule_providers': len(stripped.get('rule-providers', {})),
                 'proxy_groups': len(stripped.get('proxy-groups', [])),
-                'rules': len(stripped.get('rules', []))
+                'rules': len(stripped.get('rules', [])),
+                'anchors': self.anchors,
+                'rules_removed': removed,
+                'groups_pruned': pruned,
+                'rule_sets_bundled': bundled,
+                'filters_rewritten': rewritten,
+                'probe_floor': probe_floor
             }
             
             return stripped
@@ -82,10 +213,8 @@ class YAMLProcessor:
             self.logger.error(f"Error processing {yaml_path}: {e}")
             return None
 
-    def save_file(self, config: Dict, output_path: Path):
-        """保存处理后的文件"""
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        
+    def save_file(self, config: Dict, output_path: Path) -> bool:
+        """保存处理后的文件；内容未变化时不写入，返回是否实际写入"""
         # 分离元数据
         meta = config.pop('_meta', {})
         anchors = config.pop('_anchors', {})
@@ -97,67 +226,255 @@ class YAMLProcessor:
         lines.append(f"# Providers: {meta.get('proxy_providers', 0)} proxy, {meta.get('rule_providers', 0)} rule")
         lines.append("")
         
-        # 写入锚点
+        # 锚点保留在正文中（沿用原始名称），这里只列出名称
         if anchors:
-            lines.extend([
-                "# ============================================================================",
-                "# Anchors",
-                "# ============================================================================"
-            ])
-            for name in sorted(anchors.keys()):
-                lines.append(anchors[name])
-            lines.append("")
+            lines.insert(2, f"# Anchors: {', '.join(sorted(anchors))}")
         
         # 写入配置
-        yaml_content = yaml.dump(
-            config, 
-            default_flow_style=False, 
-            allow_unicode=True,
-            sort_keys=False
-        )
+        source = meta.get('source')
+        with self.profiler.span('dump', source) as span:
+            yaml_content = yaml_io.dump(
+                config, 
+                anchors=anchors,
+                default_flow_style=False, 
+                allow_unicode=True,
+                sort_keys=False
+            )
+            content = '\n'.join(lines) + '\n' + yaml_content
+            span.bytes = len(content)
+        
+        written = self.writer.write(output_path, content, label=source)
         
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(lines) + '\n' + yaml_content)
+        self.logger.info(f"{'Saved' if written else 'Unchanged'}: {output_path}")
         
-        self.logger.info(f"Saved: {output_path}")
+        if self.minify:
+            with self.profiler.span('minify', source) as span:
+                data = dump_minified(config).encode('utf-8')
+                span.bytes = len(data)
+            path = minified_path(output_path)
+            self.writer.write(path, data, label=source)
+            for method in self.compressions:
+                with self.profiler.span(f'compress.{method}', source) as span:
+                    packed = compress(data, method)
+                    span.bytes = len(packed)
+                self.writer.write(path.with_name(f'{path.name}.{method}'), packed, label=source)
+        
+        if self.store:
+            with self.profiler.span('store', source):
+                try:
+                    self.store.save_config(output_path, config,
+                                           hashlib.sha256(content.encode('utf-8')).hexdigest())
+                except ValueError as e:
+                    # 无法用 JSON 表示的值（如日期）：该配置只写 YAML
+                    self.logger.warning(f"Not stored {output_path}: {e}")
+        return written
+
+    def output_paths(self, output_path: Path) -> List[Path]:
+        """单个输入对应的全部输出文件"""
+        paths = [output_path]
+        if self.minify:
+            path = minified_path(output_path)
+            paths.append(path)
+            paths.extend(path.with_name(f'{path.name}.{method}') for method in self.compressions)
+        if self.store:
+            paths.append(self.store.config_path(self.store.key_for(output_path)))
+        return paths
+
+    def fingerprint(self) -> Dict:
+        """影响全部输出的因素"""
+        fingerprint = {'processor': PROCESSOR_VERSION}
+        if self.optimize:
+            fingerprint['optimizer'] = OPTIMIZER_VERSION
+        if self.prune:
+            fingerprint['group_graph'] = GRAPH_VERSION
+        if self.rewrite_filters:
+            fingerprint['filter_regex'] = FILTER_REGEX_VERSION
+        if self.probe_budget:
+            fingerprint['cost_model'] = [COST_MODEL_VERSION, self.probe_budget]
+        if self.minify:
+            fingerprint['minify'] = [MINIFY_VERSION, sorted(self.compressions)]
+        if self.store:
+            fingerprint['store'] = STORE_VERSION
+        if self.bundler:
+            fingerprint['bundle'] = [BUNDLER_VERSION, self.bundler.base_url]
+        return fingerprint
+
+    def process_one(self, yaml_file: Path, output_file: Path) -> Optional[Dict]:
+        """处理并保存单个文件，返回结果记录"""
+        try:
+            config = self.process_file(yaml_file)
+            if not config:
+                return None
+            meta = config.get('_meta', {})
+            written = self.save_file(config, output_file)
+            result = {
+                'input': str(yaml_file),
+                'output': str(output_file),
+                'meta': meta,
+                'written': written
+            }
+            if self.keep_configs:
+                result['config'] = config
+            return result
+        except Exception as e:
+            self.logger.error(f"Failed to process {yaml_file}: {e}")
+            return None
+
+    def run_tasks(self, tasks: List[tuple], jobs: int = 1) -> List[Optional[Dict]]:
+        """执行 (yaml_file, output_file) 任务，结果顺序与任务顺序一致"""
+        if jobs <= 1 or len(tasks) <= 1:
+            with self.writer.batch():
+                return [self.process_one(*task) for task in tasks]
+        
+        with ProcessPoolExecutor(max_workers=jobs,
+                                 initializer=_init_worker,
+                                 initargs=(self,)) as pool:
+            results = list(pool.map(_process_one_worker, tasks))
+        # 子进程的计时随结果带回
+        for result in results:
+            if result:
+                self.profiler.merge(result.pop('profile', None))
+        return results
 
     def process_directory(self, input_dir: Path, output_dir: Path, 
-                         recursive: bool = False) -> List[Dict]:
-        """处理目录"""
+                         recursive: bool = False, incremental: bool = False,
+                         manifest_path: Optional[Path] = None,
+                         jobs: int = 1, only: Optional[Set[str]] = None) -> List[Dict]:
+        """
+        处理目录。
+        only：已知变化的文件（相对 input_dir 的 posix 路径，如 upstream_sync.py 的输出）；
+        其他文件直接沿用清单中的哈希，不再读取计算（需 incremental）
+        """
         results = []
         pattern = '**/*.yaml' if recursive else '*.yaml'
         
-        yaml_files = list(input_dir.glob(pattern))
+        yaml_files = sorted(p for p in input_dir.glob(pattern)
+                            if p.is_file() and not is_minified(p))
         self.logger.info(f"Found {len(yaml_files)} YAML files")
         
+        manifest = BuildManifest(
+            manifest_path or output_dir / '.manifest.json',
+            output_dir,
+            self.fingerprint()
+        )
+        
+        tasks = []
+        digests = {}
         for yaml_file in yaml_files:
-            if not yaml_file.is_file():
+            rel_path = yaml_file.relative_to(input_dir)
+            output_file = output_dir / rel_path
+            key = rel_path.as_posix()
+            if only is not None and key not in only:
+                digests[key] = manifest.recorded_hash(key) or file_hash(yaml_file)
+            else:
+                digests[key] = file_hash(yaml_file)
+            
+            if incremental and manifest.is_fresh(key, digests[key]):
+                self.logger.debug(f"Unchanged: {yaml_file}")
+                self.profiler.count('process.skipped')
+                manifest.keep(key)
+                results.append({
+                    'input': str(yaml_file),
+                    'output': str(output_file),
+                    'skipped': True
+                })
                 continue
-                
-            try:
-                rel_path = yaml_file.relative_to(input_dir)
-                output_file = output_dir / rel_path
-                
-                config = self.process_file(yaml_file)
-                if config:
-                    self.save_file(config, output_file)
-                    results.append({
-                        'input': str(yaml_file),
-                        'output': str(output_file),
-                        'meta': config.get('_meta', {})
-                    })
-            except Exception as e:
-                self.logger.error(f"Failed to process {yaml_file}: {e}")
+            
+            tasks.append((yaml_file, output_file))
         
+        for (yaml_file, output_file), result in zip(tasks, self.run_tasks(tasks, jobs)):
+            if result:
+                key = yaml_file.relative_to(input_dir).as_posix()
+                manifest.record(key, digests[key], self.output_paths(output_file))
+                results.append(result)
+        
+        # 删除上游已消失文件的输出
+        if incremental:
+            for key in manifest.stale_keys():
+                for removed in manifest.remove_outputs(key, self.writer):
+                    results.append({'output': str(removed), 'deleted': True})
+        
+        # 删除清单后不再被引用的分段
+        if self.store:
+            self.store.gc()
+        
+        manifest.save()
         return results
 
 
+def read_file_list(path: Path) -> Set[str]:
+    """读取变化文件列表（每行一个相对路径，忽略空行）"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+_worker_processor: Optional[YAMLProcessor] = None
+
+
+def _init_worker(processor: YAMLProcessor):
+    """进程池初始化：每个进程一份处理器（沿用主进程的选项）"""
+    global _worker_processor
+    _worker_processor = processor
+    # 主进程已有的计时不再重复上报
+    processor.profiler = Profiler(processor.profiler.enabled)
+    processor.writer.profiler = processor.profiler
+
+
+def _process_one_worker(task: tuple) -> Optional[Dict]:
+    result = _worker_processor.process_one(*task)
+    if result:
+        result['profile'] = _worker_processor.profiler.drain()
+    return result
+
+
 def main():
     parser = argparse.ArgumentParser(description='Process YAML configs')
     parser.add_argument('--input', '-i', type=Path, required=True)
     parser.add_argument('--output', '-o', type=Path, required=True)
     parser.add_argument('--recursive', '-r', action='store_true')
     parser.add_argument('--verbose', '-v', action='store_true')
+    parser.add_argument('--incremental', action='store_true',
+                       help='Skip inputs whose content hash is unchanged')
+    parser.add_argument('--manifest', type=Path,
+                       help='Manifest path (default: <output>/.manifest.json)')
+    parser.add_argument('--files-from', type=Path,
+                       help='Only re-hash files listed here (relative to --input, one per line; '
+                            'e.g. from upstream_sync.py); implies --incremental')
+    parser.add_argument('--yaml-backend', choices=('auto',) + yaml_io.BACKENDS,
+                       default='auto', help='YAML backend (default: libyaml when available)')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                       help='Worker processes (0 = all CPUs)')
+    parser.add_argument('--streaming', action='store_true',
+                       help='Skip dropped top-level keys while parsing')
+    parser.add_argument('--optimize-rules', action='store_true',
+                       help='Drop duplicate, shadowed and unreachable rules')
+    parser.add_argument('--rules-report', type=Path,
+                       help='Write removed rules per file as JSON (with --optimize-rules)')
+    parser.add_argument('--prune-groups', action='store_true',
+                       help='Drop proxy groups no rule can reach')
+    parser.add_argument('--rewrite-filters', action='store_true',
+                       help='Rewrite provider/group filters into equivalent faster forms')
+    parser.add_argument('--probe-budget', type=float,
+                       help='Raise short probe intervals to fit this many probes/hour per config')
+    parser.add_argument('--minify', action='store_true',
+                       help='Also write X.min.yaml (shared values as anchors, flow style)')
+    parser.add_argument('--compress', action='append', choices=COMPRESSIONS, default=[],
+                       help='Pre-compress X.min.yaml (repeatable; implies --minify)')
+    parser.add_argument('--store', type=Path,
+                       help='Also write a content-addressed section store (e.g. processed_configs/.store)')
+    parser.add_argument('--bundle-dir', type=Path,
+                       help='Merge adjacent same-target RULE-SETs into files here '
+                            '(e.g. processed_configs/rule-sets; requires --bundle-url)')
+    parser.add_argument('--bundle-url',
+                       help='Published base URL of --bundle-dir')
+    parser.add_argument('--rule-sets', type=Path,
+                       help='Local rule-set directory used before downloading (with --bundle-dir)')
+    parser.add_argument('--rule-set-cache', type=Path, default=RULE_SET_CACHE,
+                       help='Download cache for rule sets being bundled')
+    parser.add_argument('--profile', type=Path,
+                       help='Write per-file, per-stage timings as JSON')
+    parser.add_argument('--cprofile', type=Path,
+                       help='Write a cProfile dump of the main process')
     
     args = parser.parse_args()
     
@@ -171,10 +488,77 @@ def main():
         print(f"❌ Input directory not found: {args.input}")
         return 1
     
-    processor = YAMLProcessor()
-    results = processor.process_directory(args.input, args.output, args.recursive)
+    missing = set(args.compress) - set(available_compressions())
+    if missing:
+        print(f"❌ Compression not available (install brotli): {', '.join(sorted(missing))}")
+        return 1
+    
+    if args.bundle_dir and not args.bundle_url:
+        print("❌ --bundle-dir requires --bundle-url")
+        return 1
+    
+    only = None
+    if args.files_from:
+        only = read_file_list(args.files_from)
+        args.incremental = True
+    
+    yaml_io.set_backend(args.yaml_backend)
+    processor = YAMLProcessor(streaming=args.streaming, optimize=args.optimize_rules,
+                              prune=args.prune_groups, probe_budget=args.probe_budget,
+                              minify=args.minify, compressions=tuple(args.compress),
+                              rewrite_filters=args.rewrite_filters,
+                              profiler=Profiler(enabled=bool(args.profile)),
+                              store=args.store, bundle_dir=args.bundle_dir,
+                              bundle_url=args.bundle_url or '',
+                              rule_set_source=RuleSetSource(args.rule_sets, args.rule_set_cache,
+                                                            fetch=True))
+    with cprofile(args.cprofile):
+        results = processor.process_directory(
+            args.input, args.output, args.recursive,
+            incremental=args.incremental, manifest_path=args.manifest,
+            jobs=args.jobs or os.cpu_count() or 1, only=only
+        )
+    
+    processed = [r for r in results if not r.get('skipped') and not r.get('deleted')]
+    skipped = [r for r in results if r.get('skipped')]
+    deleted = [r for r in results if r.get('deleted')]
+    
+    written = [r for r in processed if r.get('written')]
+    
+    print(f"\n✅ Successfully processed: {len(processed)} files")
+    if args.incremental:
+        print(f"⏭️  Skipped (hash unchanged): {len(skipped)} files")
+    print(f"📝 Written: {len(written)}, "
+          f"unchanged: {len(processed) - len(written) + len(skipped)}, "
+          f"deleted: {len(deleted)}")
     
-    print(f"\n✅ Successfully processed: {len(results)} files")
+    if args.optimize_rules:
+        removed = {r['input']: r['meta']['rules_removed']
+                   for r in processed if r['meta'].get('rules_removed')}
+        print(f"✂️  Rules removed: {sum(len(v) for v in removed.values())} "
+              f"in {len(removed)} files")
+        if args.rules_report:
+            args.rules_report.write_text(
+                json.dumps(removed, ensure_ascii=False, indent=2) + '\n', encoding='utf-8'
+            )
+    if args.prune_groups:
+        pruned = [r for r in processed if r['meta'].get('groups_pruned')]
+        print(f"🪓 Groups pruned: {sum(len(r['meta']['groups_pruned']) for r in pruned)} "
+              f"in {len(pruned)} files")
+    if args.rewrite_filters:
+        rewritten = [r for r in processed if r['meta'].get('filters_rewritten')]
+        print(f"🔎 Filters rewritten: {sum(len(r['meta']['filters_rewritten']) for r in rewritten)} "
+              f"in {len(rewritten)} files")
+    if args.bundle_dir:
+        bundled = [b for r in processed for b in r['meta'].get('rule_sets_bundled', [])]
+        print(f"📦 Rule-providers bundled: {sum(len(b['providers']) for b in bundled)} "
+              f"→ {len(bundled)}")
+    if args.probe_budget:
+        raised = [r for r in processed if r['meta'].get('probe_floor')]
+        print(f"⏱️  Probe intervals raised in {len(raised)} files")
+    if args.profile:
+        processor.profiler.write(args.profile)
+        print(f"📈 Profile: {processor.profiler.summary()}")
     return 0
 
 
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+测试增量构建 - 哈希未变化的输入跳过、源文件消失时删除输出并更新 README、
+指纹变化时全部重新生成
+"""
+import sys
+from pathlib import Path
+
+# 添加 src 目录到 Python 路径
+ROOT = Path(__file__).parent
+sys.path.insert(0, str(ROOT / 'src'))
+
+import yaml_io
+from build_manifest import BuildManifest
+from overwrite_generator import OverwriteGenerator
+
+
+def config(name):
+    return {'proxy-providers': {name: {'type': 'http', 'url': f'https://x/{name}'}},
+            'rules': ['MATCH,DIRECT']}
+
+
+def write_inputs(base: Path, names):
+    (base / 'A').mkdir(parents=True, exist_ok=True)
+    for name in names:
+        (base / 'A' / f'{name}.yaml').write_text(yaml_io.dump(config(name)), encoding='utf-8')
+
+
+def build(tmp_path, repo_url='https://x'):
+    generator = OverwriteGenerator(ROOT / 'templates', ROOT / 'src' / 'config_types.json',
+                                   reproducible=True)
+    return generator.process_directory(tmp_path / 'in', tmp_path / 'out', repo_url,
+                                       'local', incremental=True)
+
+
+def test_incremental_skips_deletes_and_rebuilds(tmp_path):
+    write_inputs(tmp_path / 'in', ['one', 'two'])
+    stats = build(tmp_path)
+    variants = stats['total'] // 2
+    assert stats['skipped'] == 0 and stats['written'] == 2 * variants + 1
+
+    # 输入未变化：全部跳过，不写入
+    stats = build(tmp_path)
+    assert stats['skipped'] == 2 and stats['total'] == 0 and stats['written'] == 0
+
+    # 只重新生成内容变化的输入
+    (tmp_path / 'in' / 'A' / 'one.yaml').write_text(yaml_io.dump(config('changed')),
+                                                     encoding='utf-8')
+    stats = build(tmp_path)
+    assert stats['skipped'] == 1 and stats['total'] == variants
+
+    # 源文件消失：删除其输出，同目录 README 中的文件数随之更新
+    (tmp_path / 'in' / 'A' / 'two.yaml').unlink()
+    stats = build(tmp_path)
+    assert stats['deleted'] == variants
+    assert not list((tmp_path / 'out' / 'A').glob('Overwrite*-two.conf'))
+    readme = (tmp_path / 'out' / 'A' / 'README.md').read_text(encoding='utf-8')
+    assert f'配置文件数: {variants}' in readme
+    manifest = BuildManifest(tmp_path / 'out' / '.manifest-local.json', tmp_path / 'out', {})
+    assert list(manifest.previous) == ['A/one.yaml']
+
+    # 指纹（此处为 repo_url）变化：全部重新生成
+    stats = build(tmp_path, repo_url='https://mirror')
+    assert stats['skipped'] == 0 and stats['written'] == variants
+    assert 'https://mirror/' in (tmp_path / 'out' / 'A' / 'Overwrite-one.conf').read_text()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+测试测速/下载估算与测速预算规范化
+"""
+import sys
+from pathlib import Path
+
+# 添加 src 目录到 Python 路径
+ROOT = Path(__file__).parent
+sys.path.insert(0, str(ROOT / 'src'))
+
+from cost_model import (cron_runs_per_day, estimate, normalize, parse_settings,
+                        probe_floor, probe_sources, probes_per_hour)
+from overwrite_generator import OverwriteGenerator
+
+
+def make_config():
+    return {
+        'proxy-providers': {
+            'a': {'type': 'http', 'url': 'https://x/a', 'interval': 3600,
+                  'health-check': {'enable': True, 'interval': 6, 'url': 'https://x/204'}},
+            'b': {'type': 'http', 'url': 'https://x/b'},
+        },
+        'rule-providers': {
+            'ads': {'type': 'http', 'url': 'https://x/ads', 'interval': 43200},
+            'once': {'type': 'http', 'url': 'https://x/once'},
+        },
+        'proxy-groups': [
+            {'name': 'Auto', 'type': 'url-test', 'use': ['a', 'b'], 'interval': 60, 'lazy': False},
+            {'name': 'All', 'type': 'fallback', 'include-all': True, 'proxies': ['DIRECT', 'Auto']},
+            {'name': 'Select', 'type': 'select', 'use': ['a']},
+        ],
+    }
+
+
+def test_cron_and_settings():
+    assert cron_runs_per_day('0 6 * * *') == 1
+    assert cron_runs_per_day('*/30 * * * *') == 48
+    assert cron_runs_per_day('0 3 * * 0') == 1 / 7
+    settings = parse_settings('[General]\n# X (comment)\nA = 1\n    B = two\n[Overwrite]\nC = 3\n')
+    assert settings == {'A': '1', 'B': 'two'}
+
+
+def test_estimate():
+    sources = probe_sources(make_config(), nodes_per_provider=10)
+    assert [(s['kind'], s['members'], s['interval'], s['lazy']) for s in sources] == [
+        ('health-check', 10, 6, True),
+        ('group', 20, 60, False),
+        ('group', 21, 300, True),
+    ]
+    result = estimate(make_config(), {
+        'URLTEST_INTERVAL_MOD': '300',
+        'DOWNLOAD_FILE': 'url=https://x/c.yaml, path=/etc/c.yaml, cron=0 6 * * *, force=true',
+        'GEO_AUTO_UPDATE': '1', 'GEO_UPDATE_WEEK_TIME': '*',
+        'SMART_ENABLE_LGBM': '1', 'LGBM_AUTO_UPDATE': '1', 'LGBM_UPDATE_INTERVAL': '24',
+    }, nodes_per_provider=10)
+    # health-check 不受 URLTEST_INTERVAL_MOD 影响
+    assert result['probes_per_hour'] == 10 * 600 + 20 * 12 + 21 * 12
+    assert result['probes_per_hour_idle'] == 20 * 12
+    assert result['fetches_per_day'] == {
+        'proxy_providers': 25.0, 'rule_providers': 2.0, 'config': 1.0, 'geo': 1.0, 'lgbm': 1.0
+    }
+
+
+def test_normalize_meets_budget_and_is_idempotent():
+    config = make_config()
+    result = normalize(config, budget=600, nodes_per_provider=10)
+    assert result['after'] <= 600 < result['before']
+    floor = result['floor']
+    assert floor % 60 == 0
+    assert config['proxy-providers']['a']['health-check']['interval'] == floor
+    assert config['proxy-groups'][1]['interval'] == floor
+    assert normalize(config, budget=600, nodes_per_provider=10)['floor'] in (0, floor)
+    # 只调整策略组时，health-check 的测速量保持不变
+    sources = probe_sources(make_config(), nodes_per_provider=10)
+    group_floor = probe_floor(sources, 6500, 300, kinds=('group',))
+    assert probes_per_hour(sources, 300, group_floor, kinds=('group',)) <= 6500
+
+
+def test_generator_raises_urltest_interval_only_over_budget():
+    generator = OverwriteGenerator(ROOT / 'templates', ROOT / 'src' / 'config_types.json',
+                                   probe_budget=1000)
+    config_def = generator.config_types[0]
+    base = generator.variant_settings()[config_def['name']]['URLTEST_INTERVAL_MOD']
+    assert base == '300'
+
+    config = make_config()
+    del config['proxy-providers']['a']['health-check']
+    interval = generator.urltest_interval(config, config_def)
+    assert interval > 300
+    sources = probe_sources(config)
+    assert probes_per_hour(sources, interval) <= 1000
+
+    config['proxy-groups'] = config['proxy-groups'][2:]
+    assert generator.urltest_interval(config, config_def) is None
+
+
+def test_unreachable_budget_leaves_intervals_alone(caplog):
+    # 测速量主要来自 health-check：只提升策略组间隔无法满足预算，不应把间隔提到上限
+    sources = probe_sources(make_config())
+    budget = probes_per_hour([s for s in sources if s['kind'] == 'health-check']) - 1
+    assert probe_floor(sources, budget, 300, kinds=('group',)) == 0
+    assert 'cannot be met' in caplog.text
+
+    generator = OverwriteGenerator(ROOT / 'templates', ROOT / 'src' / 'config_types.json',
+                                   probe_budget=budget)
+    assert generator.urltest_interval(make_config(), generator.config_types[0]) is None
+
+    # 没有测速的策略组
+    config = make_config()
+    config['proxy-groups'] = [g for g in config['proxy-groups'] if g['type'] == 'select']
+    assert probe_floor(probe_sources(config), 1, kinds=('group',)) == 0
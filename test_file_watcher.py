@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+测试 watch 模式 - 轮询发现新增/修改/删除；YAML 变化只重做该文件，
+模板变化用内存中的配置重新渲染全部变体，provider 索引不因重建而重复计数
+"""
+import os
+import sys
+import shutil
+from pathlib import Path
+
+# 添加 src 目录到 Python 路径
+ROOT = Path(__file__).parent
+sys.path.insert(0, str(ROOT / 'src'))
+
+import yaml_io
+from file_watcher import PollingWatcher
+from overwrite_generator import OverwriteGenerator
+from pipeline import Pipeline
+from provider_index import ProviderIndex
+from yaml_processor import YAMLProcessor
+
+
+def config(name):
+    return {'proxy-providers': {name: {'type': 'http', 'url': f'https://x/{name}'}},
+            'proxy-groups': [{'name': 'Proxy', 'type': 'select', 'use': [name]}],
+            'rules': ['MATCH,Proxy']}
+
+
+def test_watcher_reports_changes(tmp_path):
+    (tmp_path / 'a.yaml').write_text('a: 1\n')
+    (tmp_path / 'notes.txt').write_text('x')
+    watcher = PollingWatcher([tmp_path])
+    assert watcher.changes() == set()
+
+    os.utime(tmp_path / 'a.yaml', ns=(0, 0))
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'sub' / 'b.yaml').write_text('b: 1\n')
+    (tmp_path / 'notes.txt').write_text('changed')
+    assert watcher.changes() == {tmp_path / 'a.yaml', tmp_path / 'sub' / 'b.yaml'}
+
+    (tmp_path / 'a.yaml').unlink()
+    sleeps = []
+    assert watcher.wait(interval=5, sleep=sleeps.append) == {tmp_path / 'a.yaml'}
+    assert sleeps == [0.2]
+    assert watcher.wait(interval=5, timeout=0, sleep=sleeps.append) == set()
+
+
+def test_rebuild_only_affected_outputs(tmp_path):
+    templates = tmp_path / 'templates'
+    shutil.copytree(ROOT / 'templates', templates)
+    raw = tmp_path / 'raw'
+    (raw / 'A').mkdir(parents=True)
+    for name in ('one', 'two'):
+        (raw / 'A' / f'{name}.yaml').write_text(yaml_io.dump(config(name)), encoding='utf-8')
+
+    pipeline = Pipeline(YAMLProcessor(),
+                        OverwriteGenerator(templates, ROOT / 'src' / 'config_types.json',
+                                           reproducible=True))
+    pipeline.warm = True
+    sources = [('local', raw)]
+    args = (sources, tmp_path / 'processed', tmp_path / 'out', 'https://x')
+    variants = pipeline.run(*args, incremental=True)['local']['total'] // 2
+    assert len(pipeline.configs) == 2
+
+    # YAML 变化：只精简该文件，只渲染它的变体
+    edited = config('one')
+    edited['proxy-providers']['extra'] = {'type': 'http', 'url': 'https://x/extra'}
+    (raw / 'A' / 'one.yaml').write_text(yaml_io.dump(edited), encoding='utf-8')
+    stats = pipeline.rebuild([raw / 'A' / 'one.yaml'], *args)['local']
+    assert len(stats['processed']) == 1
+    assert stats['total'] == variants and stats['skipped'] == 1
+
+    # 模板变化：全部重新渲染，配置取自内存
+    base = templates / 'base.conf.j2'
+    base.write_text(base.read_text(encoding='utf-8') + '# edited\n', encoding='utf-8')
+    pipeline.generator.load_yaml = None
+    stats = pipeline.rebuild([base], *args)['local']
+    assert stats['processed'] == [] and stats['written'] == 2 * variants
+    assert (tmp_path / 'out' / 'A' / 'Overwrite-two.conf').read_text().rstrip().endswith('# edited')
+
+    # 无关文件不触发重建
+    assert pipeline.rebuild([tmp_path / 'other.yaml'], *args) == {}
+
+
+def test_rebuild_keeps_provider_index_counts(tmp_path):
+    raw = tmp_path / 'raw'
+    (raw / 'A').mkdir(parents=True)
+    for name in ('one', 'two'):
+        data = config(name)
+        data['rule-providers'] = {'ads': {'type': 'http', 'behavior': 'domain',
+                                          'url': 'https://x/ads.mrs'}}
+        (raw / 'A' / f'{name}.yaml').write_text(yaml_io.dump(data), encoding='utf-8')
+
+    pipeline = Pipeline(YAMLProcessor(),
+                        OverwriteGenerator(ROOT / 'templates', ROOT / 'src' / 'config_types.json',
+                                           reproducible=True))
+    pipeline.warm = True
+    pipeline.index = ProviderIndex()
+    sources = [('local', raw), ('other', tmp_path / 'missing')]
+    args = (sources, tmp_path / 'processed', tmp_path / 'out', 'https://x')
+    pipeline.run(*args, incremental=True)
+    expected = pipeline.index.report(top=0)
+    assert expected['declared'] == 2 and expected['unique'] == 1
+
+    # 重复保存同一文件：引用数不增加
+    for _ in range(3):
+        os.utime(raw / 'A' / 'one.yaml')
+        pipeline.rebuild([raw / 'A' / 'one.yaml'], *args)
+    assert pipeline.index.report(top=0) == expected
+
+    # 删除一个配置：其引用随之消失
+    (raw / 'A' / 'two.yaml').unlink()
+    pipeline.rebuild([raw / 'A' / 'two.yaml'], *args)
+    assert pipeline.index.report(top=0)['declared'] == 1
+    assert list(pipeline.index.by_config) == ['local/A/one.yaml']
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+测试 filter 正则分析 - mihomo 内联标志转换、改写与原表达式等价、超线性检测
+"""
+import sys
+from pathlib import Path
+
+# 添加 src 目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+from filter_regex import (compile_filter, filter_matches, growth_exponent, invalid_filters,
+                          rewrite_filters, suggest_rewrite, synthetic_names, translate,
+                          verified_rewrite)
+
+NAMES = synthetic_names(2000)
+
+
+def test_translate_scopes_inline_flags_to_group():
+    assert translate('(?i)hk') == '(?i)hk'
+    assert translate('^(?=.*(?i)(港|hk))(?!.*(X))') == '^(?=.*(?i:(港|hk)))(?!.*(X))'
+    # 作用范围到所在分组结束：括号外的 X 仍区分大小写
+    regexes = compile_filter('^(?=.*(?i)(hk))(?!.*(X)).*$')
+    assert filter_matches(regexes, 'HK 01')
+    assert not filter_matches(regexes, 'HK X')
+    assert filter_matches(regexes, 'HK x')
+
+
+def test_suggest_rewrite_shapes():
+    assert suggest_rewrite('^(?!.*(群|官网)).*$') == {'filter': None, 'exclude-filter': '(群|官网)'}
+    assert suggest_rewrite('^((?!(直连|拒绝)).)*$') == {'filter': None, 'exclude-filter': '(直连|拒绝)'}
+    assert suggest_rewrite('(?=.*(?i)(港|HK)).*$') == {'filter': '(?i)(港|HK)', 'exclude-filter': None}
+    assert suggest_rewrite('^(?=.*(A))(?!.*(B)).*$') == {'filter': '(A)', 'exclude-filter': '(B)'}
+    assert suggest_rewrite('^(.*)') == {'filter': None, 'exclude-filter': None}
+    # 未锚定的否定前瞻在字符串末尾总能成立，与 exclude-filter 不等价
+    assert suggest_rewrite('(?!.*(A)).*$') is None
+    assert suggest_rewrite('(?i)港|hk') is None
+    assert suggest_rewrite('港`HK') is None
+
+
+def test_rewrites_are_equivalent():
+    for pattern in ('^(?!.*(剩余|到期|官网|Traffic|Expire)).*$',
+                    '^((?!(直连|DIRECT)).)*$',
+                    '(?=.*(?i)(🇭🇰|香港|hk|hong kong))',
+                    '^(?=.*((?i)🇺🇸|美国|(\\b(US|USA)(\\d+)?\\b)))(?!.*((?i)IPLC|专线)).*$'):
+        rewrite, mismatch = verified_rewrite(pattern, NAMES)
+        assert rewrite is not None and mismatch is None, pattern
+
+
+def test_superlinear_detection():
+    quadratic = growth_exponent(compile_filter('(?=.*(?i)(新|🇸🇬|SG|Singapore))'))
+    linear = growth_exponent(compile_filter('(?i)(新|🇸🇬|SG|Singapore)'))
+    assert quadratic > 1.5 > linear
+
+
+def test_rewrite_filters_and_validation():
+    config = {
+        'proxy-providers': {
+            'a': {'type': 'http', 'filter': '^(?!.*(官网|流量)).*$'},
+            'b': {'type': 'http', 'filter': '^(?!.*(官网)).*$', 'exclude-filter': '直连'},
+        },
+        'proxy-groups': [
+            {'name': 'HK', 'type': 'url-test', 'use': ['a'], 'filter': '(?=.*(港|HK)).*$'},
+            {'name': 'US', 'type': 'url-test', 'use': ['a'], 'filter': '^(?=.*(美))(?!.*(X)).*$'},
+            {'name': 'All', 'type': 'select', 'use': ['a'], 'filter': '^(.*)'},
+            {'name': 'Bad', 'type': 'select', 'use': ['a'], 'exclude-filter': '(港'},
+        ],
+    }
+    assert invalid_filters(config)[0][:2] == ('proxy-groups/Bad', 'exclude-filter')
+    changes = rewrite_filters(config, NAMES)
+    assert [c['location'] for c in changes] == [
+        'proxy-providers/a', 'proxy-groups/HK', 'proxy-groups/All'
+    ]
+    assert config['proxy-providers']['a'] == {'type': 'http', 'exclude-filter': '(官网|流量)'}
+    # 已有 exclude-filter、或同时含包含与排除条件的保持原样
+    assert config['proxy-providers']['b']['filter'] == '^(?!.*(官网)).*$'
+    assert config['proxy-groups'][0]['filter'] == '(港|HK)'
+    assert config['proxy-groups'][1]['filter'] == '^(?=.*(美))(?!.*(X)).*$'
+    assert 'filter' not in config['proxy-groups'][2]
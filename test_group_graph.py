@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+测试策略组依赖图 - 可达性/循环/悬空引用/删除
+"""
+import sys
+from pathlib import Path
+
+# 添加 src 目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+from group_graph import GroupGraph, prune_groups
+
+
+def make_config(**extra):
+    config = {
+        'proxy-providers': {
+            'sub': {'type': 'http', 'url': 'https://x/sub', 'override': {'dialer-proxy': 'Chain'}},
+        },
+        'rule-providers': {
+            'ads': {'type': 'http', 'url': 'https://x/ads', 'proxy': 'Fetch'},
+        },
+        'proxy-groups': [
+            {'name': 'Proxy', 'type': 'select', 'proxies': ['Auto', 'DIRECT'], 'use': ['sub']},
+            {'name': 'Auto', 'type': 'url-test', 'use': ['sub']},
+            {'name': 'Media', 'type': 'select', 'proxies': ['Proxy']},
+            {'name': 'Unused', 'type': 'url-test', 'proxies': ['Orphan']},
+            {'name': 'Orphan', 'type': 'fallback', 'use': ['sub']},
+            {'name': 'Chain', 'type': 'select', 'use': ['sub']},
+            {'name': 'Fetch', 'type': 'select', 'proxies': ['DIRECT']},
+            {'name': 'GLOBAL', 'type': 'select', 'proxies': ['Proxy', 'Unused']},
+        ],
+        'rules': [
+            'AND,((NETWORK,UDP),(DST-PORT,443)),Media',
+            'RULE-SET,ads,REJECT',
+            'MATCH,Proxy',
+        ],
+    }
+    config.update(extra)
+    return config
+
+
+def test_reachability_and_prune():
+    config = make_config()
+    graph = GroupGraph(config)
+    assert graph.reachable() == {'Proxy', 'Auto', 'Media', 'Chain', 'Fetch'}
+    # GLOBAL 保留，但不把它引用的组变为可达
+    assert graph.unreachable() == ['Unused', 'Orphan']
+
+    groups = config['proxy-groups']
+    assert prune_groups(config) == ['Unused', 'Orphan']
+    assert config['proxy-groups'] is groups
+    assert [g['name'] for g in groups] == ['Proxy', 'Auto', 'Media', 'Chain', 'Fetch', 'GLOBAL']
+    assert prune_groups(config) == []
+
+
+def test_cycles_and_dangling():
+    config = make_config()
+    config['proxy-groups'][2]['proxies'].append('Media')
+    config['proxy-groups'][1]['proxies'] = ['Media']
+    config['proxy-groups'][0]['use'].append('missing')
+    stats = GroupGraph(config).stats()
+    assert ['Media', 'Media'] in stats['cycles']
+    assert ['Proxy', 'Auto', 'Media', 'Proxy'] in stats['cycles']
+    assert stats['dangling'] == [{'from': 'Proxy', 'ref': 'missing', 'kind': 'provider'}]
+
+
+def test_node_names_only_checked_when_proxies_present():
+    config = make_config(rules=['MATCH,node-1'])
+    graph = GroupGraph(config)
+    assert graph.external == {'node-1'} and not graph.dangling
+
+    config = make_config(rules=['MATCH,node-1', 'DOMAIN,a.com,node-2'],
+                         proxies=[{'name': 'node-1', 'type': 'ss'}])
+    graph = GroupGraph(config)
+    assert graph.dangling == [('rules', 'node-2', 'rule-target')]
+
+
+def test_sub_rule_targets_are_roots():
+    config = make_config(**{'sub-rules': {'udp': ['DOMAIN,a.com,Unused', 'MATCH,DIRECT']}})
+    config['rules'].insert(0, 'SUB-RULE,(NETWORK,UDP),udp')
+    graph = GroupGraph(config)
+    # 只被子规则引用的组同样可达；子规则名不是悬空的策略组引用
+    assert graph.unreachable() == []
+    assert graph.stats()['external'] == [] and graph.dangling == []
+    assert prune_groups(config) == []
+
+    config['rules'].insert(0, 'SUB-RULE,(NETWORK,TCP),missing')
+    assert GroupGraph(config).dangling == [('rules', 'missing', 'sub-rule')]
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+测试分阶段计时 - 记录与合并、未启用时不记录、处理器各阶段均有记录
+"""
+import sys
+import json
+from pathlib import Path
+
+# 添加 src 目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+from instrumentation import Profiler
+from yaml_processor import YAMLProcessor
+
+
+def test_spans_merge_and_report(tmp_path):
+    profiler = Profiler(enabled=True)
+    with profiler.span('parse', 'a.yaml') as span:
+        span.bytes = 10
+    with profiler.span('parse', 'a.yaml') as span:
+        span.bytes = 5
+    profiler.count('skipped')
+
+    worker = Profiler(enabled=True)
+    with worker.span('dump', 'b.yaml') as span:
+        span.bytes = 7
+    worker.count('skipped', 2)
+    profiler.merge(worker.drain())
+    assert worker.files == {} and worker.counters == {}
+
+    report = profiler.report()
+    assert report['stages']['parse']['bytes'] == 15
+    assert report['stages']['parse']['calls'] == 2
+    assert report['stages']['dump']['bytes'] == 7
+    assert report['counters'] == {'skipped': 3}
+    assert set(report['files']) == {'a.yaml', 'b.yaml'}
+
+    profiler.write(tmp_path / 'profile.json')
+    assert json.loads((tmp_path / 'profile.json').read_text())['version'] == report['version']
+
+
+def test_disabled_records_nothing():
+    profiler = Profiler()
+    with profiler.span('parse', 'a.yaml') as span:
+        span.bytes = 10
+    profiler.count('skipped')
+    assert profiler.files == {} and profiler.counters == {}
+    assert profiler.drain() is None
+
+
+def test_processor_stages(tmp_path):
+    source = tmp_path / 'in' / 'config.yaml'
+    source.parent.mkdir()
+    source.write_text(
+        'dns: {enable: true}\n'
+        'proxy-providers:\n  a: {type: http, url: "https://x/a"}\n'
+        'rules:\n  - MATCH,DIRECT\n',
+        encoding='utf-8'
+    )
+    processor = YAMLProcessor(minify=True, profiler=Profiler(enabled=True))
+    processor.process_directory(tmp_path / 'in', tmp_path / 'out')
+    stages = processor.profiler.report()['files'][str(source)]['stages']
+    for stage in ('read', 'parse', 'strip', 'anchor', 'dump', 'minify', 'write'):
+        assert stage in stages
+    assert stages['read']['bytes'] == source.stat().st_size
+    assert stages['write']['calls'] == 2
+
+
+def test_batched_writes_are_timed_when_flushed(tmp_path):
+    from output_writer import OutputWriter
+    profiler = Profiler(enabled=True)
+    writer = OutputWriter(profiler=profiler)
+    with writer.batch():
+        assert writer.write(tmp_path / 'a' / 'x.conf', 'hello', label='src.yaml')
+        # 只比较、排队，尚未落盘
+        assert 'write' not in profiler.files['src.yaml']
+        assert not (tmp_path / 'a' / 'x.conf').exists()
+    stages = profiler.report()['files']['src.yaml']['stages']
+    assert stages['write'] == {'seconds': stages['write']['seconds'], 'bytes': 5, 'calls': 1}
+    assert stages['compare']['calls'] == 1
+
+    # 内容未变化：只有比较
+    assert not writer.write(tmp_path / 'a' / 'x.conf', 'hello', label='src.yaml')
+    assert profiler.files['src.yaml']['write'][2] == 1
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+测试精简输出 - 内容与原配置一致、重复值改为锚点、预压缩可复现
+"""
+import sys
+import gzip
+from pathlib import Path
+
+import pytest
+
+# 添加 src 目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+import yaml_io
+from minify import compress, dump_minified, is_minified, minified_path
+from output_writer import OutputWriter
+
+FILTER = '^(?!.*(官网|剩余|流量|到期|过期|Expire|Traffic)).*$'
+CONFIG = {
+    'proxy-providers': {
+        name: {
+            'type': 'http', 'url': f'https://sub.example/{name}', 'interval': 86400,
+            'filter': FILTER,
+            'health-check': {'enable': True, 'url': 'https://www.gstatic.com/generate_204',
+                             'interval': 300},
+        }
+        for name in ('a', 'b', 'c')
+    },
+    'proxy-groups': [
+        {'name': 'Proxy', 'type': 'select', 'proxies': ['Auto', 'DIRECT'], 'use': ['a', 'b', 'c']},
+        {'name': 'Auto', 'type': 'url-test', 'use': ['a', 'b', 'c'], 'filter': FILTER,
+         'tolerance': 50, 'lazy': True},
+    ],
+    'rules': ['DOMAIN-SUFFIX,example.com,Proxy', 'GEOIP,CN,DIRECT', 'MATCH,Proxy'],
+}
+
+
+@pytest.mark.parametrize('backend', yaml_io.BACKENDS if yaml_io.HAS_LIBYAML else ('python',))
+def test_round_trip_and_anchors(backend):
+    yaml_io.set_backend(backend)
+    try:
+        text = dump_minified(CONFIG)
+    finally:
+        yaml_io.set_backend('auto')
+    assert yaml_io.safe_load(text) == CONFIG
+    # 重复的 filter 与 health-check 只出现一次，其余为别名
+    assert text.count(FILTER) == 1
+    assert text.count('generate_204') == 1
+    assert "- DOMAIN-SUFFIX,example.com,Proxy\n" in text
+    full = yaml_io.dump(CONFIG, allow_unicode=True, sort_keys=False)
+    assert len(text) < len(full)
+
+
+def test_paths_and_reproducible_gzip(tmp_path):
+    path = tmp_path / 'config.yaml'
+    assert minified_path(path).name == 'config.min.yaml'
+    assert is_minified(minified_path(path)) and not is_minified(path)
+
+    data = dump_minified(CONFIG).encode('utf-8')
+    packed = compress(data, 'gz')
+    assert packed == compress(data, 'gz')
+    assert gzip.decompress(packed) == data
+
+    writer = OutputWriter()
+    assert writer.write(tmp_path / 'x.gz', packed)
+    assert not writer.write(tmp_path / 'x.gz', packed)
+
+
+def test_pipeline_keeps_download_url_unless_preferred(tmp_path, monkeypatch):
+    import pipeline
+    root = Path(__file__).parent
+    (tmp_path / 'raw' / 'A').mkdir(parents=True)
+    (tmp_path / 'raw' / 'A' / 'config.yaml').write_text(yaml_io.dump(CONFIG), encoding='utf-8')
+
+    def build(*extra):
+        monkeypatch.setattr(sys, 'argv', [
+            'pipeline.py', '-s', f'local={tmp_path / "raw"}', '-p', str(tmp_path / 'processed'),
+            '-o', str(tmp_path / 'out'), '-t', str(root / 'templates'),
+            '-c', str(root / 'src' / 'config_types.json'), '--repo-url', 'https://x',
+            '--minify', '--compress', 'gz', *extra])
+        assert pipeline.main() == 0
+        return (tmp_path / 'out' / 'A' / 'Overwrite-config.conf').read_text(encoding='utf-8')
+
+    # 精简文件与原文件并存，默认下载地址不变
+    assert '/A/config.yaml,' in build()
+    assert (tmp_path / 'processed' / 'local' / 'A' / 'config.min.yaml.gz').is_file()
+    assert '/A/config.min.yaml,' in build('--prefer-minified')
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+测试输出写入 - 批量写入、原子替换、内容未变化时跳过、可复现构建
+"""
+import sys
+from pathlib import Path
+
+# 添加 src 目录到 Python 路径
+ROOT = Path(__file__).parent
+sys.path.insert(0, str(ROOT / 'src'))
+
+import yaml_io
+from output_writer import OutputWriter, TIMESTAMP_LINE, build_timestamp
+
+
+def test_batch_defers_writes_until_exit(tmp_path):
+    writer = OutputWriter()
+    target = tmp_path / 'a' / 'b' / 'x.conf'
+    with writer.batch():
+        assert writer.write(target, 'one\n')
+        assert writer.write(target.with_name('y.conf'), 'two\n')
+        assert not target.exists()
+    assert target.read_text() == 'one\n'
+    assert target.with_name('y.conf').read_text() == 'two\n'
+    assert writer.stats['written'] == 2
+
+
+def test_unchanged_content_is_not_rewritten(tmp_path):
+    target = tmp_path / 'x.conf'
+    writer = OutputWriter()
+    writer.write(target, 'same\n')
+    mtime = target.stat().st_mtime_ns
+    assert not writer.write(target, 'same\n')
+    assert target.stat().st_mtime_ns == mtime
+    assert writer.stats == {'written': 1, 'unchanged': 1, 'deleted': 0}
+
+
+def test_atomic_write_leaves_no_temp_files(tmp_path):
+    writer = OutputWriter()
+    for i in range(3):
+        writer.write(tmp_path / 'x.conf', f'{i}\n')
+    assert [p.name for p in tmp_path.iterdir()] == ['x.conf']
+    assert (tmp_path / 'x.conf').read_text() == '2\n'
+
+
+def test_preserve_ignores_timestamp_only_changes(tmp_path):
+    target = tmp_path / 'README.md'
+    writer = OutputWriter(TIMESTAMP_LINE)
+    writer.write(target, '- 生成时间: 2024-01-01\nbody\n')
+    assert not writer.write(target, '- 生成时间: 2025-01-01\nbody\n')
+    # 正文未变化：保留原有的生成时间行
+    assert target.read_text() == '- 生成时间: 2024-01-01\nbody\n'
+    assert writer.write(target, '- 生成时间: 2025-01-01\nchanged\n')
+    assert '2025-01-01' in target.read_text()
+
+
+def test_reproducible_rebuild_writes_nothing(tmp_path, monkeypatch):
+    from overwrite_generator import OverwriteGenerator
+    from yaml_processor import YAMLProcessor
+    monkeypatch.setenv('SOURCE_DATE_EPOCH', '1700000000')
+    assert build_timestamp() == '2023-11-14 22:13:20 UTC'
+    (tmp_path / 'raw' / 'A').mkdir(parents=True)
+    (tmp_path / 'raw' / 'A' / 'x.yaml').write_text(yaml_io.dump({
+        'proxy-providers': {'p': {'type': 'http', 'url': 'https://x/p'}},
+        'rules': ['MATCH,DIRECT'],
+    }), encoding='utf-8')
+
+    def build():
+        processor = YAMLProcessor()
+        processor.process_directory(tmp_path / 'raw', tmp_path / 'processed', recursive=True)
+        generator = OverwriteGenerator(ROOT / 'templates', ROOT / 'src' / 'config_types.json',
+                                       reproducible=True)
+        stats = generator.process_directory(tmp_path / 'processed', tmp_path / 'out',
+                                            'https://x', 'local')
+        return processor.writer.stats['written'] + stats['written']
+
+    assert build() > 0
+    before = {p: p.stat().st_mtime_ns for p in tmp_path.rglob('*') if p.is_file()}
+    # 同一 SOURCE_DATE_EPOCH 的第二次完整构建不写入任何文件
+    assert build() == 0
+    assert before == {p: p.stat().st_mtime_ns for p in tmp_path.rglob('*') if p.is_file()}
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+测试并行执行 - jobs=1 与 jobs=2 的输出逐字节相同，统计与清单一致
+"""
+import sys
+from pathlib import Path
+
+# 添加 src 目录到 Python 路径
+ROOT = Path(__file__).parent
+sys.path.insert(0, str(ROOT / 'src'))
+
+import yaml_io
+from overwrite_generator import OverwriteGenerator
+from yaml_processor import YAMLProcessor
+
+
+def config(name, providers):
+    return {
+        'dns': {'enable': True},
+        'proxy-providers': {f'{name}{i}': {'type': 'http', 'url': f'https://x/{name}/{i}',
+                                           'health-check': {'enable': True, 'interval': 300}}
+                            for i in range(providers)},
+        'proxy-groups': [{'name': 'Proxy', 'type': 'select', 'use': [f'{name}0']}],
+        'rules': ['DOMAIN-SUFFIX,example.com,Proxy', 'MATCH,DIRECT'],
+    }
+
+
+def tree(base: Path) -> dict:
+    return {p.relative_to(base).as_posix(): p.read_bytes()
+            for p in sorted(base.rglob('*')) if p.is_file()}
+
+
+def build(raw: Path, out: Path, jobs: int) -> tuple:
+    processor = YAMLProcessor(minify=True)
+    results = processor.process_directory(raw, out / 'processed', recursive=True,
+                                          incremental=True, jobs=jobs)
+    generator = OverwriteGenerator(ROOT / 'templates', ROOT / 'src' / 'config_types.json',
+                                   reproducible=True)
+    stats = generator.process_directory(out / 'processed', out / 'overwrite', 'https://x',
+                                        'local', incremental=True, jobs=jobs)
+    processed = sorted((Path(r['output']).relative_to(out).as_posix(), r['written'])
+                       for r in results)
+    return processed, stats
+
+
+def test_jobs_produce_identical_outputs(tmp_path, monkeypatch):
+    monkeypatch.setenv('SOURCE_DATE_EPOCH', '1700000000')
+    raw = tmp_path / 'raw'
+    for author, count in (('A', 3), ('B', 2), ('B/sub', 2)):
+        (raw / author).mkdir(parents=True, exist_ok=True)
+        for i in range(count):
+            name = f"{author.replace('/', '_')}{i}"
+            (raw / author / f'{name}.yaml').write_text(yaml_io.dump(config(name, i + 1)),
+                                                       encoding='utf-8')
+
+    serial = build(raw, tmp_path / 'serial', jobs=1)
+    parallel = build(raw, tmp_path / 'parallel', jobs=2)
+
+    assert serial == parallel
+    assert serial[1]['total'] > 0 and serial[1]['errors'] == 0
+    # 输出（含两个阶段的清单）逐字节相同
+    outputs = tree(tmp_path / 'serial')
+    assert outputs == tree(tmp_path / 'parallel')
+    assert 'processed/.manifest.json' in outputs
+    assert 'overwrite/.manifest-local.json' in outputs
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+测试 rule-providers 索引 - URL 规范化、跨配置查询、序列化
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加 src 目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+from provider_index import ProviderIndex, normalize_url
+
+RAW = 'https://raw.githubusercontent.com/666OS/rules/release/mihomo/domain/AI.mrs'
+
+
+@pytest.mark.parametrize('url', [
+    RAW,
+    'https://github.com/666OS/rules/raw/release/mihomo/domain/AI.mrs',
+    'https://github.com/666OS/rules/raw/refs/heads/release/mihomo/domain/AI.mrs',
+    'https://gh-proxy.com/github.com/666OS/rules/raw/release/mihomo/domain/AI.mrs',
+    'https://gh-proxy.com/raw.githubusercontent.com/666OS/rules/release/mihomo/domain/AI.mrs',
+    'https://git.imee.me/https://github.com/666OS/rules/raw/release/mihomo/domain/AI.mrs',
+    'https://fastly.jsdelivr.net/gh/666OS/rules@release/mihomo/domain/AI.mrs',
+    'HTTPS://RAW.githubusercontent.com:443/666OS/rules/release/mihomo/domain/AI.mrs#x',
+])
+def test_normalize_url_collapses_mirrors(url):
+    assert normalize_url(url) == RAW
+
+
+def test_release_downloads_are_not_rewritten():
+    url = 'https://github.com/DustinWin/ruleset_geodata/releases/download/mihomo-ruleset/fakeip-filter.mrs'
+    assert normalize_url(url) == url
+
+
+def provider(url, behavior='domain', fmt='mrs'):
+    return {'type': 'http', 'behavior': behavior, 'format': fmt, 'url': url, 'interval': 86400}
+
+
+@pytest.fixture
+def index():
+    index = ProviderIndex()
+    index.add_config('a.yaml', {'rule-providers': {
+        'AI': provider(RAW),
+        'Ads': provider('https://example.com/ads.mrs'),
+    }})
+    index.add_config('b.yaml', {'rule-providers': {
+        'OpenAI': provider('https://gh-proxy.com/' + RAW),
+        'Ads-ip': provider('https://example.com/ads.mrs', behavior='ipcidr'),
+        'Local': {'type': 'inline', 'behavior': 'domain', 'payload': ['x.com']},
+    }})
+    index.set_sizes({RAW: 100, 'https://example.com/ads.mrs': 10})
+    return index
+
+
+def test_configs_sharing(index):
+    assert index.configs_sharing(RAW) == {'a.yaml': ['AI'], 'b.yaml': ['OpenAI']}
+
+
+def test_fetch_cost_deduplicates_and_respects_cache(index):
+    assert index.fetch_cost(['a.yaml', 'b.yaml']) == \
+        {'declared': 4, 'unique': 3, 'bytes': 120, 'unknown_size': 0}
+    assert index.fetch_cost(['b.yaml'], cached=['a.yaml']) == \
+        {'declared': 2, 'unique': 1, 'bytes': 10, 'unknown_size': 0}
+
+
+def test_json_round_trip(index, tmp_path):
+    for name in ('index.json', 'index.json.gz'):
+        index.save(tmp_path / name)
+        loaded = ProviderIndex.load(tmp_path / name)
+        assert loaded.to_json() == index.to_json()
+        assert loaded.fetch_cost(['a.yaml', 'b.yaml']) == index.fetch_cost(['a.yaml', 'b.yaml'])
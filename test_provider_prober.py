@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+测试 provider 探测 - 本地 HTTP 服务：HEAD 取大小、不支持 HEAD 时 Range GET、失效 URL、
+TTL 缓存、按配置汇总及 provider_index.py 查询时读取大小
+"""
+import sys
+import json
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# 添加 src 目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+import provider_index
+from provider_index import ProviderIndex
+from provider_prober import ProviderProber, config_providers
+
+BODIES = {'/ads.mrs': b'a' * 3000, '/cn.mrs': b'c' * 500, '/sub': b'proxies: []\n'}
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        Handler.requests.append(('HEAD', self.path))
+        if self.path == '/cn.mrs':
+            # 不支持 HEAD 的服务端
+            self.send_response(405)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200 if self.path in BODIES else 404)
+        self.send_header('Content-Length', str(len(BODIES.get(self.path, b''))))
+        self.end_headers()
+
+    def do_GET(self):
+        Handler.requests.append(('GET', self.path))
+        body = BODIES.get(self.path)
+        if body is None:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        assert self.headers.get('Range') == 'bytes=0-0'
+        self.send_response(206)
+        self.send_header('Content-Range', f'bytes 0-0/{len(body)}')
+        self.send_header('Content-Length', '1')
+        self.end_headers()
+        self.wfile.write(body[:1])
+
+
+def test_probe_cache_and_report(tmp_path, monkeypatch, capsys):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_port}'
+    config = {
+        'proxy-providers': {
+            'sub': {'type': 'http', 'url': f'{base}/sub'},
+            'placeholder': {'type': 'http', 'url': 'https://example.com/xxx&flag=clash'},
+        },
+        'rule-providers': {
+            'ads': {'type': 'http', 'behavior': 'domain', 'url': f'{base}/ads.mrs'},
+            'cn': {'type': 'http', 'behavior': 'ipcidr', 'url': f'{base}/cn.mrs'},
+            'gone': {'type': 'http', 'behavior': 'domain', 'url': f'{base}/gone.mrs'},
+            'local': {'type': 'inline', 'payload': ['DOMAIN,a.com']},
+        },
+    }
+    configs = {'A/a.yaml': config_providers(config),
+               'B/b.yaml': config_providers({'rule-providers': {'ads': config['rule-providers']['ads']}})}
+    assert configs['A/a.yaml']['proxy'] == [f'{base}/sub']
+    urls = {u for c in configs.values() for kind in c.values() for u in kind}
+
+    cache = tmp_path / 'probe.json'
+    try:
+        prober = ProviderProber(cache, ttl=100, failure_ttl=10)
+        stats = asyncio.run(prober.probe(urls, now=1000))
+        prober.save()
+        assert stats['probed'] == 4 and stats['failed'] == 1
+        assert prober.results[f'{base}/ads.mrs']['length'] == 3000
+        assert prober.results[f'{base}/cn.mrs']['method'] == 'GET'
+        assert prober.results[f'{base}/cn.mrs']['length'] == 500
+        assert prober.results[f'{base}/gone.mrs']['status'] == 404
+
+        report = prober.report(configs, max_bytes=3200)
+        assert report['configs']['A/a.yaml']['bytes'] == 3500
+        assert report['configs']['A/a.yaml']['dead'] == [f'{base}/gone.mrs']
+        assert report['oversized'] == ['A/a.yaml'] and report['with_dead'] == ['A/a.yaml']
+
+        # 缓存未过期：不再请求；失败的结果先过期
+        Handler.requests.clear()
+        prober = ProviderProber(cache, ttl=100, failure_ttl=10)
+        assert asyncio.run(prober.probe(urls, now=1050))['probed'] == 1
+        assert Handler.requests == [('HEAD', '/gone.mrs'), ('GET', '/gone.mrs')]
+        assert asyncio.run(prober.probe(urls, now=1200))['probed'] == 4
+
+        index = ProviderIndex()
+        index.add_config('A/a.yaml', config)
+        index.set_sizes(prober.sizes())
+        assert index.fetch_cost(['A/a.yaml']) == {'declared': 3, 'unique': 3, 'bytes': 3500,
+                                                  'unknown_size': 1}
+
+        # 索引本身不含大小，cost 查询时从探测缓存读取
+        prober.save()
+        index = ProviderIndex()
+        index.add_config('A/a.yaml', config)
+        index.save(tmp_path / 'index.json')
+        monkeypatch.setattr(sys, 'argv', ['provider_index.py', 'cost', '--index',
+                                          str(tmp_path / 'index.json'), '--probe-cache',
+                                          str(cache), 'A/a.yaml'])
+        assert provider_index.main() == 0
+        assert json.loads(capsys.readouterr().out)['bytes'] == 3500
+        assert '"s"' not in (tmp_path / 'index.json').read_text(encoding='utf-8')
+    finally:
+        server.shutdown()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+测试规则集合并 - 只合并相邻且目标/选项/属性相同的 RULE-SET，
+本地规则集代替远程下载；合并前后每个查询命中的策略组相同
+"""
+import sys
+import copy
+import shutil
+from pathlib import Path
+
+# 添加 src 目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+import yaml_io
+from rule_bundler import RuleSetBundler, RuleSetSource
+from rule_engine import RuleEngine, parse_query
+from yaml_processor import YAMLProcessor
+
+URL = 'https://example.test/rules'
+BUNDLE_URL = 'https://mirror.test/processed_configs/rule-sets'
+
+
+def provider(name, behavior='domain', fmt='yaml', **extra):
+    return {'type': 'http', 'behavior': behavior, 'format': fmt,
+            'url': f'{URL}/{name}.{"yaml" if fmt == "yaml" else "list"}', 'interval': 86400, **extra}
+
+
+CONFIG = {
+    'rule-providers': {
+        'ads': provider('ads'),
+        'tracker': provider('tracker', fmt='text', interval=3600),
+        'missing': provider('missing'),
+        'google': provider('google'),
+        'binary': provider('binary', fmt='mrs'),
+        'nested': provider('nested'),
+        'cidr': provider('cidr', behavior='ipcidr'),
+        'cidr2': provider('cidr2', behavior='ipcidr'),
+        'media': provider('media', behavior='classical'),
+        'media2': provider('media2', behavior='classical'),
+    },
+    'rules': [
+        'DOMAIN,direct.test,DIRECT',
+        'RULE-SET,ads,REJECT',
+        'RULE-SET,tracker,REJECT',
+        'RULE-SET,missing,REJECT',
+        'RULE-SET,google,Proxy',
+        'RULE-SET,binary,Proxy',
+        'RULE-SET,nested,Proxy',
+        'RULE-SET,cidr,DIRECT,no-resolve',
+        'RULE-SET,cidr2,DIRECT',
+        'RULE-SET,media,Media',
+        'RULE-SET,media2,Media',
+        'AND,((RULE-SET,nested),(NETWORK,UDP)),REJECT',
+        'MATCH,Proxy',
+    ],
+}
+
+RULE_SETS = {
+    'ads.yaml': "payload:\n  - '+.ads.test'\n  - '+.shared.test'\n",
+    'tracker.list': '+.tracker.test\n+.shared.test\n',
+    'google.yaml': "payload:\n  - '+.google.test'\n",
+    'nested.yaml': "payload:\n  - '+.nested.test'\n",
+    'cidr.yaml': "payload:\n  - '10.0.0.0/8'\n",
+    'cidr2.yaml': "payload:\n  - '192.168.0.0/16'\n",
+    'media.yaml': "payload:\n  - DOMAIN-SUFFIX,video.test\n",
+    'media2.yaml': "payload:\n  - DOMAIN-KEYWORD,stream\n  - DOMAIN-SUFFIX,video.test\n",
+}
+
+
+def write_rule_sets(directory: Path):
+    directory.mkdir(parents=True, exist_ok=True)
+    for name, text in RULE_SETS.items():
+        (directory / name).write_text(text, encoding='utf-8')
+
+
+def test_bundles_only_adjacent_equivalent_rule_sets(tmp_path):
+    local, bundles = tmp_path / 'rulesets', tmp_path / 'rule-sets'
+    write_rule_sets(local)
+    config = copy.deepcopy(CONFIG)
+    bundler = RuleSetBundler(bundles, BUNDLE_URL, RuleSetSource(local))
+    bundled = bundler.bundle(config)
+
+    assert [b['providers'] for b in bundled] == [['ads', 'tracker'], ['media', 'media2']]
+    assert config['rules'] == [
+        'DOMAIN,direct.test,DIRECT',
+        'RULE-SET,ads+1,REJECT',
+        'RULE-SET,missing,REJECT',
+        'RULE-SET,google,Proxy',
+        'RULE-SET,binary,Proxy',
+        'RULE-SET,nested,Proxy',
+        'RULE-SET,cidr,DIRECT,no-resolve',
+        'RULE-SET,cidr2,DIRECT',
+        'RULE-SET,media+1,Media',
+        'AND,((RULE-SET,nested),(NETWORK,UDP)),REJECT',
+        'MATCH,Proxy',
+    ]
+    merged = config['rule-providers']['ads+1']
+    assert list(config['rule-providers'])[:2] == ['ads+1', 'missing']
+    assert merged['format'] == 'text' and merged['interval'] == 3600
+    assert merged['url'].startswith(BUNDLE_URL + '/')
+    bundle_file = bundles / merged['url'].rsplit('/', 1)[-1]
+    assert bundle_file.read_text() == '+.ads.test\n+.shared.test\n+.tracker.test\n'
+
+    # 合并前后每个查询命中的规则目标相同
+    for path in bundles.glob('*.list'):
+        shutil.copy(path, local)
+    before, after = RuleEngine(CONFIG, local), RuleEngine(config, local)
+    for query in ('a.ads.test', 'x.shared.test', 'tracker.test', 'www.google.test',
+                  'cdn.video.test', 'livestream.test', 'other.test', 'direct.test'):
+        assert (before.resolve(parse_query(query))['target']
+                == after.resolve(parse_query(query))['target']), query
+
+
+def test_processor_publishes_bundles_and_gc(tmp_path):
+    local, bundles = tmp_path / 'rulesets', tmp_path / 'processed' / 'rule-sets'
+    write_rule_sets(local)
+    raw = tmp_path / 'raw'
+    raw.mkdir()
+    (raw / 'config.yaml').write_text(yaml_io.dump(CONFIG, sort_keys=False), encoding='utf-8')
+
+    processor = YAMLProcessor(bundle_dir=bundles, bundle_url=BUNDLE_URL,
+                              rule_set_source=RuleSetSource(local))
+    results = processor.process_directory(raw, tmp_path / 'processed' / 'local')
+    assert len(results[0]['meta']['rule_sets_bundled']) == 2
+    processed = yaml_io.safe_load((tmp_path / 'processed' / 'local' / 'config.yaml').read_text())
+    assert len(processed['rule-providers']) == 8
+    assert len(list(bundles.glob('*.list'))) == 2
+
+    # 成员内容更新：refresh 改写合并文件，文件名不变
+    (local / 'tracker.list').write_text('+.tracker.test\n+.new.test\n', encoding='utf-8')
+    bundler = RuleSetBundler(bundles, BUNDLE_URL, RuleSetSource(local))
+    assert bundler.refresh() == {'bundles': 2, 'updated': 1, 'incomplete': 0}
+    url = processed['rule-providers']['ads+1']['url']
+    assert '+.new.test' in (bundles / url.rsplit('/', 1)[-1]).read_text()
+
+    assert bundler.gc(tmp_path / 'processed') == 0
+    (tmp_path / 'processed' / 'local' / 'config.yaml').unlink()
+    assert bundler.gc(tmp_path / 'processed') == 2
+    assert not list(bundles.iterdir())
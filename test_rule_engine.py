@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+测试离线规则匹配 - 索引查找与逐条匹配结果一致，经过跳过的规则时结果不确定
+"""
+import sys
+import random
+from pathlib import Path
+
+import pytest
+
+# 添加 src 目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+from rule_engine import KeywordIndex, RuleEngine, parse_query
+
+RULES = [
+    'DOMAIN,exact.example.com,Exact',
+    'DOMAIN-SUFFIX,example.com,Suffix',
+    'DOMAIN-KEYWORD,tracker,Keyword',
+    'AND,((NETWORK,UDP),(DST-PORT,443)),REJECT',
+    'DOMAIN-REGEX,^ads[0-9]+\\.,Regex',
+    'IP-CIDR,10.0.0.0/8,LanNoResolve,no-resolve',
+    'RULE-SET,streaming,Media',
+    'DST-PORT,22/2000-2100,Ports',
+    'IP-CIDR,192.168.0.0/16,Lan',
+    'IP-CIDR,10.1.0.0/16,LanLater,no-resolve',
+    'IP-CIDR6,2001:db8::/32,V6',
+    'RULE-SET,cidrs,CidrSet,no-resolve',
+    'GEOIP,private,Private',
+    'OR,((DOMAIN-SUFFIX,or.test),(DOMAIN-KEYWORD,orword)),Or',
+    'NOT,((DOMAIN-SUFFIX,cn)),NotCN',
+    'MATCH,Final',
+]
+
+
+@pytest.fixture
+def engine(tmp_path):
+    (tmp_path / 'streaming.list').write_text('+.netflix.com\nnflxvideo.net\n.hulu.com\n')
+    (tmp_path / 'cidrs.yaml').write_text("payload:\n  - '172.16.0.0/12'\n  - '1.1.1.0/24'\n")
+    config = {
+        'rules': RULES,
+        'rule-providers': {
+            'streaming': {'type': 'http', 'behavior': 'domain', 'url': 'https://x/streaming.list'},
+            'cidrs': {'type': 'http', 'behavior': 'ipcidr', 'url': 'https://x/cidrs.yaml'},
+        },
+        'proxy-groups': [{'name': 'Media', 'type': 'select', 'proxies': ['DIRECT']}],
+    }
+    return RuleEngine(config, tmp_path)
+
+
+@pytest.mark.parametrize('query, target', [
+    ('exact.example.com', 'Exact'),
+    ('a.example.com:80', 'Suffix'),
+    ('mytracker.org', 'Keyword'),
+    ('video.cn:443/udp', 'REJECT'),
+    ('ads12.foo.cn', 'Regex'),
+    ('www.netflix.com', 'Media'),
+    ('netflix.com', 'Media'),
+    ('www.hulu.com', 'Media'),
+    ('hulu.com', 'NotCN'),
+    ('10.2.3.4', 'LanNoResolve'),
+    ('host.cn=10.1.2.3', 'LanLater'),
+    ('host.cn=192.168.1.1', 'Lan'),
+    ('[2001:db8::1]:443', 'V6'),
+    ('1.1.1.1', 'CidrSet'),
+    ('host.cn:2050', 'Ports'),
+    ('x.or.test', 'Or'),
+    ('plain.cn', 'Final'),
+])
+def test_first_match(engine, query, target):
+    assert engine.resolve(parse_query(query))['target'] == target
+    assert engine.resolve(parse_query(query), linear=True)['target'] == target
+
+
+def test_media_group_type(engine):
+    assert engine.resolve(parse_query('www.netflix.com'))['group_type'] == 'select'
+
+
+def test_indexed_matches_linear_on_random_queries(engine):
+    rng = random.Random(7)
+    labels = ['example', 'exact', 'tracker', 'netflix', 'hulu', 'or', 'test', 'ads1', 'cn', 'com', 'x']
+    for _ in range(2000):
+        host = '.'.join(rng.choice(labels) for _ in range(rng.randint(1, 4)))
+        ip = rng.choice(['', '=10.1.0.9', '=192.168.3.3', '=172.20.0.1', '=8.8.8.8'])
+        port = rng.choice(['', ':443', ':22', ':2001', ':80'])
+        network = rng.choice(['', '/udp'])
+        query = parse_query(f'{host}{ip}{port}{network}')
+        assert engine.match_index_of(query) == engine.match_linear(query), query.text
+
+
+def test_keyword_automaton_reports_earliest_rule():
+    index = KeywordIndex()
+    for i, word in enumerate(['hers', 'she', 'he']):
+        index.add(word, i)
+    index.build()
+    assert index.find('ushers') == 0
+    assert index.find('ashe') == 1
+    assert index.find('the') == 2
+    assert index.find('xyz') is None
+
+
+def test_skipped_rules_make_results_indeterminate(tmp_path):
+    config = {'rules': ['DOMAIN-SUFFIX,example.com,Early',
+                        'GEOIP,CN,DIRECT',
+                        'PROCESS-NAME,curl,DIRECT',
+                        'RULE-SET,missing,Proxy',
+                        'OR,((GEOIP,US),(DOMAIN,us.test)),Proxy',
+                        'DOMAIN-SUFFIX,cn,DIRECT',
+                        'MATCH,Final'],
+              'rule-providers': {'missing': {'type': 'http', 'behavior': 'domain',
+                                             'url': 'https://x/missing.mrs'}}}
+    engine = RuleEngine(config, tmp_path)
+    assert engine.unsupported == {'GEOIP': 1, 'PROCESS-NAME': 1, 'OR': 1}
+    assert engine.skipped == [1, 2, 3, 4]
+
+    # 命中在跳过的规则之前：结果确定
+    assert engine.resolve(parse_query('a.example.com'))['target'] == 'Early'
+    # 落到 MATCH 之前经过 GEOIP,CN：不报告 Final
+    result = engine.resolve(parse_query('host.org'))
+    assert result['indeterminate'] and result['target'] is None
+    assert result['rule'] == 'GEOIP,CN,DIRECT'
+    # 之前跳过的规则目标都与命中相同：目标确定
+    engine = RuleEngine({'rules': ['GEOIP,CN,DIRECT', 'DOMAIN-SUFFIX,cn,DIRECT']})
+    result = engine.resolve(parse_query('a.cn'))
+    assert not result['indeterminate'] and result['target'] == 'DIRECT'
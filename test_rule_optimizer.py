@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+测试规则优化 - 重复/覆盖/MATCH 之后/未声明规则集
+"""
+import sys
+from pathlib import Path
+
+# 添加 src 目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+from rule_parser import parse_rule, split_logic_payload
+from rule_optimizer import optimize_rules
+
+
+def reasons(rules, providers=None):
+    kept, removed = optimize_rules(rules, providers)
+    return kept, {item['rule']: item['reason'] for item in removed}
+
+
+def test_parse_rule_forms():
+    rule = parse_rule('IP-CIDR,1.1.1.0/24,DIRECT,no-resolve')
+    assert (rule.type, rule.payload, rule.target, rule.no_resolve) == \
+        ('IP-CIDR', '1.1.1.0/24', 'DIRECT', True)
+    rule = parse_rule('AND,((DOMAIN,a.com),(NETWORK,UDP)),REJECT')
+    assert rule.payload == '((DOMAIN,a.com),(NETWORK,UDP))' and rule.target == 'REJECT'
+    assert split_logic_payload(rule.payload) == ('DOMAIN,a.com', 'NETWORK,UDP')
+    # 未加外层括号的逻辑载荷
+    rule = parse_rule('AND,(AND,(DST-PORT,443),(NETWORK,UDP)),(NOT,((GEOIP,CN))),REJECT')
+    assert rule.target == 'REJECT'
+    assert split_logic_payload(rule.payload) == \
+        ('AND,(DST-PORT,443),(NETWORK,UDP)', 'NOT,((GEOIP,CN))')
+    assert parse_rule('MATCH,Proxy').target == 'Proxy'
+    assert parse_rule('garbage') is None
+
+
+def test_domain_shadowing():
+    kept, removed = reasons([
+        'DOMAIN-SUFFIX,example.com,Proxy',
+        'DOMAIN-SUFFIX,cdn.example.com,DIRECT',
+        'DOMAIN,Example.com,DIRECT',
+        'DOMAIN-SUFFIX,notexample.com,DIRECT',
+        'DOMAIN-KEYWORD,google,Proxy',
+        'DOMAIN,mail.google.com,DIRECT',
+        'DOMAIN-KEYWORD,googleapis,DIRECT',
+    ])
+    assert removed == {
+        'DOMAIN-SUFFIX,cdn.example.com,DIRECT': 'shadowed',
+        'DOMAIN,Example.com,DIRECT': 'shadowed',
+        'DOMAIN,mail.google.com,DIRECT': 'shadowed',
+        'DOMAIN-KEYWORD,googleapis,DIRECT': 'shadowed',
+    }
+    assert 'DOMAIN-SUFFIX,notexample.com,DIRECT' in kept
+
+
+def test_cidr_containment_respects_no_resolve():
+    kept, removed = reasons([
+        'IP-CIDR,10.0.0.0/8,DIRECT',
+        'IP-CIDR,10.1.0.0/16,Proxy',
+        'IP-CIDR,192.168.0.0/16,DIRECT,no-resolve',
+        'IP-CIDR,192.168.1.0/24,Proxy',
+        'IP-CIDR,192.168.2.0/24,Proxy,no-resolve',
+        'IP-CIDR6,2001:db8::/32,DIRECT',
+        'IP-CIDR6,2001:db8:1::/48,Proxy',
+    ])
+    assert removed == {
+        'IP-CIDR,10.1.0.0/16,Proxy': 'shadowed',
+        'IP-CIDR,192.168.2.0/24,Proxy,no-resolve': 'shadowed',
+        'IP-CIDR6,2001:db8:1::/48,Proxy': 'shadowed',
+    }
+    # 前面的规则不解析域名，后面会解析的规则仍可能命中
+    assert 'IP-CIDR,192.168.1.0/24,Proxy' in kept
+
+
+def test_duplicates_match_and_undeclared_providers():
+    kept, removed = reasons([
+        'RULE-SET,ads,REJECT',
+        'RULE-SET,missing,REJECT',
+        'GEOIP,CN,DIRECT',
+        'GEOIP,CN,Proxy',
+        'MATCH,Proxy',
+        'DOMAIN,late.com,DIRECT',
+    ], providers={'ads': {}})
+    assert kept == ['RULE-SET,ads,REJECT', 'GEOIP,CN,DIRECT', 'MATCH,Proxy']
+    assert removed == {
+        'RULE-SET,missing,REJECT': 'undeclared-provider',
+        'GEOIP,CN,Proxy': 'duplicate',
+        'DOMAIN,late.com,DIRECT': 'after-match',
+    }
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+测试构建间语义差异 - 哈希树只在变化处展开，变更记录按条目/字段定位；
+生成器只重新渲染读取的段有变化的变体；文件未变化的配置沿用旧树
+"""
+import sys
+import copy
+from pathlib import Path
+
+# 添加 src 目录到 Python 路径
+ROOT = Path(__file__).parent
+sys.path.insert(0, str(ROOT / 'src'))
+
+import yaml_io
+from overwrite_generator import OverwriteGenerator
+import section_diff
+from section_diff import (build_tree, changelog, collect_trees, diff_builds, load_trees,
+                          save_trees)
+
+CONFIG = {
+    'proxy-providers': {'sub': {'type': 'http', 'url': 'https://x/sub', 'interval': 3600}},
+    'proxy-groups': [
+        {'name': 'Proxy', 'type': 'select', 'use': ['sub']},
+        {'name': 'Auto', 'type': 'url-test', 'use': ['sub'], 'interval': 300},
+    ],
+    'rule-providers': {
+        'ads': {'type': 'http', 'behavior': 'domain', 'url': 'https://x/ads.yaml'},
+        'cn': {'type': 'http', 'behavior': 'ipcidr', 'url': 'https://x/cn.yaml'},
+    },
+    'rules': ['RULE-SET,ads,REJECT', 'RULE-SET,cn,DIRECT', 'MATCH,Proxy'],
+    'mode': 'rule',
+}
+
+
+def test_diff_locates_changes(tmp_path):
+    new = copy.deepcopy(CONFIG)
+    new['rule-providers']['ads']['url'] = 'https://mirror/ads.yaml'
+    del new['rule-providers']['cn']
+    new['proxy-groups'].reverse()
+    new['rules'] = ['DOMAIN,a.test,DIRECT', 'RULE-SET,ads,REJECT', 'MATCH,Proxy']
+    new['mode'] = 'global'
+
+    # 键顺序不同的相同配置哈希相同
+    same = dict(reversed(list(CONFIG.items())))
+    assert build_tree(same)['hash'] == build_tree(CONFIG)['hash']
+
+    old_trees = {'a.yaml': build_tree(CONFIG), 'same.yaml': build_tree(CONFIG),
+                 'gone.yaml': build_tree(CONFIG)}
+    new_trees = {'a.yaml': build_tree(new), 'same.yaml': build_tree(same)}
+    save_trees(tmp_path / 'tree.json', old_trees)
+    changes = diff_builds(load_trees(tmp_path / 'tree.json'), new_trees, {'a.yaml': new})
+
+    summary = [(c['config'], c.get('section'), c['kind'], c.get('name')) for c in changes]
+    assert summary == [
+        ('a.yaml', 'proxy-groups', 'reordered', None),
+        ('a.yaml', 'rule-providers', 'removed', 'cn'),
+        ('a.yaml', 'rule-providers', 'changed', 'ads'),
+        ('a.yaml', 'rules', 'items', None),
+        ('a.yaml', 'mode', 'section-changed', None),
+        ('gone.yaml', None, 'config-removed', None),
+    ]
+    assert changes[2]['fields'] == ['url']
+    assert changes[3]['added'] == 1 and changes[3]['removed'] == 1
+    text = changelog(changes)
+    assert 'rule-provider `ads` 变化: url → `https://mirror/ads.yaml`' in text
+    assert '`+ DOMAIN,a.test,DIRECT`' in text
+
+
+def test_generator_renders_only_affected_variants(tmp_path):
+    source = tmp_path / 'processed' / 'A'
+    source.mkdir(parents=True)
+    yaml_path = source / 'a.yaml'
+    yaml_path.write_text(yaml_io.dump(CONFIG, sort_keys=False), encoding='utf-8')
+    output = tmp_path / 'overwrite'
+
+    def build():
+        generator = OverwriteGenerator(ROOT / 'templates', ROOT / 'src' / 'config_types.json',
+                                       reproducible=True)
+        return generator.process_directory(tmp_path / 'processed', output, 'https://x',
+                                           'local', incremental=True)
+
+    variants = build()['total']
+    assert variants > 1
+
+    # 只改规则：各变体读取的 proxy-providers 未变化，全部沿用
+    config = copy.deepcopy(CONFIG)
+    config['rules'].insert(0, 'DOMAIN,a.test,DIRECT')
+    yaml_path.write_text(yaml_io.dump(config, sort_keys=False), encoding='utf-8')
+    stats = build()
+    assert stats['skipped'] == 0 and stats['reused'] == variants
+    assert stats['written'] == 0
+
+    # 删除的输出重新生成
+    removed = output / 'A' / OverwriteGenerator.variant_filename('a', {'suffix': ''})
+    removed.unlink()
+    config['proxy-groups'].pop()
+    yaml_path.write_text(yaml_io.dump(config, sort_keys=False), encoding='utf-8')
+    stats = build()
+    assert stats['reused'] == variants - 1 and removed.exists()
+
+    # 订阅变化：全部重新渲染
+    config['proxy-providers']['extra'] = {'type': 'http', 'url': 'https://x/extra'}
+    yaml_path.write_text(yaml_io.dump(config, sort_keys=False), encoding='utf-8')
+    stats = build()
+    assert stats['reused'] == 0 and stats['total'] == variants
+
+
+def test_unchanged_files_reuse_previous_tree(tmp_path, monkeypatch, capsys):
+    processed = tmp_path / 'processed' / 'A'
+    processed.mkdir(parents=True)
+    for name in ('a', 'b'):
+        (processed / f'{name}.yaml').write_text(yaml_io.dump(CONFIG, sort_keys=False),
+                                                encoding='utf-8')
+    tree, log = tmp_path / 'cache' / 'tree.json', tmp_path / 'out' / 'changes.md'
+
+    def run():
+        monkeypatch.setattr(sys, 'argv', ['section_diff.py', '-i', str(tmp_path / 'processed'),
+                                          '--tree', str(tree), '--changelog', str(log)])
+        assert section_diff.main() == 0
+        return capsys.readouterr().out
+
+    assert '2 configs (2 parsed)' in run()
+    new = copy.deepcopy(CONFIG)
+    new['rules'].insert(0, 'DOMAIN,a.test,DIRECT')
+    (processed / 'b.yaml').write_text(yaml_io.dump(new, sort_keys=False), encoding='utf-8')
+    # 只解析变化的 b.yaml；变更记录写入尚不存在的目录
+    assert '2 configs (1 parsed), 1 changed' in run()
+    assert '`+ DOMAIN,a.test,DIRECT`' in log.read_text(encoding='utf-8')
+
+    trees, configs = collect_trees(tmp_path / 'processed', load_trees(tree))
+    assert configs == {} and trees['A/b.yaml']['hash'] == build_tree(new)['hash']
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+测试分段存储 - 相近配置共用条目、组装结果一致、过期清单不被使用、清理失效清单与无引用对象
+"""
+import sys
+import copy
+from pathlib import Path
+
+# 添加 src 目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+import yaml_io
+from section_store import SectionStore
+from yaml_processor import YAMLProcessor
+
+CONFIG = {
+    'proxy-providers': {'a': {'type': 'http', 'url': 'https://x/a', 'interval': 86400}},
+    'proxy-groups': [
+        {'name': 'Proxy', 'type': 'select', 'use': ['a']},
+        {'name': 'Auto', 'type': 'url-test', 'use': ['a'], 'interval': 300},
+    ],
+    'rule-providers': {
+        'ads': {'type': 'http', 'behavior': 'domain', 'url': 'https://x/ads.yaml'},
+        'cn': {'type': 'http', 'behavior': 'ipcidr', 'url': 'https://x/cn.yaml'},
+    },
+    'rules': ['RULE-SET,ads,REJECT', 'RULE-SET,cn,DIRECT', 'MATCH,Proxy'],
+}
+
+
+def write_processed(path: Path, config: dict):
+    """清单对应的处理结果（gc 只保留处理结果仍存在的清单）"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(yaml_io.dump(config, sort_keys=False), encoding='utf-8')
+
+
+def test_near_duplicates_share_objects(tmp_path):
+    store = SectionStore(tmp_path / '.store')
+    no_ad = copy.deepcopy(CONFIG)
+    del no_ad['rule-providers']['ads']
+    no_ad['rules'] = no_ad['rules'][1:]
+
+    store.save_config(tmp_path / 'A' / 'full.yaml', CONFIG, 'h1')
+    written = store.stats['objects_written']
+    store.save_config(tmp_path / 'A' / 'noad.yaml', no_ad, 'h2')
+    write_processed(tmp_path / 'A' / 'noad.yaml', no_ad)
+    # 只多出新的 rules 段
+    assert store.stats['objects_written'] == written + 1
+    assert store.config_keys() == ['A/full.yaml', 'A/noad.yaml']
+
+    assert store.load_config(tmp_path / 'A' / 'full.yaml') == CONFIG
+    assert list(store.load_config(tmp_path / 'A' / 'noad.yaml')) == list(CONFIG)
+    # 清单对应的 YAML 已变化时不使用
+    assert store.load_config(tmp_path / 'A' / 'full.yaml', 'other') is None
+
+    store.config_path('A/full.yaml').unlink()
+    assert store.gc() == 2
+    assert store.load_config(tmp_path / 'A' / 'noad.yaml') == no_ad
+
+
+def test_processor_writes_store_and_export_round_trips(tmp_path):
+    source = tmp_path / 'raw' / 'config.yaml'
+    source.parent.mkdir()
+    source.write_text(yaml_io.dump(dict(CONFIG, dns={'enable': True}), sort_keys=False),
+                      encoding='utf-8')
+    store_dir = tmp_path / 'processed' / '.store'
+    YAMLProcessor(store=store_dir).process_directory(
+        tmp_path / 'raw', tmp_path / 'processed' / 'local', incremental=True
+    )
+
+    store = SectionStore(store_dir)
+    assert store.config_keys() == ['local/config.yaml']
+    exported = store.export(store.config_keys(), tmp_path / 'export')
+    processed = tmp_path / 'processed' / 'local' / 'config.yaml'
+    with open(exported[0], encoding='utf-8') as a, open(processed, encoding='utf-8') as b:
+        assert yaml_io.safe_load(a) == yaml_io.safe_load(b) == CONFIG
+
+
+def test_put_after_gc_rewrites_object(tmp_path):
+    store = SectionStore(tmp_path / '.store')
+    path = tmp_path / 'A' / 'x.yaml'
+    store.save_config(path, CONFIG, 'h1')
+    store.config_path(store.key_for(path)).unlink()
+    assert store.gc() > 0
+
+    # 同一实例：gc 删除的对象再次写入，清单引用的对象都存在
+    store.save_config(path, CONFIG, 'h1')
+    assert store.load_config(path, 'h1') == CONFIG
+    assert SectionStore(tmp_path / '.store').load_config(path, 'h1') == CONFIG
+
+
+def test_gc_drops_manifests_of_deleted_files(tmp_path):
+    raw, processed = tmp_path / 'raw', tmp_path / 'processed'
+    raw.mkdir()
+    no_ad = copy.deepcopy(CONFIG)
+    del no_ad['rule-providers']['ads']
+    for name, config in (('full', CONFIG), ('noad', no_ad)):
+        (raw / f'{name}.yaml').write_text(yaml_io.dump(config, sort_keys=False), encoding='utf-8')
+    YAMLProcessor(store=processed / '.store').process_directory(raw, processed / 'local')
+    objects = SectionStore(processed / '.store').size()['objects']
+
+    # 非增量构建不删除旧输出；输出被删除后，gc 同时清理其清单与只被它引用的对象
+    (raw / 'full.yaml').unlink()
+    (processed / 'local' / 'full.yaml').unlink()
+    YAMLProcessor(store=processed / '.store').process_directory(raw, processed / 'local')
+    store = SectionStore(processed / '.store')
+    assert store.config_keys() == ['local/noad.yaml']
+    assert store.size()['objects'] < objects
+    assert store.load_config(processed / 'local' / 'noad.yaml') == no_ad
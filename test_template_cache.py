@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+测试模板缓存 - 字节码缓存与预编译模块的渲染结果与直接解析相同，模板修改后缓存失效
+"""
+import sys
+import shutil
+from pathlib import Path
+
+# 添加 src 目录到 Python 路径
+ROOT = Path(__file__).parent
+sys.path.insert(0, str(ROOT / 'src'))
+
+from overwrite_generator import OverwriteGenerator
+
+CONFIG = {'proxy-providers': {'a': {'type': 'http', 'url': 'https://x/a'},
+                              'b': {'type': 'http', 'url': 'https://x/b'}}}
+
+
+def render_all(templates: Path, **options) -> list:
+    generator = OverwriteGenerator(templates, ROOT / 'src' / 'config_types.json',
+                                   reproducible=True, **options)
+    analysis = generator.analyze_config(CONFIG, 'config')
+    return [generator.render_overwrite(analysis, config_def, 'https://x/A/config.yaml',
+                                       'A', 'local', urltest_interval=600)
+            for config_def in generator.config_types]
+
+
+def test_caches_match_and_follow_template_edits(tmp_path):
+    templates = tmp_path / 'templates'
+    shutil.copytree(ROOT / 'templates', templates)
+    bytecode, precompiled = tmp_path / 'bytecode', tmp_path / 'precompiled'
+
+    expected = render_all(templates)
+    assert render_all(templates, bytecode_cache=bytecode) == expected
+    assert any(bytecode.iterdir())
+    assert render_all(templates, precompiled=precompiled) == expected
+    assert list(precompiled.glob('tmpl_*.py'))
+    # 第二次运行直接使用已有的缓存/模块
+    assert render_all(templates, bytecode_cache=bytecode) == expected
+    assert render_all(templates, precompiled=precompiled) == expected
+
+    base = templates / OverwriteGenerator.BASE_TEMPLATE
+    base.write_text(base.read_text(encoding='utf-8') + '# edited\n', encoding='utf-8')
+    edited = render_all(templates)
+    assert edited != expected and all('# edited' in text for text in edited)
+    assert render_all(templates, bytecode_cache=bytecode) == edited
+    assert render_all(templates, precompiled=precompiled) == edited
+
+
+def test_pipeline_precompiled_matches_plain(tmp_path, monkeypatch):
+    import yaml_io
+    import pipeline
+    monkeypatch.setenv('SOURCE_DATE_EPOCH', '1700000000')
+    (tmp_path / 'raw' / 'A').mkdir(parents=True)
+    (tmp_path / 'raw' / 'A' / 'config.yaml').write_text(yaml_io.dump(CONFIG), encoding='utf-8')
+
+    def build(name, *extra):
+        out = tmp_path / name
+        monkeypatch.setattr(sys, 'argv', [
+            'pipeline.py', '-s', f'local={tmp_path / "raw"}', '-p', str(out / 'processed'),
+            '-o', str(out / 'overwrite'), '-t', str(ROOT / 'templates'),
+            '-c', str(ROOT / 'src' / 'config_types.json'), '--repo-url', 'https://x',
+            '--reproducible', *extra])
+        assert pipeline.main() == 0
+        return {p.relative_to(out).as_posix(): p.read_bytes()
+                for p in sorted(out.rglob('*')) if p.is_file()}
+
+    # 与 CI 相同的 --precompiled/--bytecode-cache 参数不改变任何输出
+    plain = build('plain')
+    assert build('precompiled', '--precompiled', str(tmp_path / 'jinja')) == plain
+    assert build('bytecode', '--bytecode-cache', str(tmp_path / 'bc')) == plain
+    assert (tmp_path / 'jinja' / 'templates.json').is_file()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+测试上游同步 - 本地 HTTP 服务模拟 GitHub（树 / raw / 提交）及普通 URL：
+首次全部下载、未变化时 304、只下载变化的文件、删除上游已删除的文件、处理器只处理变化文件
+"""
+import sys
+import json
+import asyncio
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# 添加 src 目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+import yaml_io
+from http_pool import HTTPPool
+from upstream_sync import UpstreamSync, git_blob_sha
+from yaml_processor import YAMLProcessor
+
+REPO = 'owner/yamls'
+LAST_MODIFIED = 'Tue, 14 Nov 2023 22:13:20 GMT'
+
+
+class Upstream:
+    """模拟的上游仓库：files 为仓库内路径 -> 内容，requests 记录收到的请求路径；
+    每次解析 ref 时记下该提交的快照，树与 raw 按提交 sha 提供，fail 中的路径返回 500"""
+
+    def __init__(self):
+        self.files = {}
+        self.commits = {}
+        self.fail = set()
+        self.extra = b'mode: rule\n'
+        self.requests = []
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self.handler())
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def commit_sha(self) -> str:
+        listing = ''.join(f'{p} {git_blob_sha(d)}\n' for p, d in sorted(self.files.items()))
+        return hashlib.sha1(listing.encode()).hexdigest()
+
+    def handler(self):
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def reply(self, status, body=b'', headers=None):
+                self.send_response(status)
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                upstream.requests.append(self.path)
+                if self.path.startswith(f'/repos/{REPO}/git/trees/'):
+                    sha = self.path[len(f'/repos/{REPO}/git/trees/'):].split('?')[0]
+                    if sha not in upstream.commits:
+                        return self.reply(404)
+                    if self.headers.get('If-None-Match') == f'"t{sha}"':
+                        return self.reply(304)
+                    tree = [{'path': p, 'type': 'blob', 'sha': git_blob_sha(d)}
+                            for p, d in sorted(upstream.commits[sha].items())]
+                    return self.reply(200, json.dumps({'tree': tree}).encode(), {'ETag': f'"t{sha}"'})
+                if self.path == f'/repos/{REPO}/commits/HEAD':
+                    sha = upstream.commit_sha()
+                    upstream.commits[sha] = dict(upstream.files)
+                    if self.headers.get('If-None-Match') == f'"c{sha}"':
+                        return self.reply(304)
+                    commit = {'sha': sha, 'commit': {'committer': {'date': '2023-11-14T22:13:20Z'}}}
+                    return self.reply(200, json.dumps(commit).encode(), {'ETag': f'"c{sha}"'})
+                if self.path.startswith(f'/raw/{REPO}/'):
+                    sha, _, path = self.path[len(f'/raw/{REPO}/'):].partition('/')
+                    if path in upstream.fail:
+                        return self.reply(500)
+                    if path in upstream.commits.get(sha, {}):
+                        return self.reply(200, upstream.commits[sha][path])
+                if self.path == '/extra.yaml':
+                    if self.headers.get('If-Modified-Since') == LAST_MODIFIED:
+                        return self.reply(304)
+                    return self.reply(200, upstream.extra, {'Last-Modified': LAST_MODIFIED})
+                self.reply(404)
+
+        return Handler
+
+
+def make_config(name: str) -> bytes:
+    config = {
+        'proxy-groups': [{'name': name, 'type': 'select', 'proxies': ['DIRECT']}],
+        'rules': [f'MATCH,{name}'],
+    }
+    return yaml_io.dump(config, sort_keys=False).encode('utf-8')
+
+
+def sync(upstream: Upstream, output: Path, state: Path):
+    sources = [
+        {'name': 'gh', 'type': 'github', 'repo': REPO,
+         'api_url': upstream.url, 'raw_url': f'{upstream.url}/raw',
+         'paths': {'THEYAMLS/General_Config': 'General_Config'}},
+        {'name': 'extra', 'type': 'http', 'files': {'Extra/extra.yaml': f'{upstream.url}/extra.yaml'}},
+    ]
+
+    async def run():
+        async with HTTPPool(concurrency=4) as pool:
+            upstream.requests.clear()
+            syncer = UpstreamSync(sources, output, state, pool)
+            return await syncer.run(), syncer.source_epoch(), pool.stats
+
+    return asyncio.run(run())
+
+
+def raw_requests(upstream: Upstream):
+    return sorted(p.split('/', 5)[-1] for p in upstream.requests if p.startswith('/raw/'))
+
+
+def test_sync_fetches_only_changed_files(tmp_path):
+    upstream = Upstream()
+    upstream.files = {
+        'THEYAMLS/General_Config/A/a.yaml': make_config('A'),
+        'THEYAMLS/General_Config/B/b.yaml': make_config('B'),
+        'THEYAMLS/Other/skip.yaml': make_config('X'),
+        'THEYAMLS/General_Config/A/notes.md': b'# notes\n',
+    }
+    output, state = tmp_path / 'external', tmp_path / 'state.json'
+    try:
+        results, epoch, stats = sync(upstream, output, state)
+        assert sorted(results['gh']['changed']) == ['General_Config/A/a.yaml', 'General_Config/B/b.yaml']
+        assert results['extra']['changed'] == ['Extra/extra.yaml']
+        assert (output / 'General_Config/A/a.yaml').read_bytes() == make_config('A')
+        assert not (output / 'Other').exists()
+        assert epoch == 1700000000
+        # 同一主机的请求复用连接
+        assert stats['connections'] < stats['requests']
+
+        # 没有变化：树和提交 304，不下载任何文件
+        results, _, _ = sync(upstream, output, state)
+        assert results['gh']['tree_cached'] and not results['gh']['changed']
+        assert results['extra'] == {'changed': [], 'deleted': [], 'unchanged': 1}
+        assert raw_requests(upstream) == []
+
+        # 修改一个、删除一个：只下载修改的文件
+        upstream.files['THEYAMLS/General_Config/A/a.yaml'] = make_config('A2')
+        del upstream.files['THEYAMLS/General_Config/B/b.yaml']
+        results, _, _ = sync(upstream, output, state)
+        assert results['gh']['changed'] == ['General_Config/A/a.yaml']
+        assert results['gh']['deleted'] == ['General_Config/B/b.yaml']
+        assert raw_requests(upstream) == ['THEYAMLS/General_Config/A/a.yaml']
+        assert not (output / 'General_Config/B/b.yaml').exists()
+    finally:
+        upstream.server.shutdown()
+
+
+def test_partial_failure_keeps_changed_and_retries(tmp_path):
+    upstream = Upstream()
+    upstream.files = {f'THEYAMLS/General_Config/{n}/{n}.yaml': make_config(n) for n in 'AB'}
+    output, state = tmp_path / 'external', tmp_path / 'state.json'
+    try:
+        sync(upstream, output, state)
+        upstream.files = {f'THEYAMLS/General_Config/{n}/{n}.yaml': make_config(n + '2') for n in 'AB'}
+        upstream.fail = {'THEYAMLS/General_Config/B/B.yaml'}
+
+        # B 失败：来源报错，但已写入的 A 仍列为变化
+        results, _, _ = sync(upstream, output, state)
+        assert 'error' in results['gh']
+        assert results['gh']['changed'] == ['General_Config/A/A.yaml']
+
+        # 下次运行：树重新比较，只重新下载失败的 B
+        upstream.fail = set()
+        results, _, _ = sync(upstream, output, state)
+        assert 'error' not in results['gh'] and not results['gh']['tree_cached']
+        assert results['gh']['changed'] == ['General_Config/B/B.yaml']
+        assert raw_requests(upstream) == ['THEYAMLS/General_Config/B/B.yaml']
+        assert (output / 'General_Config/B/B.yaml').read_bytes() == make_config('B2')
+    finally:
+        upstream.server.shutdown()
+
+
+def test_processor_only_rehashes_listed_files(tmp_path):
+    raw, processed = tmp_path / 'raw', tmp_path / 'processed'
+    for name in ('a', 'b'):
+        (raw / name).mkdir(parents=True)
+        (raw / name / 'config.yaml').write_bytes(make_config(name))
+    processor = YAMLProcessor()
+    processor.process_directory(raw, processed, recursive=True, incremental=True)
+
+    # 两个文件都变了，但只列出 a：b 沿用清单中的哈希，不重新处理
+    (raw / 'a' / 'config.yaml').write_bytes(make_config('a2'))
+    (raw / 'b' / 'config.yaml').write_bytes(make_config('b2'))
+    results = processor.process_directory(raw, processed, recursive=True, incremental=True,
+                                          only={'a/config.yaml'})
+    done = {Path(r['input']).parent.name: r.get('skipped', False) for r in results}
+    assert done == {'a': False, 'b': True}
+    assert yaml_io.safe_load((processed / 'a' / 'config.yaml').read_text())['rules'] == ['MATCH,a2']
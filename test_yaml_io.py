@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+测试 YAML I/O 层 - libyaml 与纯 Python 后端输出逐字节一致
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加 src 目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+import yaml_io
+from yaml_processor import YAMLProcessor
+
+ROOT = Path(__file__).parent
+CORPUS = sorted((ROOT / 'processed_configs').glob('**/*.yaml'))
+
+
+def process_with(backend: str, yaml_path: Path, output_path: Path) -> bytes:
+    """用指定后端处理文件，返回输出字节"""
+    previous = yaml_io.get_backend()
+    yaml_io.set_backend(backend)
+    try:
+        config = YAMLProcessor().process_file(yaml_path)
+        assert config, f"{yaml_path} produced no output"
+        YAMLProcessor().save_file(config, output_path)
+    finally:
+        yaml_io.set_backend(previous)
+    return output_path.read_bytes()
+
+
+@pytest.mark.skipif(not yaml_io.HAS_LIBYAML, reason='libyaml not available')
+@pytest.mark.parametrize('yaml_path', CORPUS, ids=lambda p: str(p.relative_to(ROOT)))
+def test_backends_byte_identical(yaml_path, tmp_path):
+    c_output = process_with('c', yaml_path, tmp_path / 'c.yaml')
+    py_output = process_with('python', yaml_path, tmp_path / 'python.yaml')
+    assert c_output == py_output
+
+
+def test_dump_keeps_astral_characters():
+    data = {'filter': '(?i)(🇭🇰|港|hk)'}
+    for backend in ('c', 'python') if yaml_io.HAS_LIBYAML else ('python',):
+        yaml_io.set_backend(backend)
+        try:
+            text = yaml_io.dump(data, allow_unicode=True)
+        finally:
+            yaml_io.set_backend('auto')
+        assert '🇭🇰' in text
+        assert yaml_io.safe_load(text) == data
+
+
+def test_unknown_backend_rejected():
+    with pytest.raises(ValueError):
+        yaml_io.set_backend('rust')
+
+
+def test_original_anchor_names_preserved(tmp_path):
+    source = tmp_path / 'in.yaml'
+    source.write_text(
+        "dns:\n"
+        "  nameserver: &ns [223.5.5.5]\n"
+        "hc: &hc {enable: true, interval: 300}\n"
+        "proxy-providers:\n"
+        "  A: {url: https://a, health-check: *hc}\n"
+        "  B: {url: https://b, health-check: *hc}\n"
+        "proxy-groups:\n"
+        "  - {name: G1, type: select, use: &all [A, B]}\n"
+        "  - {name: G2, type: url-test, use: *all}\n",
+        encoding='utf-8'
+    )
+    processor = YAMLProcessor()
+    config = processor.process_file(source)
+    assert config['_meta']['anchors'] == {'hc': ['proxy-providers'], 'all': ['proxy-groups']}
+    
+    processor.save_file(config, tmp_path / 'out.yaml')
+    text = (tmp_path / 'out.yaml').read_text(encoding='utf-8')
+    assert '&hc' in text and '*hc' in text
+    assert '&all' in text and '*all' in text
+    assert 'id001' not in text and 'dns' not in text
+
+
+def test_streaming_matches_full_parse(tmp_path):
+    source = tmp_path / 'in.yaml'
+    source.write_text(
+        "p: &p {type: http, interval: 86400, health-check: &hc {enable: true}}\n"
+        "dns:\n"
+        "  fake-ip-filter: ['+.lan', '+.local']\n"
+        "  nameserver-policy: {geosite:cn: [223.5.5.5]}\n"
+        "proxy-providers:\n"
+        "  A: {<<: *p, url: https://a}\n"
+        "  B: {url: https://b, health-check: *hc}\n"
+        "rules:\n"
+        "  - MATCH,DIRECT\n",
+        encoding='utf-8'
+    )
+    outputs = []
+    for streaming in (False, True):
+        processor = YAMLProcessor(streaming=streaming)
+        config = processor.process_file(source)
+        output = tmp_path / f'out-{streaming}.yaml'
+        processor.save_file(config, output)
+        outputs.append(output.read_bytes())
+    assert outputs[0] == outputs[1]
+    assert b'&hc' in outputs[1] and b'fake-ip-filter' not in outputs[1]
+
+
+def test_string_scalar_anchors_preserved(tmp_path):
+    source = tmp_path / 'in.yaml'
+    source.write_text(
+        "dns: {nameserver: [&dropped 223.5.5.5]}\n"
+        "proxy-groups:\n"
+        "  - {name: HK, type: url-test, filter: &flt '(?i)港|HK', interval: &iv 300}\n"
+        "  - {name: HK2, type: fallback, filter: *flt, interval: *iv}\n"
+        "rules:\n"
+        "  - MATCH,HK\n",
+        encoding='utf-8'
+    )
+    for backend in ('c', 'python') if yaml_io.HAS_LIBYAML else ('python',):
+        yaml_io.set_backend(backend)
+        try:
+            processor = YAMLProcessor()
+            config = processor.process_file(source)
+            processor.save_file(config, tmp_path / 'out.yaml')
+        finally:
+            yaml_io.set_backend('auto')
+        text = (tmp_path / 'out.yaml').read_text(encoding='utf-8')
+        assert 'filter: &flt ' in text and 'filter: *flt' in text and '&dropped' not in text
+        # 数字标量的锚点展开为值
+        assert '&iv' not in text and text.count('interval: 300') == 2
+        assert yaml_io.safe_load(text)['proxy-groups'][1]['filter'] == '(?i)港|HK'